@@ -224,7 +224,7 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
 
 # API Routes
 @app.get("/api/v1/status", response_model=StatusResponse)
-async def get_status():
+def get_status():
     """Get API status (no auth required for health checks)"""
     try:
         if not SCRIPTS_AVAILABLE or not db:
@@ -237,17 +237,17 @@ async def get_status():
                 failed_jobs=0
             )
         
-        conn = db._conn()
-        
-        cursor = conn.execute("""
-            SELECT 
-                status,
-                COUNT(*) as count
-            FROM jobs 
-            GROUP BY status
-        """)
-        
-        stats = {row['status']: row['count'] for row in cursor.fetchall()}
+        # Read-only pooled connection: doesn't wait behind runner writes
+        with db.read_conn() as conn:
+            cursor = conn.execute("""
+                SELECT 
+                    status,
+                    COUNT(*) as count
+                FROM jobs 
+                GROUP BY status
+            """)
+            
+            stats = {row['status']: row['count'] for row in cursor.fetchall()}
         
         # Check process status (simplified)
         watcher_pid = ""
@@ -278,6 +278,54 @@ async def get_status():
             failed_jobs=0
         )
 
+@app.get("/api/v1/clients/{client_name}/capacity")
+def get_client_capacity(
+    client_name: str,
+    platform: str = "instagram",
+    content_type: Optional[str] = None,
+    user: dict = Depends(verify_token)
+):
+    """Remaining posting capacity and the next free slot, per content type"""
+    if not SCRIPTS_AVAILABLE or not db:
+        raise HTTPException(status_code=503, detail="Scripts not available")
+    
+    from scripts.rate_limiter import RateLimiter
+    config = load_client_config(client_name)
+    if not config:
+        raise HTTPException(status_code=404, detail="Client not found")
+    
+    content_types = [content_type] if content_type else ["reels", "feed", "stories", "weekly"]
+    return {
+        "client": client_name,
+        "platform": platform,
+        "capacity": RateLimiter(db).capacity(client_name, platform, content_types, config),
+    }
+
+@app.get("/api/v1/clients/{client_name}/dead-jobs")
+def get_dead_jobs(client_name: str, limit: int = 200, user: dict = Depends(verify_token)):
+    """Jobs that ran out of retry attempts"""
+    if not SCRIPTS_AVAILABLE or not db:
+        raise HTTPException(status_code=503, detail="Scripts not available")
+    return {"client": client_name, "jobs": [dict(job) for job in db.list_dead(limit, client=client_name)]}
+
+@app.post("/api/v1/clients/{client_name}/dead-jobs/requeue")
+def requeue_dead_jobs(
+    client_name: str,
+    job_ids: Optional[List[int]] = None,
+    user: dict = Depends(verify_token)
+):
+    """Put dead jobs (all of the client's, or just `job_ids`) back in the queue"""
+    if not SCRIPTS_AVAILABLE or not db:
+        raise HTTPException(status_code=503, detail="Scripts not available")
+    return {"client": client_name, "requeued": db.requeue_dead(client=client_name, job_ids=job_ids)}
+
+@app.get("/api/v1/jobs/{job_id}/events")
+def get_job_events(job_id: int, limit: Optional[int] = None, user: dict = Depends(verify_token)):
+    """A job's history: claims, retries, failures, completion"""
+    if not SCRIPTS_AVAILABLE or not db:
+        raise HTTPException(status_code=503, detail="Scripts not available")
+    return {"job_id": job_id, "events": db.job_timeline(job_id, limit)}
+
 # Include payment routes (with error handling)
 try:
     from api.payments import router as payments_router
@@ -8,6 +8,7 @@ except Exception:
     from watchdog.observers.polling import PollingObserver as _Obs
 
 from scripts import db
+from scripts.perceptual_hash import NearDuplicateIndex, NEAR_DUP_ACTION
 
 ROOT = Path(__file__).resolve().parent
 CONTENT = ROOT / "content"
@@ -30,6 +31,9 @@ PENDING = {}
 LOCK = threading.Lock()
 DEBOUNCE_SEC = 1.0
 
+# Edited/recompressed copies of images already queued or posted (see perceptual_hash.py)
+NEAR_DUPES = NearDuplicateIndex(db)
+
 def _detect_client_type(path: Path) -> tuple[str|None, str]:
     try:
         rel = path.resolve().relative_to(CONTENT)
@@ -43,32 +47,56 @@ def _detect_client_type(path: Path) -> tuple[str|None, str]:
         ctype = "reels"
     return client, ctype
 
-def handle_new_file(path: Path):
-    if not path.is_file(): return
+def _accept(path: Path) -> bool:
+    if not path.is_file(): return False
     name = path.name.lower()
-    if name in IGNORE_NAMES: return
-    if path.suffix.lower() not in VALID_EXT: return
-    if name.startswith(IGNORE_PREFIX) or path.suffix.lower() in IGNORE_EXT: return
+    if name in IGNORE_NAMES: return False
+    if path.suffix.lower() not in VALID_EXT: return False
+    if name.startswith(IGNORE_PREFIX) or path.suffix.lower() in IGNORE_EXT: return False
+    return True
 
-    client, ctype = _detect_client_type(path)
-    if not client:
-        log(f"⚠️ Ignoring file outside content/<Client>/<type>/: {path}")
-        return
+def handle_new_files(paths: list[Path]):
+    """Enqueue a debounced batch of files in one DB transaction."""
+    rows = []
+    for path in paths:
+        if not _accept(path): continue
+        client, ctype = _detect_client_type(path)
+        if not client:
+            log(f"⚠️ Ignoring file outside content/<Client>/<type>/: {path}")
+            continue
+        caption = f"🔥 New drop • {datetime.now():%b %d}\nFollow @VectorManagement"
+        rows.append({"client": client, "path": str(path.resolve()), "kind": ctype,
+                     "caption": caption, "extras": {"source": "watcher"}})
+    if not rows: return
 
-    full = str(path.resolve())
-    caption = f"🔥 New drop • {datetime.now():%b %d}\nFollow @VectorManagement"
+    if NEAR_DUP_ACTION in ("warn", "skip"):
+        try:
+            rows, flagged = NEAR_DUPES.screen(rows, skip=NEAR_DUP_ACTION == "skip")
+        except Exception as e:
+            log(f"⚠️ Near-duplicate check failed, queuing anyway: {e}")
+            flagged = []
+        for r in flagged:
+            dist, match = r["near_duplicates"][0]
+            like = f"job #{match}" if isinstance(match, int) else Path(match).name
+            action = "skipped" if NEAR_DUP_ACTION == "skip" else "queued anyway"
+            log(f"👯 {Path(r['path']).name} looks like {like} (distance {dist}), {action}")
+        if not rows: return
 
     try:
-        db.init_db()
-        existing = db.get_job_by_path(client, full)
-        if existing:
-            log(f"🔁 Duplicate ignored (already in DB status={existing['status']}): {path.name}")
-            return
-
-        job_id = db.add_job(client, full, kind=ctype, caption=caption, extras={"source":"watcher"})
-        log(f"📦 QUEUED job#{job_id}: {path.name} (client={client}, type={ctype})")
+        # Renamed/re-exported copies of media the client already has are kept on record, not posted
+        res = db.add_jobs_bulk(rows, on_duplicate="link")
     except Exception as e:
-        log(f"❌ Failed enqueue {path}: {e}")
+        log(f"❌ Failed enqueue of {len(rows)} file(s): {e}")
+        return
+    for r in res["skipped"]:
+        log(f"🔁 Duplicate ignored (already in DB): {Path(r['path']).name}")
+    for r in res["duplicates"]:
+        log(f"🔁 Same media as job #{r['duplicate_of']}, not queued: {Path(r['path']).name}")
+    for r in res["inserted"]:
+        log(f"📦 QUEUED: {Path(r['path']).name} (client={r['client']}, type={r['kind']})")
+
+def handle_new_file(path: Path):
+    handle_new_files([path])
 
 class Handler(FileSystemEventHandler):
     def on_created(self, event):
@@ -90,8 +118,8 @@ def debouncer_loop():
                 if now - t0 >= DEBOUNCE_SEC:
                     emit.append(p)
                     del PENDING[p]
-        for p in emit:
-            handle_new_file(p)
+        if emit:
+            handle_new_files(emit)
 
 def main():
     CONTENT.mkdir(parents=True, exist_ok=True)
@@ -28,21 +28,29 @@ def main():
     content = ROOT / "content"
     db.init_db()
     target = {sys.argv[1]} if len(sys.argv) > 1 else None
-    added = skipped = 0
 
+    rows = []
     for p in content.rglob("*"):
         if not p.is_file(): continue
         if p.suffix.lower() not in VALID_EXT: continue
         client, ctype = detect_client_type(p)
         if not client: continue
         if target and client not in target: continue
-        full = str(p.resolve())
-        if db.get_job_by_path(client, full):
-            print(f"SKIP duplicate: {client} {p.name}"); skipped += 1; continue
-        jid = db.add_job(client, full, kind=ctype, caption="(backfill)", extras={"source":"backfill"})
-        print(f"QUEUED job#{jid}: {p.name} (client={client}, type={ctype})"); added += 1
-
-    print(f"Backfill complete. Queued {added}, skipped {skipped} duplicates.")
+        rows.append({"client": client, "path": str(p.resolve()), "kind": ctype,
+                     "caption": "(backfill)", "extras": {"source": "backfill"}})
+
+    # One duplicate lookup + one transaction for the whole walk; unchanged
+    # files reuse their stored content hash instead of being read again
+    res = db.add_jobs_bulk(rows, on_duplicate="link")
+    for r in res["skipped"]:
+        print(f"SKIP duplicate: {r['client']} {Path(r['path']).name}")
+    for r in res["duplicates"]:
+        print(f"SKIP same media as job#{r['duplicate_of']}: {r['client']} {Path(r['path']).name}")
+    for r in res["inserted"]:
+        print(f"QUEUED: {Path(r['path']).name} (client={r['client']}, type={r['kind']})")
+
+    print(f"Backfill complete. Queued {len(res['inserted'])}, skipped {len(res['skipped'])} duplicates, "
+          f"{len(res['duplicates'])} copies of media already queued/posted.")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,119 @@
+# scripts/client_registry.py
+"""
+Process-wide cache of authenticated platform SDK clients, keyed by (platform, account)
+
+A cached client is handed out as-is while its session is younger than the TTL.
+Once the TTL has passed it is re-probed (cheaply, e.g. Instagram account_info)
+on next use instead of logging in again; a failed probe or an auth error while
+posting evicts it so the next caller builds a fresh one.
+"""
+import os
+import time
+import asyncio
+import threading
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SESSION_TTL_SECONDS = float(os.getenv("CLIENT_SESSION_TTL", "1800"))
+
+# Exception class names (instagrapi, tweepy, facebook-sdk, google) meaning the
+# session or credentials are no longer good. db.py's retry table uses the same
+# set; it lives here because this module has no import-time side effects.
+AUTH_ERROR_NAMES = frozenset({
+    "LoginRequired", "ChallengeRequired", "BadPassword", "ReloginAttemptExceeded",
+    "TwoFactorRequired", "Unauthorized", "Forbidden", "RefreshError",
+    "AuthenticationError",
+})
+
+def is_auth_error(exc: BaseException) -> bool:
+    """True if `exc` means the client must log in again"""
+    if any(cls.__name__ in AUTH_ERROR_NAMES for cls in type(exc).__mro__):
+        return True
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None) == 401
+
+@dataclass
+class _Entry:
+    client: Any
+    checked_at: float
+
+class ClientRegistry:
+    """Authenticated SDK clients shared by every poster in the process"""
+
+    def __init__(self, ttl_seconds: float = SESSION_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[Tuple[str, str], _Entry] = {}
+        self._locks: Dict[tuple, asyncio.Lock] = {}
+        self._guard = threading.Lock()
+
+    def _lock_for(self, key: Tuple[str, str]) -> asyncio.Lock:
+        loop_key = (id(asyncio.get_running_loop()),) + key
+        with self._guard:
+            lock = self._locks.get(loop_key)
+            if lock is None:
+                lock = self._locks[loop_key] = asyncio.Lock()
+        return lock
+
+    async def get(
+        self,
+        platform: str,
+        account: str,
+        factory: Callable[[], Awaitable[Any]],
+        validate: Optional[Callable[[Any], Awaitable[Any]]] = None,
+    ) -> Any:
+        """
+        Cached client for (platform, account), built with `factory` when missing.
+
+        `validate(client)` is awaited only when the entry is older than the TTL;
+        if it raises, the client is rebuilt.
+        """
+        key = (platform, account)
+        entry = self._entries.get(key)
+        if entry and time.monotonic() - entry.checked_at < self.ttl_seconds:
+            return entry.client
+
+        # One caller per key refreshes; the rest wait and reuse its result
+        async with self._lock_for(key):
+            entry = self._entries.get(key)
+            now = time.monotonic()
+            if entry and now - entry.checked_at < self.ttl_seconds:
+                return entry.client
+            if entry and validate is not None:
+                try:
+                    await validate(entry.client)
+                    entry.checked_at = time.monotonic()
+                    return entry.client
+                except Exception as e:
+                    logger.info(f"{platform}:{account} session probe failed ({e}); logging in again")
+            self._entries.pop(key, None)
+            client = await factory()
+            self._entries[key] = _Entry(client, time.monotonic())
+            logger.info(f"{platform}:{account} client ready")
+            return client
+
+    def evict(self, platform: str, account: str):
+        """Forget a client (e.g. after an auth error) so the next get() rebuilds it"""
+        if self._entries.pop((platform, account), None) is not None:
+            logger.info(f"{platform}:{account} client evicted")
+
+    def evict_on_auth_error(self, platform: str, account: str, exc: BaseException) -> bool:
+        """Evict if `exc` is an auth failure; returns whether it did"""
+        if is_auth_error(exc):
+            self.evict(platform, account)
+            return True
+        return False
+
+    def clear(self):
+        self._entries.clear()
+
+_registry: Optional[ClientRegistry] = None
+
+def get_client_registry() -> ClientRegistry:
+    """Get the process-wide client registry"""
+    global _registry
+    if _registry is None:
+        _registry = ClientRegistry()
+    return _registry
@@ -0,0 +1,62 @@
+# scripts/conftest.py
+"""
+Shared pytest fixtures for the scripts/ tests.
+
+db.py opens data/autoposter.db next to its own file on import, so tests load a
+copy of it from a temp project root and never touch the real database.
+"""
+import sys
+import shutil
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+
+def load_module(name: str, path: Path, monkeypatch):
+    """Execute `path` as module `name`, registered in sys.modules for the test"""
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    monkeypatch.setitem(sys.modules, name, module)
+    spec.loader.exec_module(module)
+    return module
+
+def load_db(root: Path, monkeypatch):
+    """Import a copy of scripts/db.py placed under `root`; it opens root/data/autoposter.db"""
+    (root / "scripts").mkdir(exist_ok=True)
+    shutil.copy(SCRIPTS_DIR / "db.py", root / "scripts" / "db.py")
+    monkeypatch.syspath_prepend(str(SCRIPTS_DIR))
+    db = load_module("db", root / "scripts" / "db.py", monkeypatch)
+    monkeypatch.setitem(sys.modules, "scripts.db", db)
+    return db
+
+def load_script(root: Path, name: str, deps, monkeypatch):
+    """Import a copy of scripts/<name>.py (and the scripts it loads by path) placed under `root`"""
+    (root / "scripts").mkdir(exist_ok=True)
+    for file in (name, *deps):
+        shutil.copy(SCRIPTS_DIR / f"{file}.py", root / "scripts" / f"{file}.py")
+    monkeypatch.syspath_prepend(str(SCRIPTS_DIR))
+    return load_module(name, root / "scripts" / f"{name}.py", monkeypatch)
+
+@pytest.fixture
+def db_loader(monkeypatch):
+    """load_db for tests that seed root/data/autoposter.db before db.py opens it"""
+    return lambda root: load_db(root, monkeypatch)
+
+@pytest.fixture
+def module_loader(monkeypatch):
+    """load_module for a scripts/ module by name, e.g. module_loader("db_multi_platform")"""
+    return lambda name: load_module(name, SCRIPTS_DIR / f"{name}.py", monkeypatch)
+
+@pytest.fixture
+def script_loader(tmp_path, monkeypatch):
+    """load_script under tmp_path, e.g. script_loader("queue_runner", "db", "rate_limiter")"""
+    return lambda name, *deps: load_script(tmp_path, name, deps, monkeypatch)
+
+@pytest.fixture
+def fresh_db(tmp_path, monkeypatch):
+    """A private copy of scripts/db.py on an empty database (also importable as `db`/`scripts.db`)"""
+    db = load_db(tmp_path, monkeypatch)
+    yield db
+    db._BATCHER.drain()
@@ -0,0 +1,19 @@
+# scripts/content_hash.py
+"""
+SHA-256 of media files, read in chunks.
+
+Kept free of import-time side effects so modules that only need a file's
+content hash (media_prep) don't have to import db, which opens the database.
+db.file_hashes wraps this with a size/mtime cache.
+"""
+import hashlib
+
+_HASH_CHUNK = 1024 * 1024
+
+def sha256_file(path: str) -> str:
+    """Hex SHA-256 of the file at `path`; raises OSError if it can't be read"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
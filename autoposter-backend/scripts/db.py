@@ -1,11 +1,30 @@
 # scripts/db.py
 from __future__ import annotations
 
+import os
+import socket
 import sqlite3
 import json
+import atexit
+import math
+import queue
+import random
+import threading
+import time
+from collections.abc import Mapping
+from concurrent.futures import Future
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache, partial
 from pathlib import Path
-from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+try:
+    from scripts.client_registry import AUTH_ERROR_NAMES
+    from scripts.content_hash import sha256_file
+except ImportError:
+    from client_registry import AUTH_ERROR_NAMES
+    from content_hash import sha256_file
 
 # -------- Paths / Connection --------
 _PROJECT_ROOT = Path(__file__).resolve().parents[1]  # .../autoposter
@@ -16,28 +35,223 @@ def _now_iso() -> str:
     """UTC timestamp ISO string (second precision)."""
     return datetime.now(timezone.utc).replace(microsecond=0).isoformat()
 
+def _iso_after(base_iso: str, seconds: int) -> str:
+    """ISO string `seconds` after `base_iso` (same format as _now_iso)."""
+    base = datetime.fromisoformat(base_iso.replace("Z", "+00:00"))
+    if base.tzinfo is None:
+        base = base.replace(tzinfo=timezone.utc)
+    return (base + timedelta(seconds=seconds)).astimezone(timezone.utc).replace(microsecond=0).isoformat()
+
+def _epoch(iso: str) -> int:
+    """Unix seconds for an ISO timestamp (any offset or 'Z'; naive means UTC)."""
+    dt = datetime.fromisoformat(iso.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
 def _dict_factory(cursor: sqlite3.Cursor, row: Tuple[Any, ...]) -> Dict[str, Any]:
     """Return rows as dicts instead of tuples."""
     return {col[0]: row[idx] for idx, col in enumerate(cursor.description)}
 
 _CONN_SINGLETON: Optional[sqlite3.Connection] = None
 
-def _conn() -> sqlite3.Connection:
-    """Get a process-wide SQLite connection with sane pragmas."""
-    global _CONN_SINGLETON
-    if _CONN_SINGLETON is not None:
-        return _CONN_SINGLETON
-
+def _connect() -> sqlite3.Connection:
+    """Open a new SQLite connection with sane pragmas."""
     _DATA_DIR.mkdir(parents=True, exist_ok=True)
     conn = sqlite3.connect(_DB_PATH.as_posix(), timeout=30, check_same_thread=False)
     conn.row_factory = _dict_factory
+    # Only takes effect on a brand-new file (so it must come first); compact_db() converts existing ones.
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL;")
     conn.execute("PRAGMA journal_mode=WAL;")
     conn.execute("PRAGMA synchronous=NORMAL;")
     conn.execute("PRAGMA foreign_keys=ON;")
     conn.execute("PRAGMA busy_timeout=5000;")
-    _CONN_SINGLETON = conn
     return conn
 
+def _conn() -> sqlite3.Connection:
+    """
+    Get the process-wide SQLite connection kept for older scripts.
+
+    It is not the writer connection behind write_conn()/submit_write(), so a
+    commit made on it can never commit part of an open group-commit batch;
+    SQLite's file lock orders the two like writes from another process.
+    New code should use write_conn()/read_conn() or submit_write().
+    """
+    global _CONN_SINGLETON
+    if _CONN_SINGLETON is None:
+        _CONN_SINGLETON = _connect()
+    return _CONN_SINGLETON
+
+# -------- Connection pool --------
+# One private writer connection guarded by a lock, plus up to _READ_POOL_SIZE
+# read-only connections. In WAL mode those readers see the last committed state
+# without waiting on the writer, so status/inspection reads don't queue behind
+# posting work.
+_READ_POOL_SIZE = int(os.environ.get("AUTOPOSTER_DB_READERS", "4"))
+_WRITE_LOCK = threading.RLock()
+_WRITER: Optional[sqlite3.Connection] = None
+_READ_POOL: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+_READ_OPENED = 0
+_READ_OPEN_LOCK = threading.Lock()
+_LOCAL = threading.local()
+
+def _connect_readonly() -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        f"file:{_DB_PATH.as_posix()}?mode=ro", uri=True, timeout=30, check_same_thread=False
+    )
+    conn.row_factory = _dict_factory
+    conn.execute("PRAGMA query_only=ON;")
+    conn.execute("PRAGMA busy_timeout=5000;")
+    return conn
+
+def configure_pool(readers: int) -> None:
+    """Set the maximum number of read connections (takes effect for new checkouts)."""
+    global _READ_POOL_SIZE
+    if readers < 1:
+        raise ValueError("configure_pool: readers must be >= 1")
+    _READ_POOL_SIZE = readers
+
+@contextmanager
+def write_conn() -> Iterator[sqlite3.Connection]:
+    """The writer connection, held exclusively by the calling thread for the block."""
+    global _WRITER
+    with _WRITE_LOCK:
+        if _WRITER is None:
+            _WRITER = _connect()
+        _LOCAL.writing = getattr(_LOCAL, "writing", 0) + 1
+        try:
+            yield _WRITER
+        finally:
+            _LOCAL.writing -= 1
+
+@contextmanager
+def read_conn() -> Iterator[sqlite3.Connection]:
+    """
+    Check out a read-only connection for the calling thread.
+
+    Nested use in the same thread reuses the connection already checked out.
+    When all _READ_POOL_SIZE connections are busy, waits for one to come back.
+    """
+    global _READ_OPENED
+    held = getattr(_LOCAL, "reader", None)
+    if held is not None:
+        yield held
+        return
+
+    conn: Optional[sqlite3.Connection] = None
+    try:
+        conn = _READ_POOL.get_nowait()
+    except queue.Empty:
+        with _READ_OPEN_LOCK:
+            if _READ_OPENED < _READ_POOL_SIZE:
+                _READ_OPENED += 1
+                try:
+                    conn = _connect_readonly()
+                except Exception:
+                    _READ_OPENED -= 1
+                    raise
+    if conn is None:
+        conn = _READ_POOL.get()
+
+    _LOCAL.reader = conn
+    try:
+        yield conn
+    finally:
+        _LOCAL.reader = None
+        if conn.in_transaction:
+            conn.rollback()
+        _READ_POOL.put(conn)
+
+@contextmanager
+def _write_txn(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    """
+    BEGIN IMMEDIATE ... COMMIT.
+
+    Takes SQLite's write lock up front, so a SELECT followed by an UPDATE inside
+    the block cannot interleave with another process doing the same.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+
+# -------- Job records --------
+class Job(Mapping):
+    """
+    One row of the jobs table.
+
+    Holds the raw row tuple plus a column-name -> position map shared by every
+    row of the same query, instead of a dict per row. Reads like the dicts the
+    db functions used to return (job["status"], job.get("caption"), dict(job))
+    and by attribute (job.status). `extras` is JSON-decoded on first access.
+    """
+    __slots__ = ("_index", "_row", "_extras")
+
+    _UNDECODED = object()
+
+    def __init__(self, index: Dict[str, int], row: Tuple[Any, ...]):
+        self._index = index
+        self._row = row
+        self._extras = Job._UNDECODED
+
+    @property
+    def extras(self) -> Dict[str, Any]:
+        if self._extras is Job._UNDECODED:
+            try:
+                self._extras = json.loads(self._row[self._index["extras"]] or "{}")
+            except Exception:
+                self._extras = {}
+        return self._extras
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "extras" and "extras" in self._index:
+            return self.extras
+        return self._row[self._index[key]]
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._index
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain dict copy (extras decoded), e.g. for json.dumps or callers that mutate rows."""
+        return {k: self[k] for k in self._index}
+
+    def __repr__(self) -> str:
+        return f"Job({self.to_dict()!r})"
+
+@lru_cache(maxsize=64)
+def _job_index(columns: Tuple[str, ...]) -> Dict[str, int]:
+    """Column-name -> position map, built once per distinct result layout."""
+    return {name: i for i, name in enumerate(columns)}
+
+def _fetch_jobs(
+    conn: sqlite3.Connection, sql: str, params: Any = (), limit: int | None = None
+) -> List[Job]:
+    """Run a jobs query with positional rows and wrap them as Job records."""
+    cur = conn.cursor()
+    cur.row_factory = None  # plain tuples; Job does the name lookup
+    cur.execute(sql, params)
+    index = _job_index(tuple(col[0] for col in cur.description))
+    rows = cur.fetchall() if limit is None else cur.fetchmany(limit)
+    return [Job(index, row) for row in rows]
+
 # -------- Schema / Migration --------
 _BASE_COLUMNS = {
     "id": "INTEGER PRIMARY KEY AUTOINCREMENT",
@@ -47,83 +261,455 @@ _BASE_COLUMNS = {
     "content_type": "TEXT NOT NULL",
     "caption": "TEXT",
     "eta": "TEXT",  # some DBs may require NOT NULL; we will default it to now if None
+    # eta (or created_at) as Unix seconds; what dequeue filters and orders on
+    "eta_epoch": "INTEGER NOT NULL DEFAULT 0",
     "status": "TEXT NOT NULL DEFAULT 'queued'",
     "extras": "TEXT NOT NULL DEFAULT '{}'",
     "created_at": "TEXT NOT NULL",
     "started_at": "TEXT",
     "done_at": "TEXT",
-    "error": "TEXT",
+    "error": "TEXT",  # latest failure only (capped at ERROR_MAX_CHARS); history is in job_events
     "attempts": "INTEGER NOT NULL DEFAULT 0",
+    # Lease ownership (set by claim_due_jobs)
+    "worker_id": "TEXT",
+    "lease_expires_at": "TEXT",
+    "heartbeat_at": "TEXT",
+    # How many times a worker lost this job (crash / missed heartbeats); see reap_expired_leases
+    "lease_losses": "INTEGER NOT NULL DEFAULT 0",
+    # Failed posting attempts (fail_job); rate-limit reschedules don't count
+    "failures": "INTEGER NOT NULL DEFAULT 0",
+    # SHA-256 of the media at enqueue time (see file_hash); NULL if it wasn't readable
+    "content_hash": "TEXT",
+    # 64-bit dHash of images (signed, as SQLite stores it); see perceptual_hash.py
+    "phash": "INTEGER",
 }
 
 _INDEXES = [
     ("idx_jobs_client_status_eta",
      "CREATE INDEX IF NOT EXISTS idx_jobs_client_status_eta ON jobs(client, status, eta)"),
     ("idx_jobs_path", "CREATE INDEX IF NOT EXISTS idx_jobs_path ON jobs(path)"),
+    # All rows, finished ones included (ux_jobs_client_path only covers active jobs)
+    ("idx_jobs_client_path", "CREATE INDEX IF NOT EXISTS idx_jobs_client_path ON jobs(client, path)"),
+    ("idx_jobs_lease",
+     "CREATE INDEX IF NOT EXISTS idx_jobs_lease ON jobs(lease_expires_at) WHERE status = 'in_progress'"),
+    # Partial indexes for dequeue: only queued rows, already in (eta_epoch, id) order
+    ("idx_jobs_due",
+     "CREATE INDEX IF NOT EXISTS idx_jobs_due ON jobs(eta_epoch, id) WHERE status = 'queued'"),
+    ("idx_jobs_client_due",
+     "CREATE INDEX IF NOT EXISTS idx_jobs_client_due ON jobs(client, eta_epoch, id) WHERE status = 'queued'"),
+    ("idx_jobs_client_hash",
+     "CREATE INDEX IF NOT EXISTS idx_jobs_client_hash ON jobs(client, content_hash) WHERE content_hash IS NOT NULL"),
+]
+
+# SQLite's strftime('%s') normalizes any ISO offset to UTC, like _epoch() does.
+_ETA_EPOCH_SQL = "COALESCE(CAST(strftime('%s', COALESCE({row}.eta, {row}.created_at)) AS INTEGER), 0)"
+
+# Keep eta_epoch right for scripts that write jobs.eta / INSERT INTO jobs directly.
+_TRIGGERS = [
+    ("trg_jobs_eta_epoch_insert", f"""
+        CREATE TRIGGER IF NOT EXISTS trg_jobs_eta_epoch_insert
+        AFTER INSERT ON jobs WHEN NEW.eta_epoch = 0
+        BEGIN
+            UPDATE jobs SET eta_epoch = {_ETA_EPOCH_SQL.format(row="NEW")} WHERE id = NEW.id;
+        END
+    """),
+    ("trg_jobs_eta_epoch_update", f"""
+        CREATE TRIGGER IF NOT EXISTS trg_jobs_eta_epoch_update
+        AFTER UPDATE OF eta ON jobs WHEN NEW.eta_epoch IS OLD.eta_epoch
+        BEGIN
+            UPDATE jobs SET eta_epoch = {_ETA_EPOCH_SQL.format(row="NEW")} WHERE id = NEW.id;
+        END
+    """),
 ]
 
+# Finished jobs move here (see archive_jobs); same columns plus archived_at.
+_ARCHIVE_COLUMNS = {
+    "id": "INTEGER PRIMARY KEY",
+    **{k: v for k, v in _BASE_COLUMNS.items() if k != "id"},
+    "archived_at": "TEXT",
+}
+
 def _table_exists(conn: sqlite3.Connection, table: str) -> bool:
     cur = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,))
     return cur.fetchone() is not None
 
-def _ensure_columns(conn: sqlite3.Connection, table: str, cols: Dict[str, str]) -> None:
+def _ensure_columns(conn: sqlite3.Connection, table: str, cols: Dict[str, str]) -> List[str]:
+    """Add any missing columns; returns the names that were added."""
     cur = conn.execute(f"PRAGMA table_info({table})")
     present = {r["name"] for r in cur.fetchall()}
+    added = []
     for name, ddl in cols.items():
         if name not in present:
             conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {ddl};")
+            added.append(name)
+    return added
+
+def _index_exists(conn: sqlite3.Connection, name: str) -> bool:
+    cur = conn.execute("SELECT 1 FROM sqlite_master WHERE type='index' AND name=?", (name,))
+    return cur.fetchone() is not None
+
+# Jobs that still have work ahead; at most one per (client, path), see ux_jobs_client_path
+_ACTIVE_SQL = "status IN ('queued', 'in_progress')"
+
+def _ensure_unique_client_path(conn: sqlite3.Connection) -> None:
+    """
+    Migration: one *active* jobs row per (client, path), enforced by the
+    partial unique index ux_jobs_client_path.
+
+    Finished rows are history and may repeat (a file can be posted again).
+    Extra active rows are marked 'duplicate' of the oldest one, never
+    deleted. A full unique index from older versions or
+    scripts/fix_duplicates.py is replaced.
+    """
+    row = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type='index' AND name='ux_jobs_client_path'"
+    ).fetchone()
+    if row is not None and "WHERE" in row["sql"].upper():
+        return
+    conn.execute("DROP INDEX IF EXISTS ux_jobs_client_path")
+    ids = [r["id"] for r in conn.execute(
+        f"""
+        UPDATE jobs
+        SET status = 'duplicate',
+            extras = json_set(COALESCE(extras, '{{}}'), '$.duplicate_of', (
+                SELECT MIN(o.id) FROM jobs o
+                WHERE o.client = jobs.client AND o.path = jobs.path AND o.{_ACTIVE_SQL}
+            ))
+        WHERE {_ACTIVE_SQL}
+          AND id NOT IN (SELECT MIN(id) FROM jobs WHERE {_ACTIVE_SQL} GROUP BY client, path)
+        RETURNING id
+        """
+    )]
+    _log_events(conn, ids, "duplicate", "another active job has the same (client, path)", _now_iso())
+    conn.execute(f"CREATE UNIQUE INDEX ux_jobs_client_path ON jobs(client, path) WHERE {_ACTIVE_SQL}")
+
+def _ensure_quota_usage(conn: sqlite3.Connection) -> None:
+    """
+    Migration: per-day completed-job counters, kept current by mark_done.
+
+    On first creation the table is seeded from the done jobs already in the DB.
+    """
+    if _table_exists(conn, "quota_usage"):
+        return
+    conn.execute(
+        """
+        CREATE TABLE quota_usage (
+            client TEXT NOT NULL,
+            content_type TEXT NOT NULL,
+            day TEXT NOT NULL,
+            used INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (client, content_type, day)
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute(
+        """
+        INSERT INTO quota_usage (client, content_type, day, used)
+        SELECT client, content_type, date(COALESCE(done_at, created_at)), COUNT(*)
+        FROM jobs
+        WHERE status = 'done' AND date(COALESCE(done_at, created_at)) IS NOT NULL
+        GROUP BY 1, 2, 3
+        """
+    )
+
+# job_events and job_events_archive share one layout. AUTOINCREMENT keeps ids
+# from being reused once archive_jobs deletes events, so `id` is a stable order.
+_JOB_EVENTS_DDL = """
+    CREATE TABLE {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        job_id INTEGER NOT NULL,
+        ts TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        detail TEXT
+    )
+"""
+
+def _ensure_events_table(conn: sqlite3.Connection, table: str) -> bool:
+    """
+    Create an events table, or rebuild one made without AUTOINCREMENT (ids kept).
+
+    Returns True if the table did not exist before.
+    """
+    row = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (table,)
+    ).fetchone()
+    if row is not None and "AUTOINCREMENT" in row["sql"].upper():
+        return False
+    if row is not None:
+        conn.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+    conn.execute(_JOB_EVENTS_DDL.format(table=table))
+    if row is not None:
+        conn.execute(
+            f"INSERT INTO {table} (id, job_id, ts, kind, detail) "
+            f"SELECT id, job_id, ts, kind, detail FROM {table}_old ORDER BY id"
+        )
+        conn.execute(f"DROP TABLE {table}_old")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_job ON {table}(job_id, id)")
+    return row is None
+
+def _ensure_job_events(conn: sqlite3.Connection) -> None:
+    """
+    Migration: append-only job history, one row per event.
+
+    On first creation the multi-line `error` logs that older versions kept on
+    the jobs row are moved here, leaving only their last line behind.
+    """
+    if not _ensure_events_table(conn, "job_events"):
+        return
+    rows = conn.execute(
+        "SELECT id, created_at, error FROM jobs WHERE error IS NOT NULL AND error != ''"
+    ).fetchall()
+    for row in rows:
+        lines = [line for line in row["error"].splitlines() if line.strip()]
+        conn.executemany(
+            "INSERT INTO job_events (job_id, ts, kind, detail) VALUES (?, ?, 'legacy', ?)",
+            [(row["id"], row["created_at"], line) for line in lines],
+        )
+        conn.execute(
+            "UPDATE jobs SET error = ? WHERE id = ?",
+            (_clip_error(lines[-1]) if lines else None, row["id"]),
+        )
 
 def init_db() -> None:
-    conn = _conn()
-    with conn:
+    with write_conn() as conn, conn:
         if not _table_exists(conn, "jobs"):
             cols_sql = ", ".join(f"{k} {v}" for k, v in _BASE_COLUMNS.items())
             conn.execute(f"CREATE TABLE jobs ({cols_sql});")
-        else:
-            _ensure_columns(conn, "jobs", _BASE_COLUMNS)
+        elif "eta_epoch" in _ensure_columns(conn, "jobs", _BASE_COLUMNS):
+            # Migration: fill eta_epoch for rows written before the column existed
+            conn.execute(f"UPDATE jobs SET eta_epoch = {_ETA_EPOCH_SQL.format(row='jobs')}")
         for _, sql in _INDEXES:
             conn.execute(sql)
+        for _, sql in _TRIGGERS:
+            conn.execute(sql)
+        _ensure_job_events(conn)
+        _ensure_unique_client_path(conn)
+        _ensure_quota_usage(conn)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS rate_buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_epoch REAL NOT NULL
+            ) WITHOUT ROWID
+            """
+        )
+        if not _table_exists(conn, "jobs_archive"):
+            cols_sql = ", ".join(f"{k} {v}" for k, v in _ARCHIVE_COLUMNS.items())
+            conn.execute(f"CREATE TABLE jobs_archive ({cols_sql});")
+        else:
+            _ensure_columns(conn, "jobs_archive", _ARCHIVE_COLUMNS)
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_jobs_archive_client_path ON jobs_archive(client, path)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_jobs_archive_client_hash ON jobs_archive(client, content_hash) "
+            "WHERE content_hash IS NOT NULL"
+        )
+        _ensure_events_table(conn, "job_events_archive")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS file_hashes (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                sha256 TEXT NOT NULL,
+                hashed_at TEXT NOT NULL,
+                phash INTEGER
+            ) WITHOUT ROWID
+            """
+        )
+        _ensure_columns(conn, "file_hashes", {"phash": "INTEGER"})
 
-# -------- Queries / Commands --------
-def get_job_by_path(client: str, path: str) -> Optional[Dict[str, Any]]:
-    conn = _conn()
-    cur = conn.execute(
-        """
-        SELECT * FROM jobs
-        WHERE client = ? AND path = ?
-        ORDER BY id DESC
-        LIMIT 1
-        """,
-        (client, path),
+# -------- Job events --------
+# Every state change a job goes through is appended to job_events, so the jobs
+# row itself stays small: `error` holds only the most recent failure.
+# Kinds: claimed, started, done, rescheduled, failed, dead, requeued,
+# lease_expired, poisoned, duplicate (and 'legacy' for history migrated from old rows).
+ERROR_MAX_CHARS = 500
+
+def _clip_error(message: str) -> str:
+    return message if len(message) <= ERROR_MAX_CHARS else message[: ERROR_MAX_CHARS - 3] + "..."
+
+def _log_events(
+    conn: sqlite3.Connection, job_ids: List[int], kind: str, detail: str | None, ts: str
+) -> None:
+    conn.executemany(
+        "INSERT INTO job_events (job_id, ts, kind, detail) VALUES (?, ?, ?, ?)",
+        [(job_id, ts, kind, detail) for job_id in job_ids],
     )
-    return cur.fetchone()
 
-def add_job(
-    client: str,
-    path: str,
-    *,
-    content_type: str | None = None,
-    caption: str | None = None,
-    eta: str | None = None,
-    extras: dict | None = None,
-    **kwargs,
-) -> int:
+def job_timeline(job_id: int, limit: int | None = None) -> List[Dict[str, Any]]:
+    """A job's events in the order they happened (newest `limit` only, if given); archived jobs included."""
+    # Archived events get new ids, so order by table first (archived ones are older)
+    events = """
+        SELECT 0 AS live, id, ts, kind, detail FROM job_events_archive WHERE job_id = ?
+        UNION ALL
+        SELECT 1 AS live, id, ts, kind, detail FROM job_events WHERE job_id = ?
     """
-    Insert a new job into the queue.
+    if limit is None:
+        sql = f"SELECT id, ts, kind, detail FROM ({events}) ORDER BY live, id"
+        params: Tuple[Any, ...] = (job_id, job_id)
+    else:
+        sql = f"""
+            SELECT id, ts, kind, detail FROM (
+                SELECT * FROM ({events}) ORDER BY live DESC, id DESC LIMIT ?
+            ) ORDER BY live, id
+        """
+        params = (job_id, job_id, limit)
+    with read_conn() as conn:
+        return [dict(r) for r in conn.execute(sql, params)]
 
-    Compatibility shim: accepts callers passing `kind=` and maps it to `content_type`.
-    Keyword-only prevents positional collisions.
+# -------- Content hashes --------
+# file_hashes remembers each path's SHA-256 with the size and mtime it was
+# taken at, so an unchanged file is never read twice.
+
+def file_hashes(paths: List[str]) -> Dict[str, Optional[str]]:
+    """
+    SHA-256 for each path (None if it can't be read).
+
+    Stored hashes are reused while size and mtime match; the rest are read
+    in chunks outside any transaction and then stored in one write.
+    """
+    stats: Dict[str, os.stat_result] = {}
+    out: Dict[str, Optional[str]] = {}
+    for path in dict.fromkeys(paths):
+        try:
+            stats[path] = os.stat(path)
+        except OSError:
+            out[path] = None
+    keys = [Path(p).as_posix() for p in stats]
+    cached: Dict[str, Dict[str, Any]] = {}
+    with read_conn() as conn:
+        for i in range(0, len(keys), _BULK_CHUNK):
+            chunk = keys[i:i + _BULK_CHUNK]
+            cur = conn.execute(
+                f"SELECT path, size, mtime_ns, sha256 FROM file_hashes WHERE path IN ({', '.join('?' for _ in chunk)})",
+                chunk,
+            )
+            cached.update((row["path"], row) for row in cur)
+
+    fresh = []
+    for (path, st), key in zip(stats.items(), keys):
+        row = cached.get(key)
+        if row and row["size"] == st.st_size and row["mtime_ns"] == st.st_mtime_ns:
+            out[path] = row["sha256"]
+            continue
+        try:
+            out[path] = sha256_file(path)
+        except OSError:
+            out[path] = None
+            continue
+        fresh.append((key, st.st_size, st.st_mtime_ns, out[path], _now_iso()))
+
+    if fresh:
+        submit_write(lambda conn: conn.executemany(
+            """
+            INSERT INTO file_hashes (path, size, mtime_ns, sha256, hashed_at) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(path) DO UPDATE SET
+                size = excluded.size, mtime_ns = excluded.mtime_ns,
+                sha256 = excluded.sha256, hashed_at = excluded.hashed_at,
+                phash = CASE WHEN sha256 = excluded.sha256 THEN phash END
+            """,
+            fresh,
+        ))
+    return out
+
+def file_hash(path: str) -> Optional[str]:
+    return file_hashes([path])[path]
+
+def stored_phashes(paths: List[str]) -> Dict[str, Optional[int]]:
+    """
+    Perceptual hashes kept in file_hashes for these paths (None where missing).
+
+    Call after file_hashes(), which clears a stored phash when the file changed.
+    """
+    keys = {path: Path(path).as_posix() for path in paths}
+    found: Dict[str, Optional[int]] = {}
+    unique = sorted(set(keys.values()))
+    with read_conn() as conn:
+        for i in range(0, len(unique), _BULK_CHUNK):
+            chunk = unique[i:i + _BULK_CHUNK]
+            cur = conn.execute(
+                f"SELECT path, phash FROM file_hashes WHERE path IN ({', '.join('?' for _ in chunk)})",
+                chunk,
+            )
+            found.update((row["path"], row["phash"]) for row in cur)
+    return {path: found.get(key) for path, key in keys.items()}
+
+def store_phashes(phashes: Dict[str, int]) -> None:
+    """Remember perceptual hashes next to the content hashes of the same files."""
+    rows = [(value, Path(path).as_posix()) for path, value in phashes.items() if value is not None]
+    if rows:
+        submit_write(lambda conn: conn.executemany("UPDATE file_hashes SET phash = ? WHERE path = ?", rows))
+
+def client_phashes(client: str, after_id: int = 0) -> List[Tuple[int, int]]:
+    """(job id, phash) of the client's live and archived jobs with id > after_id."""
+    sql = """
+        SELECT id, phash FROM {table}
+        WHERE client = ? AND id > ? AND phash IS NOT NULL AND status NOT IN ('duplicate', 'dead')
     """
+    with read_conn() as conn:
+        return [
+            (row["id"], row["phash"])
+            for table in ("jobs", "jobs_archive")
+            for row in conn.execute(sql.format(table=table), (client, after_id))
+        ]
+
+def jobs_with_hash(client: str, content_hash: str) -> List[Job]:
+    """The client's jobs (live and archived) for this media, oldest first."""
+    with read_conn() as conn:
+        return _fetch_jobs(
+            conn,
+            """
+            SELECT id, client, path, content_type, status, created_at, done_at, content_hash FROM jobs
+            WHERE client = ? AND content_hash = ?
+            UNION ALL
+            SELECT id, client, path, content_type, status, created_at, done_at, content_hash FROM jobs_archive
+            WHERE client = ? AND content_hash = ?
+            ORDER BY id
+            """,
+            (client, content_hash, client, content_hash),
+        )
+
+# -------- Queries / Commands --------
+def get_job_by_path(client: str, path: str) -> Optional[Job]:
+    with read_conn() as conn:
+        rows = _fetch_jobs(
+            conn,
+            """
+            SELECT * FROM jobs
+            WHERE client = ? AND path = ?
+            ORDER BY id DESC
+            LIMIT 1
+            """,
+            (client, path),
+        )
+    return rows[0] if rows else None
+
+def _job_values(
+    who: str,
+    client: str,
+    path: str,
+    content_type: str | None,
+    caption: str | None,
+    eta: str | None,
+    extras: dict | None,
+    kwargs: Dict[str, Any],
+    content_hash: str | None = None,
+    phash: int | None = None,
+) -> Tuple[Any, ...]:
+    """Validate one job and return its INSERT parameters (see _INSERT_JOB_SQL)."""
     # --- Compatibility shim: allow kind= from newer callers ---
     if content_type is None and "kind" in kwargs:
         content_type = kwargs.get("kind")
 
     if not client:
-        raise ValueError("add_job: missing client")
+        raise ValueError(f"{who}: missing client")
     if not path:
-        raise ValueError("add_job: missing path")
+        raise ValueError(f"{who}: missing path")
     if not content_type:
-        raise ValueError("add_job: missing content_type (or kind)")
+        raise ValueError(f"{who}: missing content_type (or kind)")
 
     if extras is None:
         extras = {}
@@ -134,97 +720,992 @@ def add_job(
     # Default eta to now if not provided (prevents NOT NULL failures)
     if eta is None:
         eta = created_at
+    try:
+        eta_epoch = _epoch(eta)
+    except ValueError:
+        raise ValueError(f"{who}: eta is not an ISO timestamp: {eta!r}")
 
-    conn = _conn()
-    with conn:
-        cur = conn.execute(
-            """
-            INSERT INTO jobs (client, path, content_type, caption, eta, status, extras, created_at)
-            VALUES (?, ?, ?, ?, ?, 'queued', ?, ?)
-            """,
-            (client, path_str, content_type, caption, eta, json.dumps(extras), created_at),
+    return (
+        client, path_str, content_type, caption, eta, eta_epoch, json.dumps(extras), created_at, content_hash, phash
+    )
+
+_INSERT_JOB_SQL = """
+    INSERT INTO jobs (
+        client, path, content_type, caption, eta, eta_epoch, status, extras, created_at, content_hash, phash
+    )
+    VALUES (?, ?, ?, ?, ?, ?, 'queued', ?, ?, ?, ?)
+"""
+
+# Same media as a job the client already has: kept for the record, never posted.
+_INSERT_DUPLICATE_SQL = _INSERT_JOB_SQL.replace("'queued'", "'duplicate'")
+
+# An active (client, path) is unique (ux_jobs_client_path, partial); these pick
+# what enqueueing a file that is already queued or in progress does.
+_ON_CONFLICT_SQL = {
+    # keep the existing row untouched
+    "skip": f"ON CONFLICT(client, path) WHERE {_ACTIVE_SQL} DO NOTHING",
+    # overwrite it with the new job and put it back in the queue
+    "replace": f"""
+        ON CONFLICT(client, path) WHERE {_ACTIVE_SQL} DO UPDATE SET
+            content_type = excluded.content_type,
+            caption = excluded.caption,
+            eta = excluded.eta,
+            eta_epoch = excluded.eta_epoch,
+            status = 'queued',
+            extras = excluded.extras,
+            created_at = excluded.created_at,
+            content_hash = excluded.content_hash,
+            phash = excluded.phash,
+            started_at = NULL,
+            done_at = NULL,
+            error = NULL,
+            attempts = 0,
+            worker_id = NULL,
+            lease_expires_at = NULL,
+            heartbeat_at = NULL,
+            lease_losses = 0,
+            failures = 0
+    """,
+}
+
+def add_job(
+    client: str,
+    path: str,
+    *,
+    content_type: str | None = None,
+    caption: str | None = None,
+    eta: str | None = None,
+    extras: dict | None = None,
+    on_conflict: str = "skip",
+    content_hash: str | None = None,
+    phash: int | None = None,
+    **kwargs,
+) -> Optional[int]:
+    """
+    Insert a new job into the queue.
+
+    An active (queued or in-progress) job for the same (client, path) may
+    already exist. With on_conflict='skip' that row is kept and None is
+    returned. With 'replace' it is overwritten and re-queued, and its id is
+    returned. Finished jobs don't conflict: re-adding a posted file queues a
+    new job and leaves the old row as history. Either way it is a single
+    INSERT ... ON CONFLICT statement, so concurrent producers cannot race.
+
+    `content_hash` and `phash` are only stored; add_jobs_bulk is the enqueue
+    path that dedupes by content.
+
+    Compatibility shim: accepts callers passing `kind=` and maps it to `content_type`.
+    Keyword-only prevents positional collisions.
+    """
+    if on_conflict not in _ON_CONFLICT_SQL:
+        raise ValueError(f"add_job: on_conflict must be one of {sorted(_ON_CONFLICT_SQL)}")
+    values = _job_values(
+        "add_job", client, path, content_type, caption, eta, extras, kwargs, content_hash, phash
+    )
+    with write_conn() as conn, conn:
+        row = conn.execute(
+            f"{_INSERT_JOB_SQL} {_ON_CONFLICT_SQL[on_conflict]} RETURNING id", values
+        ).fetchone()
+    return int(row["id"]) if row else None
+
+# Bound parameters per IN (...) lookup; stays under SQLite's historical 999 limit.
+_BULK_CHUNK = 500
+
+# What add_jobs_bulk does with media the client already has a job for
+ON_DUPLICATE_CONTENT = ("skip", "link", "allow")
+
+def _group_by_client(pairs: Iterable[Tuple[str, str]]) -> List[Tuple[str, List[str]]]:
+    """(client, value) pairs -> [(client, chunk of distinct values)], chunks of at most _BULK_CHUNK"""
+    by_client: Dict[str, set] = {}
+    for client, value in pairs:
+        by_client.setdefault(client, set()).add(value)
+    groups = []
+    for client in sorted(by_client):
+        values = sorted(by_client[client])
+        groups.extend((client, values[i:i + _BULK_CHUNK]) for i in range(0, len(values), _BULK_CHUNK))
+    return groups
+
+def add_jobs_bulk(
+    rows: List[Dict[str, Any]], on_duplicate: str = "skip"
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Enqueue many jobs in a single transaction.
+
+    Each row takes the same keys as add_job's arguments (client, path,
+    content_type or kind, caption, eta, extras, content_hash, phash). Rows whose
+    (client, path) is already in the DB, or repeated within `rows`, are
+    skipped. Existing rows are found with one set-based lookup per chunk and
+    the new ones go in with executemany, so a large backfill costs one commit
+    instead of one per file. Archived jobs count as existing.
+
+    Rows are also deduped by content: the file's SHA-256 (file_hashes, taken
+    before the transaction) is checked against the client's jobs, archived
+    ones included. A match is dropped with on_duplicate='skip', or with 'link'
+    inserted as status 'duplicate' with extras.duplicate_of = the original's
+    id, so it is on record but never posted. 'allow' turns this off.
+
+    Returns {"inserted": [...], "skipped": [...], "duplicates": [...]} holding
+    the input rows; each duplicate also gets "duplicate_of".
+    """
+    if on_duplicate not in ON_DUPLICATE_CONTENT:
+        raise ValueError(f"add_jobs_bulk: on_duplicate must be one of {ON_DUPLICATE_CONTENT}")
+    hashes: Dict[str, Optional[str]] = {}
+    if on_duplicate != "allow":
+        hashes = file_hashes([r["path"] for r in rows if r.get("path") and not r.get("content_hash")])
+
+    prepared: List[Tuple[Dict[str, Any], Tuple[Any, ...]]] = []
+    for r in rows:
+        extra_kwargs = {"kind": r["kind"]} if "kind" in r else {}
+        values = _job_values(
+            "add_jobs_bulk", r.get("client"), r.get("path"), r.get("content_type"),
+            r.get("caption"), r.get("eta"), r.get("extras"), extra_kwargs,
+            r.get("content_hash") or hashes.get(r.get("path")), r.get("phash"),
         )
-        return int(cur.lastrowid)
+        prepared.append((r, values))
+
+    inserted: List[Dict[str, Any]] = []
+    skipped: List[Dict[str, Any]] = []
+    duplicates: List[Dict[str, Any]] = []
+    if not prepared:
+        return {"inserted": inserted, "skipped": skipped, "duplicates": duplicates}
+
+    with write_conn() as conn, _write_txn(conn):
+        # Per client, a seek on idx_jobs_client_path / idx_jobs_archive_client_path
+        existing = set()
+        for client, chunk in _group_by_client((values[0], values[1]) for _, values in prepared):
+            marks = ", ".join("?" for _ in chunk)
+            for table in ("jobs", "jobs_archive"):
+                cur = conn.execute(
+                    f"SELECT path FROM {table} WHERE client = ? AND path IN ({marks})", (client, *chunk)
+                )
+                existing.update((client, row["path"]) for row in cur)
+
+        # (client, content_hash) -> id of the job that has that media first
+        originals: Dict[Tuple[str, str], Optional[int]] = {}
+        if on_duplicate != "allow":
+            # Per client, so each lookup is a seek on idx_jobs_client_hash /
+            # idx_jobs_archive_client_hash rather than a scan of the index
+            digests = _group_by_client((values[0], values[8]) for _, values in prepared if values[8])
+            for client, chunk in digests:
+                marks = ", ".join("?" for _ in chunk)
+                for table in ("jobs", "jobs_archive"):
+                    cur = conn.execute(
+                        f"""
+                        SELECT content_hash, MIN(id) AS id FROM {table}
+                        WHERE client = ? AND content_hash IN ({marks})
+                          AND status NOT IN ('duplicate', 'dead')
+                        GROUP BY content_hash
+                        """,
+                        (client, *chunk),
+                    )
+                    for row in cur:
+                        key = (client, row["content_hash"])
+                        originals[key] = min(row["id"], originals.get(key) or row["id"])
+
+        to_insert = []
+        to_link = []
+        for r, values in prepared:
+            key = (values[0], values[1])
+            if key in existing:
+                skipped.append(r)
+                continue
+            existing.add(key)
+            media = (values[0], values[8])
+            if values[8] and on_duplicate != "allow" and media in originals:
+                duplicates.append(r)
+                to_link.append((r, values, media))
+                continue
+            if values[8]:
+                originals[media] = None  # first in this batch; id known after insert
+            inserted.append(r)
+            to_insert.append(values)
+        if to_insert:
+            conn.executemany(f"{_INSERT_JOB_SQL} {_ON_CONFLICT_SQL['skip']}", to_insert)
+
+        for r, values, media in to_link:
+            if originals[media] is None:
+                originals[media] = conn.execute(
+                    "SELECT MIN(id) AS id FROM jobs WHERE client = ? AND content_hash = ? AND status != 'duplicate'",
+                    media,
+                ).fetchone()["id"]
+            r["duplicate_of"] = originals[media]
+        if on_duplicate == "link" and to_link:
+            conn.executemany(
+                f"{_INSERT_DUPLICATE_SQL} {_ON_CONFLICT_SQL['skip']}",
+                [
+                    (*values[:6], json.dumps({**json.loads(values[6]), "duplicate_of": r["duplicate_of"]}), *values[7:])
+                    for r, values, _ in to_link
+                ],
+            )
+
+    return {"inserted": inserted, "skipped": skipped, "duplicates": duplicates}
+
+def _due_filter(client: str | None, now: str) -> Tuple[str, List[Any]]:
+    """
+    WHERE/ORDER BY shared by get_due_jobs and claim_due_jobs.
+
+    Matches the partial indexes idx_jobs_due / idx_jobs_client_due, so SQLite
+    walks the index range and stops after LIMIT rows with no sort step.
+    """
+    where = "status = 'queued' AND eta_epoch <= ?"
+    params: List[Any] = [_epoch(now)]
+    if client:
+        where = "client = ? AND " + where
+        params.insert(0, client)
+    return f"WHERE {where} ORDER BY eta_epoch ASC, id ASC", params
 
 def get_due_jobs(
     limit: int = 50,
     client: str | None = None,
     now_iso: str | None = None,
-) -> List[Dict[str, Any]]:
-    conn = _conn()
+) -> List[Job]:
+    """Peek at due jobs without claiming them (use claim_due_jobs to dequeue)."""
     now = now_iso or _now_iso()
+    where, params = _due_filter(client, now)
+    with read_conn() as conn:
+        return _fetch_jobs(conn, f"SELECT * FROM jobs {where} LIMIT ?", (*params, limit))
+
+def list_queue(limit: int = 200, client: str | None = None) -> List[Job]:
+    """Queued jobs (due or not) in dequeue order, for status listings."""
+    where = "WHERE status = 'queued'"
+    params: List[Any] = []
     if client:
-        cur = conn.execute(
-            """
-            SELECT * FROM jobs
-            WHERE client = ?
-              AND status = 'queued'
-              AND (eta IS NULL OR eta <= ?)
-            ORDER BY COALESCE(eta, created_at) ASC, id ASC
+        where += " AND client = ?"
+        params.append(client)
+    with read_conn() as conn:
+        return _fetch_jobs(
+            conn, f"SELECT * FROM jobs {where} ORDER BY eta_epoch ASC, id ASC LIMIT ?", (*params, limit)
+        )
+
+def default_worker_id() -> str:
+    """Identifier for this runner process: '<host>:<pid>'."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def claim_due_jobs(
+    worker_id: str,
+    limit: int = 50,
+    lease_seconds: int = 300,
+    client: str | None = None,
+    now_iso: str | None = None,
+    per_client_limit: int | None = None,
+) -> List[Job]:
+    """
+    Atomically dequeue up to `limit` due jobs for `worker_id`.
+
+    Selection and the move to 'in_progress' happen in one write transaction,
+    so concurrent runners on the same DB never receive the same row. Each
+    claimed row records its owner and a lease expiry of now + lease_seconds.
+
+    With per_client_limit (and no `client`), at most that many jobs are taken
+    per client and clients are interleaved round-robin, so one client's
+    backlog can't starve the rest.
+    """
+    if not worker_id:
+        raise ValueError("claim_due_jobs: missing worker_id")
+    now = now_iso or _now_iso()
+    lease_expires_at = _iso_after(now, lease_seconds)
+    where, params = _due_filter(client, now)
+    if per_client_limit and client is None:
+        select_sql = f"""
+            SELECT id FROM (
+                SELECT id, eta_epoch,
+                       ROW_NUMBER() OVER (PARTITION BY client ORDER BY eta_epoch, id) AS turn
+                FROM jobs {where}
+            )
+            WHERE turn <= ?
+            ORDER BY turn, eta_epoch, id
             LIMIT ?
+        """
+        params = (*params, per_client_limit)
+    else:
+        select_sql = f"SELECT id FROM jobs {where} LIMIT ?"
+    with write_conn() as conn, _write_txn(conn):
+        ids = [r["id"] for r in conn.execute(select_sql, (*params, limit))]
+        if not ids:
+            return []
+        marks = ", ".join("?" for _ in ids)
+        conn.execute(
+            f"""
+            UPDATE jobs
+            SET status = 'in_progress',
+                started_at = ?,
+                attempts = COALESCE(attempts, 0) + 1,
+                worker_id = ?,
+                lease_expires_at = ?
+            WHERE id IN ({marks}) AND status = 'queued'
             """,
-            (client, now, limit),
+            (now, worker_id, lease_expires_at, *ids),
         )
-    else:
+        _log_events(conn, ids, "claimed", worker_id, now)
+        return _fetch_jobs(
+            conn, f"SELECT * FROM jobs WHERE id IN ({marks}) ORDER BY eta_epoch ASC, id ASC", ids
+        )
+
+# -------- Leases / Heartbeats --------
+# After this many lost leases a job is parked as 'poison' instead of re-queued.
+MAX_LEASE_LOSSES = 3
+# In-progress rows claimed before leases existed have no expiry; reap them after this.
+LEGACY_STALE_SECONDS = 3600
+
+def heartbeat(job_id: int, worker_id: str, lease_seconds: int = 300) -> bool:
+    """
+    Extend the lease on a claimed job and record a heartbeat.
+
+    Returns False when `worker_id` no longer owns the job (lease reaped or job
+    finished); the caller should stop working on it.
+    """
+    now = _now_iso()
+    with write_conn() as conn, conn:
         cur = conn.execute(
             """
-            SELECT * FROM jobs
-            WHERE status = 'queued'
-              AND (eta IS NULL OR eta <= ?)
-            ORDER BY COALESCE(eta, created_at) ASC, id ASC
-            LIMIT ?
+            UPDATE jobs
+            SET heartbeat_at = ?, lease_expires_at = ?
+            WHERE id = ? AND worker_id = ? AND status = 'in_progress'
             """,
-            (now, limit),
+            (now, _iso_after(now, lease_seconds), job_id, worker_id),
         )
-    rows = cur.fetchall() or []
-    for r in rows:
+        return cur.rowcount > 0
+
+def reap_expired_leases(
+    max_lease_losses: int = MAX_LEASE_LOSSES,
+    now_iso: str | None = None,
+    conn: sqlite3.Connection | None = None,
+) -> Dict[str, int]:
+    """
+    Release in_progress jobs whose lease has expired.
+
+    Each reaped job counts a lost lease; it goes back to 'queued' until it has
+    lost `max_lease_losses` leases, then it is parked as 'poison' so a job that
+    keeps crashing its worker stops being handed out.
+    """
+    now = now_iso or _now_iso()
+    legacy_cutoff = _iso_after(now, -LEGACY_STALE_SECONDS)
+    expired = """
+        status = 'in_progress'
+        AND (lease_expires_at < ? OR (lease_expires_at IS NULL AND started_at < ?))
+    """
+    note = "'Lease expired (worker ' || COALESCE(worker_id, '?') || ')'"
+    counts = {}
+    with (nullcontext(conn) if conn is not None else write_conn()) as conn, _write_txn(conn):
+        # Poison first, so the requeue pass only sees what's left
+        for key, kind, status, extra, params in (
+            ("poisoned", "poisoned", "poison", "AND lease_losses + 1 >= ?", (now, legacy_cutoff, max_lease_losses)),
+            ("requeued", "lease_expired", "queued", "", (now, legacy_cutoff)),
+        ):
+            # Log before the update clears worker_id
+            conn.execute(
+                f"""
+                INSERT INTO job_events (job_id, ts, kind, detail)
+                SELECT id, ?, ?, {note} FROM jobs WHERE {expired} {extra}
+                """,
+                (now, kind, *params),
+            )
+            counts[key] = conn.execute(
+                f"""
+                UPDATE jobs
+                SET status = '{status}',
+                    lease_losses = lease_losses + 1,
+                    error = {note},
+                    worker_id = NULL,
+                    lease_expires_at = NULL
+                WHERE {expired} {extra}
+                """,
+                params,
+            ).rowcount
+    return counts
+
+def start_reaper(interval_seconds: float = 30.0, **kwargs) -> threading.Event:
+    """
+    Run reap_expired_leases every `interval_seconds` on a daemon thread.
+
+    The thread uses its own connection. Set the returned event to stop it.
+    """
+    stop = threading.Event()
+
+    def _loop() -> None:
+        conn = _connect()
+        try:
+            while not stop.wait(interval_seconds):
+                try:
+                    res = reap_expired_leases(conn=conn, **kwargs)
+                    if res["requeued"] or res["poisoned"]:
+                        print(f"[reaper] requeued={res['requeued']} poisoned={res['poisoned']}")
+                except Exception as e:
+                    print(f"[reaper] error: {e}")
+        finally:
+            conn.close()
+
+    threading.Thread(target=_loop, name="lease-reaper", daemon=True).start()
+    return stop
+
+# -------- Group commit --------
+# State transitions from every worker thread are queued and committed together:
+# the flusher waits up to _FLUSH_INTERVAL after the first op (or until
+# _MAX_BATCH ops are queued) and applies the whole batch in one transaction.
+_FLUSH_INTERVAL = float(os.environ.get("AUTOPOSTER_DB_FLUSH_MS", "5")) / 1000.0
+_MAX_BATCH = int(os.environ.get("AUTOPOSTER_DB_MAX_BATCH", "256"))
+
+WriteOp = Callable[[sqlite3.Connection], Any]
+
+class _WriteBatcher:
+    """Background flusher that commits queued write ops in batches."""
+
+    def __init__(self, flush_interval: float, max_batch: int):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[Tuple[WriteOp, Future]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, op: WriteOp) -> Future:
+        fut: Future = Future()
+        self._queue.put((op, fut))
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="db-group-commit", daemon=True)
+                    self._thread.start()
+        return fut
+
+    def drain(self) -> None:
+        """Flush everything queued so far on the calling thread (used at exit)."""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._flush(batch)
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch: List[Tuple[WriteOp, Future]]) -> None:
+        # Each op runs in its own savepoint so one bad op doesn't sink the batch.
+        outcomes: List[Tuple[Future, Any, Optional[BaseException]]] = []
         try:
-            r["extras"] = json.loads(r.get("extras") or "{}")
-        except Exception:
-            r["extras"] = {}
-    return rows
-
-def mark_in_progress(job_id: int) -> None:
-    conn = _conn()
-    with conn:
+            with write_conn() as conn, _write_txn(conn):
+                for op, fut in batch:
+                    conn.execute("SAVEPOINT batch_op")
+                    try:
+                        res = op(conn)
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO batch_op")
+                        outcomes.append((fut, None, e))
+                    else:
+                        outcomes.append((fut, res, None))
+                    conn.execute("RELEASE batch_op")
+        except Exception as e:
+            for _, fut in batch:
+                fut.set_exception(e)
+            return
+        # Ack only after the commit: a resolved future means the write is durable.
+        for fut, res, err in outcomes:
+            if err is not None:
+                fut.set_exception(err)
+            else:
+                fut.set_result(res)
+
+_BATCHER = _WriteBatcher(_FLUSH_INTERVAL, _MAX_BATCH)
+atexit.register(_BATCHER.drain)
+
+def submit_write(op: WriteOp, wait: bool = True) -> Any:
+    """
+    Queue `op(conn)` for the next group commit.
+
+    With wait=True (durable ack) block until the batch holding `op` has
+    committed and return op's result. With wait=False return a Future at once;
+    it resolves after the commit. Ops submitted later never commit before
+    earlier ones, so waiting on one write also covers every write queued
+    before it. A thread already inside write_conn() runs `op` inline, as part
+    of its own transaction.
+    """
+    if getattr(_LOCAL, "writing", 0):
+        res = op(_WRITER)
+        if wait:
+            return res
+        fut: Future = Future()
+        fut.set_result(res)
+        return fut
+    fut = _BATCHER.submit(op)
+    return fut.result() if wait else fut
+
+def _mark_in_progress_op(conn: sqlite3.Connection, job_id: int, now: str) -> None:
+    conn.execute(
+        """
+        UPDATE jobs
+        SET status = 'in_progress',
+            started_at = ?,
+            attempts = COALESCE(attempts, 0) + 1
+        WHERE id = ?
+        """,
+        (now, job_id),
+    )
+    _log_events(conn, [job_id], "started", None, now)
+
+def mark_in_progress(job_id: int, wait: bool = True) -> Optional[Future]:
+    fut = submit_write(partial(_mark_in_progress_op, job_id=job_id, now=_now_iso()), wait)
+    return None if wait else fut
+
+def _utc_day(iso: str) -> str:
+    """'YYYY-MM-DD' (UTC) for an ISO timestamp from _now_iso."""
+    return iso[:10]
+
+def _mark_done_op(conn: sqlite3.Connection, job_id: int, now: str) -> None:
+    cur = conn.execute(
+        """
+        UPDATE jobs
+        SET status = 'done',
+            done_at = ?,
+            lease_expires_at = NULL
+        WHERE id = ? AND status != 'done'
+        """,
+        (now, job_id),
+    )
+    if cur.rowcount:
+        _log_events(conn, [job_id], "done", None, now)
         conn.execute(
             """
-            UPDATE jobs
-            SET status = 'in_progress',
-                started_at = ?,
-                attempts = COALESCE(attempts, 0) + 1
-            WHERE id = ?
+            INSERT INTO quota_usage (client, content_type, day, used)
+            SELECT client, content_type, ?, 1 FROM jobs WHERE id = ?
+            ON CONFLICT(client, content_type, day) DO UPDATE SET used = used + 1
             """,
-            (_now_iso(), job_id),
+            (_utc_day(now), job_id),
         )
 
-def mark_done(job_id: int) -> None:
-    conn = _conn()
-    with conn:
+def mark_done(job_id: int, wait: bool = True) -> Optional[Future]:
+    """
+    Mark a job done and count it against today's quota in the same transaction.
+
+    Goes through the group commit; with wait=False returns the Future to wait on.
+    """
+    fut = submit_write(partial(_mark_done_op, job_id=job_id, now=_now_iso()), wait)
+    return None if wait else fut
+
+# -------- Quotas --------
+def quota_used(client: str, content_type: str, day: str | None = None) -> int:
+    """Jobs of this type completed for `client` on `day` (UTC 'YYYY-MM-DD', default today)."""
+    with read_conn() as conn:
+        row = conn.execute(
+            "SELECT used FROM quota_usage WHERE client = ? AND content_type = ? AND day = ?",
+            (client, content_type, day or _utc_day(_now_iso())),
+        ).fetchone()
+    return int(row["used"]) if row else 0
+
+def _reschedule_op(
+    conn: sqlite3.Connection, job_id: int, new_eta: str, reason: str | None, now: str
+) -> None:
+    cur = conn.execute(
+        """
+        UPDATE jobs
+        SET eta = ?, eta_epoch = ?, status = 'queued', worker_id = NULL, lease_expires_at = NULL
+        WHERE id = ?
+        """,
+        (new_eta, _epoch(new_eta), job_id),
+    )
+    if cur.rowcount:
+        _log_events(conn, [job_id], "rescheduled", f"{new_eta}: {reason}" if reason else new_eta, now)
+
+def reschedule(
+    job_id: int, new_eta: str, reason: str | None = None, wait: bool = True
+) -> Optional[Future]:
+    """Put a job back in the queue at `new_eta`, releasing any lease on it."""
+    _epoch(new_eta)  # reject a bad timestamp here, not inside someone else's batch
+    op = partial(_reschedule_op, job_id=job_id, new_eta=new_eta, reason=reason, now=_now_iso())
+    fut = submit_write(op, wait)
+    return None if wait else fut
+
+# -------- Retry policy --------
+class RetryPolicy(NamedTuple):
+    """
+    Backoff for one error class: the n-th failure waits
+    min(max_delay, base_delay * factor ** (n - 1)) seconds, minus up to
+    `jitter` of that (0 = none, 1 = full jitter). The job goes 'dead' on its
+    `max_attempts`-th failure.
+    """
+    base_delay: float
+    factor: float
+    max_delay: float
+    jitter: float
+    max_attempts: int
+
+RETRY_POLICIES: Dict[str, RetryPolicy] = {
+    "default": RetryPolicy(60, 2, 3600, 0.2, 5),
+    # network errors, timeouts, 5xx: retry soon and often
+    "transient": RetryPolicy(30, 2, 1800, 0.5, 8),
+    # 429 / platform throttling: back off hard
+    "rate_limit": RetryPolicy(900, 2, 6 * 3600, 0.25, 6),
+    # session or credentials rejected: give someone time to fix them
+    "auth": RetryPolicy(1800, 2, 6 * 3600, 0.1, 3),
+    # missing file, invalid media, 4xx: retrying won't help
+    "permanent": RetryPolicy(0, 1, 0, 0.0, 1),
+}
+
+_RETRY_ERROR_NAMES = {
+    "auth": AUTH_ERROR_NAMES,
+    "rate_limit": {"TooManyRequests", "RateLimitError", "PleaseWaitFewMinutes", "FeedbackRequired"},
+    # Validation errors only: a bare ValueError (e.g. JSONDecodeError of a
+    # garbled API reply) says nothing about whether a retry could succeed.
+    "permanent": {"UnsupportedMediaError", "UnidentifiedImageError", "DecompressionBombError"},
+}
+
+def set_retry_policy(error_class: str, **changes: Any) -> RetryPolicy:
+    """Override fields of one error class's policy (new classes start from 'default')."""
+    base = RETRY_POLICIES.get(error_class, RETRY_POLICIES["default"])
+    RETRY_POLICIES[error_class] = policy = base._replace(**changes)
+    return policy
+
+def retry_policy(error_class: str | None) -> RetryPolicy:
+    return RETRY_POLICIES.get(error_class or "default", RETRY_POLICIES["default"])
+
+def classify_error(error: BaseException | str | None) -> str:
+    """
+    Map an exception to a RETRY_POLICIES key; plain messages are 'default'.
+
+    Wrappers such as PostingError say nothing on their own, so the
+    __cause__/__context__ chain is walked and the first link that classifies
+    as something other than 'default' decides.
+    """
+    seen = set()
+    while isinstance(error, BaseException) and id(error) not in seen:
+        seen.add(id(error))
+        error_class = _classify_one(error)
+        if error_class != "default":
+            return error_class
+        error = error.__cause__ or error.__context__
+    return "default"
+
+def _classify_one(error: BaseException) -> str:
+    names = {cls.__name__ for cls in type(error).__mro__}
+    for error_class, known in _RETRY_ERROR_NAMES.items():
+        if names & known:
+            return error_class
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    if status in (401, 403):
+        return "auth"
+    if status == 429:
+        return "rate_limit"
+    if isinstance(status, int) and status >= 500:
+        return "transient"
+    if isinstance(error, (FileNotFoundError, IsADirectoryError, NotADirectoryError)) or (
+        isinstance(status, int) and 400 <= status < 500
+    ):
+        return "permanent"
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return "transient"
+    return "default"
+
+def retry_delay(policy: RetryPolicy, failures: int) -> float:
+    """Seconds to wait after the `failures`-th failure (1-based), jitter applied."""
+    delay = min(policy.max_delay, policy.base_delay * policy.factor ** max(0, failures - 1))
+    return delay * (1.0 - policy.jitter * random.random())
+
+def _fail_job_op(
+    conn: sqlite3.Connection, job_id: int, error_class: str, message: str, now: str
+) -> Optional[str]:
+    row = conn.execute("SELECT failures FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if row is None:
+        return None
+    failures = (row["failures"] or 0) + 1
+    policy = retry_policy(error_class)
+    note = f"Failed ({error_class}, {failures}/{policy.max_attempts}): {message}"
+    if failures >= policy.max_attempts:
         conn.execute(
             """
             UPDATE jobs
-            SET status = 'done',
-                done_at = ?
+            SET status = 'dead', failures = ?, error = ?, worker_id = NULL, lease_expires_at = NULL
             WHERE id = ?
             """,
-            (_now_iso(), job_id),
+            (failures, _clip_error(note), job_id),
         )
+        _log_events(conn, [job_id], "dead", note, now)
+        return None
+    eta = _iso_after(now, math.ceil(retry_delay(policy, failures)))
+    conn.execute(
+        """
+        UPDATE jobs
+        SET status = 'queued', eta = ?, eta_epoch = ?, failures = ?, error = ?,
+            worker_id = NULL, lease_expires_at = NULL
+        WHERE id = ?
+        """,
+        (eta, _epoch(eta), failures, _clip_error(note), job_id),
+    )
+    _log_events(conn, [job_id], "failed", f"{note} (retry at {eta})", now)
+    return eta
 
-def reschedule(job_id: int, new_eta: str, reason: str | None = None) -> None:
-    conn = _conn()
-    with conn:
-        if reason:
-            row = conn.execute("SELECT error FROM jobs WHERE id = ?", (job_id,)).fetchone()
-            prev = (row or {}).get("error") or ""
-            sep = "\n" if prev else ""
-            new_err = f"{prev}{sep}Rescheduled: {reason}"
-            conn.execute(
-                "UPDATE jobs SET eta = ?, error = ? WHERE id = ?",
-                (new_eta, new_err, job_id),
+def fail_job(
+    job_id: int,
+    error: BaseException | str,
+    error_class: str | None = None,
+    wait: bool = True,
+) -> Optional[str] | Future:
+    """
+    Record a failed attempt and retry the job per its error class's RetryPolicy.
+
+    `error_class` defaults to classify_error(error). Returns the retry ETA, or
+    None once the job has used up its attempts and is now 'dead' (requeue_dead
+    brings it back). With wait=False returns a Future of that result.
+    """
+    error_class = error_class or classify_error(error)
+    message = f"{type(error).__name__}: {error}" if isinstance(error, BaseException) else str(error)
+    op = partial(_fail_job_op, job_id=job_id, error_class=error_class, message=message, now=_now_iso())
+    return submit_write(op, wait)
+
+def list_dead(limit: int = 200, client: str | None = None) -> List[Job]:
+    """Dead jobs, newest first, for review before requeue_dead."""
+    where = "WHERE status = 'dead'"
+    params: List[Any] = []
+    if client:
+        where += " AND client = ?"
+        params.append(client)
+    with read_conn() as conn:
+        return _fetch_jobs(conn, f"SELECT * FROM jobs {where} ORDER BY id DESC LIMIT ?", (*params, limit))
+
+def requeue_dead(
+    client: str | None = None,
+    job_ids: List[int] | None = None,
+    eta: str | None = None,
+    include_poison: bool = False,
+) -> int:
+    """
+    Put dead jobs (all, one client's, or just `job_ids`) back in the queue at
+    `eta` (default now) with a fresh failure budget. include_poison also
+    releases jobs the reaper parked as 'poison'. Returns how many were requeued.
+    """
+    eta = eta or _now_iso()
+    statuses = ("dead", "poison") if include_poison else ("dead",)
+    where = f"status IN ({', '.join('?' for _ in statuses)})"
+    params: List[Any] = [eta, _epoch(eta), *statuses]
+    if client:
+        where += " AND client = ?"
+        params.append(client)
+    if job_ids is not None:
+        if not job_ids:
+            return 0
+        where += f" AND id IN ({', '.join('?' for _ in job_ids)})"
+        params.extend(int(j) for j in job_ids)
+
+    def op(conn: sqlite3.Connection) -> int:
+        ids = [
+            r["id"]
+            for r in conn.execute(
+                f"""
+                UPDATE jobs
+                SET status = 'queued', eta = ?, eta_epoch = ?, failures = 0, lease_losses = 0
+                WHERE {where}
+                  -- the file may have been enqueued again meanwhile; leave that job be
+                  AND NOT EXISTS (
+                      SELECT 1 FROM jobs a
+                      WHERE a.client = jobs.client AND a.path = jobs.path AND a.{_ACTIVE_SQL}
+                  )
+                RETURNING id
+                """,
+                params,
+            ).fetchall()
+        ]
+        _log_events(conn, ids, "requeued", eta, _now_iso())
+        return len(ids)
+
+    return submit_write(op)
+
+# -------- Rate limit buckets --------
+# A bucket is (key, capacity, refill_per_second[, initial_tokens]). It refills
+# continuously up to `capacity`; a bucket seen for the first time starts with
+# `initial_tokens` (default: full).
+Bucket = Tuple[Any, ...]
+
+def _bucket_level(row: Optional[Dict[str, Any]], bucket: Bucket, now: float) -> float:
+    capacity, rate = float(bucket[1]), float(bucket[2])
+    if row is None:
+        return min(capacity, float(bucket[3])) if len(bucket) > 3 else capacity
+    return min(capacity, row["tokens"] + max(0.0, now - row["updated_epoch"]) * rate)
+
+def _bucket_wait(level: float, bucket: Bucket) -> float:
+    """Seconds until the bucket holds a whole token (inf if it never will)."""
+    if level >= 1.0:
+        return 0.0
+    capacity, rate = float(bucket[1]), float(bucket[2])
+    if capacity < 1.0 or rate <= 0.0:
+        return float("inf")
+    return (1.0 - level) / rate
+
+def _take_tokens_op(conn: sqlite3.Connection, buckets: List[Bucket], now: float) -> float:
+    levels = []
+    for bucket in buckets:
+        row = conn.execute(
+            "SELECT tokens, updated_epoch FROM rate_buckets WHERE key = ?", (bucket[0],)
+        ).fetchone()
+        levels.append(_bucket_level(row, bucket, now))
+    wait = max((_bucket_wait(level, b) for level, b in zip(levels, buckets)), default=0.0)
+    if wait > 0:
+        return wait
+    conn.executemany(
+        """
+        INSERT INTO rate_buckets (key, tokens, updated_epoch) VALUES (?, ?, ?)
+        ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated_epoch = excluded.updated_epoch
+        """,
+        [(b[0], level - 1.0, now) for level, b in zip(levels, buckets)],
+    )
+    return 0.0
+
+def take_tokens(buckets: List[Bucket], now_epoch: float | None = None) -> float:
+    """
+    Take one token from every bucket, all or nothing.
+
+    Returns 0.0 when granted. Otherwise nothing is taken and the result is the
+    number of seconds until every bucket will hold a token again (inf if one
+    never refills).
+    """
+    now = time.time() if now_epoch is None else now_epoch
+    return submit_write(partial(_take_tokens_op, buckets=list(buckets), now=now))
+
+def peek_tokens(buckets: List[Bucket], now_epoch: float | None = None) -> List[Tuple[float, float]]:
+    """(tokens available, seconds until the next token) for each bucket, without taking any."""
+    now = time.time() if now_epoch is None else now_epoch
+    keys = [b[0] for b in buckets]
+    if not keys:
+        return []
+    with read_conn() as conn:
+        rows = {
+            r["key"]: r
+            for r in conn.execute(
+                f"SELECT key, tokens, updated_epoch FROM rate_buckets WHERE key IN ({', '.join('?' for _ in keys)})",
+                keys,
             )
-        else:
-            conn.execute("UPDATE jobs SET eta = ? WHERE id = ?", (new_eta, job_id))
+        }
+    out = []
+    for bucket in buckets:
+        level = _bucket_level(rows.get(bucket[0]), bucket, now)
+        out.append((level, _bucket_wait(level, bucket)))
+    return out
+
+# -------- Archive / Compaction --------
+# Job states that are finished and safe to move out of the hot table. Nothing
+# sets 'failed' any more (fail_job retries or goes 'dead'); it stays for old rows.
+ARCHIVE_STATUSES = ("done", "dead", "poison", "duplicate", "failed")
+
+def archive_jobs(
+    older_than_days: int = 30,
+    batch_size: int = 500,
+    max_batches: int | None = None,
+    conn: sqlite3.Connection | None = None,
+) -> int:
+    """
+    Move finished jobs older than `older_than_days` from jobs to jobs_archive,
+    and their job_events to job_events_archive. Age counts from done_at, or
+    for dead/poison jobs from their last attempt (started_at), so they stay
+    around for list_dead / requeue_dead for the full period.
+
+    Works in batches of `batch_size` rows. Each batch copies its rows and
+    events and deletes them from jobs/job_events in one transaction, so the job can be stopped at
+    any point and re-run to pick up where it left off. The write lock is let
+    go between batches. Returns the number of rows archived.
+    """
+    cutoff = _iso_after(_now_iso(), -older_than_days * 86400)
+    cols = ", ".join(_BASE_COLUMNS)
+    statuses = ", ".join("?" for _ in ARCHIVE_STATUSES)
+    total = 0
+    last_id = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        with (nullcontext(conn) if conn is not None else write_conn()) as c, _write_txn(c):
+            # Walk the primary key from last_id so each batch starts where the last stopped
+            ids = [r["id"] for r in c.execute(
+                f"""
+                SELECT id FROM jobs
+                WHERE id > ? AND status IN ({statuses})
+                  AND COALESCE(done_at, started_at, created_at) < ?
+                ORDER BY id
+                LIMIT ?
+                """,
+                (last_id, *ARCHIVE_STATUSES, cutoff, batch_size),
+            )]
+            if not ids:
+                break
+            marks = ", ".join("?" for _ in ids)
+            c.execute(
+                f"""
+                INSERT OR REPLACE INTO jobs_archive ({cols}, archived_at)
+                SELECT {cols}, ? FROM jobs WHERE id IN ({marks})
+                """,
+                (_now_iso(), *ids),
+            )
+            c.execute(
+                f"""
+                INSERT INTO job_events_archive (job_id, ts, kind, detail)
+                SELECT job_id, ts, kind, detail FROM job_events WHERE job_id IN ({marks}) ORDER BY id
+                """,
+                ids,
+            )
+            c.execute(f"DELETE FROM job_events WHERE job_id IN ({marks})", ids)
+            c.execute(f"DELETE FROM jobs WHERE id IN ({marks})", ids)
+        total += len(ids)
+        last_id = ids[-1]
+        batches += 1
+    return total
+
+def compact_db(
+    vacuum_pages: int = 0, conn: sqlite3.Connection | None = None, full_vacuum: bool = False
+) -> None:
+    """
+    Give free pages back to the OS and refresh planner statistics.
+
+    Runs PRAGMA incremental_vacuum (`vacuum_pages` pages, 0 = all free pages)
+    and PRAGMA optimize, then checkpoints the WAL so the file actually shrinks.
+    A database created before auto_vacuum=INCREMENTAL was set can only be
+    switched over by a full VACUUM, which rewrites the whole file under the
+    write lock; that only happens with full_vacuum=True (purge_done.py), and
+    until then incremental_vacuum frees nothing.
+    """
+    with (nullcontext(conn) if conn is not None else write_conn()) as c:
+        if full_vacuum and c.execute("PRAGMA auto_vacuum").fetchone()["auto_vacuum"] != 2:
+            c.execute("PRAGMA auto_vacuum=INCREMENTAL;")
+            c.execute("VACUUM")
+        # executescript steps the pragma to completion; execute() would free a single page
+        c.executescript(f"PRAGMA incremental_vacuum({int(vacuum_pages)});")
+        c.execute("PRAGMA optimize").fetchall()
+        c.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+
+def start_archiver(
+    interval_seconds: float = 3600.0, older_than_days: int = 30, batch_size: int = 500
+) -> threading.Event:
+    """
+    Run archive_jobs + compact_db every `interval_seconds` on a daemon thread.
+    It only runs incremental vacuums; a full VACUUM is left to purge_done.py.
+
+    Like start_reaper, the thread uses its own connection. Set the returned
+    event to stop it.
+    """
+    stop = threading.Event()
+
+    def _loop() -> None:
+        conn = _connect()
+        try:
+            while not stop.wait(interval_seconds):
+                try:
+                    moved = archive_jobs(older_than_days, batch_size, conn=conn)
+                    if moved:
+                        print(f"[archiver] archived {moved} job(s)")
+                        compact_db(conn=conn)
+                except Exception as e:
+                    print(f"[archiver] error: {e}")
+        finally:
+            conn.close()
+
+    threading.Thread(target=_loop, name="job-archiver", daemon=True).start()
+    return stop
 
 # Initialize DB on import
 init_db()
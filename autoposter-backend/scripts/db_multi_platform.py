@@ -9,8 +9,12 @@ from pathlib import Path
 from datetime import datetime, timezone
 from typing import Any, Dict, List, Optional, Tuple
 
-# Import existing database module
-from db import _conn, _now_iso, init_db
+# Import existing database module. Every write goes through its writer
+# (write_conn / submit_write) and reads use its read pool.
+try:
+    from scripts.db import _now_iso, init_db, read_conn, submit_write, write_conn
+except ImportError:
+    from db import _now_iso, init_db, read_conn, submit_write, write_conn
 
 # Multi-platform schema extensions
 MULTI_PLATFORM_SCHEMA = {
@@ -60,9 +64,7 @@ MULTI_PLATFORM_INDEXES = [
 
 def init_multi_platform_db():
     """Initialize multi-platform database schema"""
-    conn = _conn()
-    
-    with conn:
+    with write_conn() as conn, conn:
         # Create new tables
         for table_name, columns in MULTI_PLATFORM_SCHEMA.items():
             if table_name == "platforms":
@@ -131,29 +133,28 @@ def add_client_platform(client: str, platform: str, credentials: Dict[str, Any]
     if settings is None:
         settings = {}
     
-    conn = _conn()
     now = _now_iso()
     
-    with conn:
+    def op(conn):
         cursor = conn.execute("""
             INSERT INTO client_platforms (client, platform, credentials, settings, created_at, updated_at)
             VALUES (?, ?, ?, ?, ?, ?)
         """, (client, platform, json.dumps(credentials), json.dumps(settings), now, now))
-        
         return int(cursor.lastrowid)
+    
+    return submit_write(op)
 
 def get_client_platforms(client: str) -> List[Dict[str, Any]]:
     """Get all platforms for a client"""
-    conn = _conn()
-    cursor = conn.execute("""
-        SELECT cp.*, p.display_name, p.enabled as platform_enabled
-        FROM client_platforms cp
-        JOIN platforms p ON cp.platform = p.name
-        WHERE cp.client = ? AND cp.enabled = 1
-        ORDER BY p.display_name
-    """, (client,))
-    
-    rows = cursor.fetchall()
+    with read_conn() as conn:
+        rows = conn.execute("""
+            SELECT cp.*, p.display_name, p.enabled as platform_enabled
+            FROM client_platforms cp
+            JOIN platforms p ON cp.platform = p.name
+            WHERE cp.client = ? AND cp.enabled = 1
+            ORDER BY p.display_name
+        """, (client,)).fetchall()
+    
     for row in rows:
         try:
             row["credentials"] = json.loads(row.get("credentials") or "{}")
@@ -166,7 +167,6 @@ def get_client_platforms(client: str) -> List[Dict[str, Any]]:
 
 def update_client_platform(client: str, platform: str, credentials: Dict[str, Any] = None, settings: Dict[str, Any] = None) -> bool:
     """Update client platform configuration"""
-    conn = _conn()
     now = _now_iso()
     
     updates = []
@@ -186,33 +186,47 @@ def update_client_platform(client: str, platform: str, credentials: Dict[str, An
     updates.append("updated_at = ?")
     params.extend([now, client, platform])
     
-    with conn:
+    def op(conn):
         cursor = conn.execute(f"""
             UPDATE client_platforms 
             SET {', '.join(updates)}
             WHERE client = ? AND platform = ?
         """, params)
-        
         return cursor.rowcount > 0
+    
+    return submit_write(op)
 
 def add_platform_post(job_id: int, platform: str, platform_post_id: str = None, platform_url: str = None, status: str = "pending") -> int:
-    """Add a platform post record"""
-    conn = _conn()
+    """Add a platform post record (committed with the next group commit)"""
     now = _now_iso()
     
-    with conn:
+    def op(conn):
         cursor = conn.execute("""
             INSERT INTO platform_posts (job_id, platform, platform_post_id, platform_url, status, created_at)
             VALUES (?, ?, ?, ?, ?, ?)
         """, (job_id, platform, platform_post_id, platform_url, status, now))
-        
         return int(cursor.lastrowid)
+    
+    return submit_write(op)
 
-def update_platform_post(platform_post_id: int, status: str, platform_post_id_value: str = None, platform_url: str = None, error: str = None) -> bool:
-    """Update a platform post record"""
-    conn = _conn()
+def add_platform_posts(job_id: int, platforms: List[str], status: str = "pending") -> Dict[str, int]:
+    """Add one platform post record per platform in a single transaction; returns platform -> id"""
     now = _now_iso()
     
+    def op(conn):
+        ids = {}
+        for platform in platforms:
+            cursor = conn.execute("""
+                INSERT INTO platform_posts (job_id, platform, status, created_at)
+                VALUES (?, ?, ?, ?)
+            """, (job_id, platform, status, now))
+            ids[platform] = int(cursor.lastrowid)
+        return ids
+    
+    return submit_write(op)
+
+def _platform_post_update(platform_post_id: int, status: str, platform_post_id_value: str = None, platform_url: str = None, error: str = None, now: str = None) -> Tuple[str, list]:
+    """SQL + params for one platform_posts update"""
     updates = ["status = ?"]
     params = [status]
     
@@ -230,34 +244,53 @@ def update_platform_post(platform_post_id: int, status: str, platform_post_id_va
     
     if status == "posted":
         updates.append("posted_at = ?")
-        params.append(now)
+        params.append(now or _now_iso())
     
     params.append(platform_post_id)
     
-    with conn:
-        cursor = conn.execute(f"""
+    return f"""
             UPDATE platform_posts 
             SET {', '.join(updates)}
             WHERE id = ?
-        """, params)
-        
+        """, params
+
+def update_platform_post(platform_post_id: int, status: str, platform_post_id_value: str = None, platform_url: str = None, error: str = None, wait: bool = True):
+    """Update a platform post record; wait=False returns the group-commit Future"""
+    sql, params = _platform_post_update(platform_post_id, status, platform_post_id_value, platform_url, error)
+    
+    def op(conn):
+        cursor = conn.execute(sql, params)
         return cursor.rowcount > 0
+    
+    return submit_write(op, wait)
+
+def update_platform_posts(updates: List[Dict[str, Any]], wait: bool = True):
+    """
+    Apply several platform post updates in one transaction.
+    
+    Each item takes update_platform_post's arguments by name
+    (platform_post_id, status, platform_post_id_value, platform_url, error).
+    Returns the number of rows updated (or its Future with wait=False).
+    """
+    now = _now_iso()
+    statements = [_platform_post_update(now=now, **u) for u in updates]
+    
+    def op(conn):
+        return sum(conn.execute(sql, params).rowcount for sql, params in statements)
+    
+    return submit_write(op, wait)
 
 def get_job_platform_posts(job_id: int) -> List[Dict[str, Any]]:
     """Get all platform posts for a job"""
-    conn = _conn()
-    cursor = conn.execute("""
-        SELECT * FROM platform_posts 
-        WHERE job_id = ?
-        ORDER BY created_at
-    """, (job_id,))
-    
-    return cursor.fetchall()
+    with read_conn() as conn:
+        return conn.execute("""
+            SELECT * FROM platform_posts 
+            WHERE job_id = ?
+            ORDER BY created_at
+        """, (job_id,)).fetchall()
 
 def get_platform_post_stats(platform: str = None, status: str = None) -> Dict[str, Any]:
     """Get platform posting statistics"""
-    conn = _conn()
-    
     where_conditions = []
     params = []
     
@@ -271,27 +304,28 @@ def get_platform_post_stats(platform: str = None, status: str = None) -> Dict[st
     
     where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
     
-    # Get total posts
-    cursor = conn.execute(f"""
-        SELECT COUNT(*) as total FROM platform_posts {where_clause}
-    """, params)
-    total = cursor.fetchone()["total"]
-    
-    # Get status breakdown
-    cursor = conn.execute(f"""
-        SELECT status, COUNT(*) as count 
-        FROM platform_posts {where_clause}
-        GROUP BY status
-    """, params)
-    status_breakdown = {row["status"]: row["count"] for row in cursor.fetchall()}
-    
-    # Get platform breakdown
-    cursor = conn.execute(f"""
-        SELECT platform, COUNT(*) as count 
-        FROM platform_posts {where_clause}
-        GROUP BY platform
-    """, params)
-    platform_breakdown = {row["platform"]: row["count"] for row in cursor.fetchall()}
+    with read_conn() as conn:
+        # Get total posts
+        cursor = conn.execute(f"""
+            SELECT COUNT(*) as total FROM platform_posts {where_clause}
+        """, params)
+        total = cursor.fetchone()["total"]
+    
+        # Get status breakdown
+        cursor = conn.execute(f"""
+            SELECT status, COUNT(*) as count 
+            FROM platform_posts {where_clause}
+            GROUP BY status
+        """, params)
+        status_breakdown = {row["status"]: row["count"] for row in cursor.fetchall()}
+    
+        # Get platform breakdown
+        cursor = conn.execute(f"""
+            SELECT platform, COUNT(*) as count 
+            FROM platform_posts {where_clause}
+            GROUP BY platform
+        """, params)
+        platform_breakdown = {row["platform"]: row["count"] for row in cursor.fetchall()}
     
     return {
         "total": total,
@@ -301,30 +335,27 @@ def get_platform_post_stats(platform: str = None, status: str = None) -> Dict[st
 
 def get_failed_platform_posts(limit: int = 50) -> List[Dict[str, Any]]:
     """Get failed platform posts for retry"""
-    conn = _conn()
-    cursor = conn.execute("""
-        SELECT pp.*, j.client, j.path, j.content_type, j.caption
-        FROM platform_posts pp
-        JOIN jobs j ON pp.job_id = j.id
-        WHERE pp.status = 'failed'
-        ORDER BY pp.created_at DESC
-        LIMIT ?
-    """, (limit,))
-    
-    return cursor.fetchall()
+    with read_conn() as conn:
+        return conn.execute("""
+            SELECT pp.*, j.client, j.path, j.content_type, j.caption
+            FROM platform_posts pp
+            JOIN jobs j ON pp.job_id = j.id
+            WHERE pp.status = 'failed'
+            ORDER BY pp.created_at DESC
+            LIMIT ?
+        """, (limit,)).fetchall()
 
 def retry_failed_platform_post(platform_post_id: int) -> bool:
     """Mark a failed platform post for retry"""
-    conn = _conn()
-    
-    with conn:
+    def op(conn):
         cursor = conn.execute("""
             UPDATE platform_posts 
             SET status = 'pending', error = NULL
             WHERE id = ?
         """, (platform_post_id,))
-        
         return cursor.rowcount > 0
+    
+    return submit_write(op)
 
 # Initialize multi-platform database on import
 if __name__ == "__main__":
@@ -60,6 +60,7 @@ def seed_three() -> list[int]:
             kind="feed" if kind == "feed" else ("reels" if kind == "reels" else "stories"),
             caption=f"(DRY) Morning demo — {kind}",
             extras={"source": "morning-reset"},
+            on_conflict="replace",
         )
         jids.append(jid)
     # Force eta=now
@@ -30,6 +30,7 @@ def main() -> None:
         kind="feed",
         caption="(main-runner dry demo)",
         extras={"source": "main-runner-test"},
+        on_conflict="replace",
     )
     # force eta to now so the runner considers it due
     conn = db._conn()
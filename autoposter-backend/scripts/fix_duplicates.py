@@ -8,9 +8,11 @@ DB = ROOT / "data" / "autoposter.db"
 def main():
     con = sqlite3.connect(DB); con.row_factory = sqlite3.Row
     try:
+        # Only active jobs must be unique; finished rows are history and stay
         dups = con.execute("""
             SELECT client, path, MIN(id) AS keep_id, COUNT(*) AS cnt
             FROM jobs
+            WHERE status IN ('queued', 'in_progress')
             GROUP BY client, path
             HAVING COUNT(*) > 1
         """).fetchall()
@@ -18,17 +20,24 @@ def main():
         for r in dups:
             client, path, keep_id = r["client"], r["path"], r["keep_id"]
             cur = con.execute(
-                "DELETE FROM jobs WHERE client=? AND path=? AND id<>?",
-                (client, path, keep_id)
+                """
+                UPDATE jobs
+                SET status = 'duplicate', extras = json_set(COALESCE(extras, '{}'), '$.duplicate_of', ?)
+                WHERE client=? AND path=? AND id<>? AND status IN ('queued', 'in_progress')
+                """,
+                (keep_id, client, path, keep_id)
             )
             total += cur.rowcount
-            print(f"Cleaned {client} {Path(path).name}: kept id={keep_id}, removed={cur.rowcount}")
+            print(f"Cleaned {client} {Path(path).name}: kept id={keep_id}, marked duplicate={cur.rowcount}")
         con.commit()
-        # Rebuild unique index just in case
+        # Rebuild unique index just in case (same partial index as db.init_db)
         con.execute("DROP INDEX IF EXISTS ux_jobs_client_path")
-        con.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_jobs_client_path ON jobs(client, path)")
+        con.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ux_jobs_client_path ON jobs(client, path) "
+            "WHERE status IN ('queued', 'in_progress')"
+        )
         con.commit()
-        print(f"Done. Removed {total} duplicate rows and ensured unique index.")
+        print(f"Done. Marked {total} duplicate rows and ensured unique index.")
     finally:
         con.close()
 
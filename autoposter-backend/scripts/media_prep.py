@@ -0,0 +1,344 @@
+# scripts/media_prep.py
+"""
+Per-platform media preparation, run before a file is handed to an SDK.
+
+Images are cropped into the platform's aspect range, scaled down and
+re-encoded (Pillow); videos are cropped, scaled and transcoded to H.264/AAC
+(ffmpeg). Work runs in a process pool, and every output is cached on disk by
+(content hash, platform profile), so retries and repeat posts of the same
+media reuse the prepared file. Files already within spec are posted as-is.
+
+Pillow and ffmpeg are optional: without them the original file is used.
+"""
+import os
+import json
+import shutil
+import asyncio
+import atexit
+import hashlib
+import logging
+import subprocess
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+try:
+    from scripts.content_hash import sha256_file
+except ImportError:
+    from content_hash import sha256_file
+
+logger = logging.getLogger(__name__)
+
+_PROJECT_ROOT = Path(__file__).resolve().parents[1]
+CACHE_DIR = Path(os.getenv("MEDIA_CACHE_DIR", str(_PROJECT_ROOT / "data" / "media_cache")))
+PREP_WORKERS = int(os.getenv("MEDIA_PREP_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp", ".tif", ".tiff", ".heic"}
+
+_MB = 1024 * 1024
+
+# Output specs per platform: "image"/"video" apply to every content type,
+# "<content_type>_<kind>" (e.g. "story_image") refines them. Aspect is a
+# (min, max) width/height range; anything outside is center-cropped into it.
+# Override per client in client.json: {"media_profiles": {"instagram": {"video": {...}}}}
+MEDIA_PROFILES: Dict[str, Dict[str, Dict[str, Any]]] = {
+    "instagram": {
+        "image": {"max_dim": 1080, "aspect": (0.8, 1.91), "max_bytes": 8 * _MB},
+        "video": {"max_width": 1080, "max_height": 1920, "aspect": (0.5625, 1.91),
+                  "max_seconds": 90, "max_bytes": 100 * _MB},
+        "story_image": {"aspect": (0.5625, 1.91), "max_dim": 1920},
+        "story_video": {"aspect": (0.5625, 1.91), "max_seconds": 60},
+    },
+    "twitter": {
+        "image": {"max_dim": 4096, "aspect": (0.33, 3.0), "max_bytes": 5 * _MB},
+        "video": {"max_width": 1920, "max_height": 1200, "aspect": (0.33, 3.0),
+                  "max_seconds": 140, "max_bytes": 512 * _MB},
+    },
+    "linkedin": {
+        "image": {"max_dim": 4096, "aspect": (0.4, 2.4), "max_bytes": 8 * _MB},
+        "video": {"max_width": 1920, "max_height": 1920, "aspect": (0.4, 2.4),
+                  "max_seconds": 600, "max_bytes": 200 * _MB},
+    },
+    "youtube": {
+        "video": {"max_width": 3840, "max_height": 2160, "max_bytes": 2048 * _MB},
+    },
+    "tiktok": {
+        "video": {"max_width": 1080, "max_height": 1920, "aspect": (0.5625, 1.0),
+                  "max_seconds": 600, "max_bytes": 287 * _MB},
+    },
+    "facebook": {
+        "image": {"max_dim": 2048, "max_bytes": 10 * _MB},
+        "video": {"max_width": 1920, "max_height": 1920, "max_seconds": 240 * 60, "max_bytes": 1024 * _MB},
+        "story_video": {"max_seconds": 60},
+    },
+}
+
+def media_kind(file_path: str) -> str:
+    return "image" if Path(file_path).suffix.lower() in IMAGE_EXTENSIONS else "video"
+
+def media_profile(
+    platform: str,
+    content_type: str,
+    kind: str,
+    extensions: List[str],
+    overrides: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """The spec one file must meet; `extensions` is the poster's get_supported_extensions()"""
+    specs = MEDIA_PROFILES.get(platform, {})
+    profile: Dict[str, Any] = {}
+    for key in (kind, f"{content_type}_{kind}"):
+        profile.update(specs.get(key, {}))
+        profile.update((overrides or {}).get(key, {}))
+    wanted = IMAGE_EXTENSIONS if kind == "image" else None
+    profile["extensions"] = [
+        e for e in extensions if (e in wanted if wanted else e not in IMAGE_EXTENSIONS)
+    ]
+    profile["kind"] = kind
+    return profile
+
+def profile_key(profile: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(profile, sort_keys=True).encode()).hexdigest()[:16]
+
+def find_ffmpeg() -> Optional[str]:
+    exe = shutil.which("ffmpeg")
+    if exe:
+        return exe
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return None
+
+def _crop_box(width: int, height: int, aspect: Optional[Tuple[float, float]]) -> Optional[Tuple[int, int]]:
+    """(w, h) of a centered crop bringing width/height into `aspect`, or None if already inside"""
+    if not aspect or not width or not height:
+        return None
+    lo, hi = aspect
+    ratio = width / height
+    if ratio > hi + 1e-3:
+        return int(height * hi), height
+    if ratio < lo - 1e-3:
+        return width, int(width / lo)
+    return None
+
+# -------- Workers (run in the process pool) --------
+
+def _prepare_image(src: str, dst: Path, profile: Dict[str, Any]) -> bool:
+    """Write a compliant copy of `src` to `dst`; False if `src` already complies"""
+    ext = Path(src).suffix.lower()
+    extensions = profile["extensions"]
+    max_dim = profile.get("max_dim")
+    max_bytes = profile.get("max_bytes")
+    with Image.open(src) as img:
+        crop = _crop_box(img.width, img.height, profile.get("aspect"))
+        too_big = bool(max_dim and max(img.width, img.height) > max_dim)
+        rotated = img.getexif().get(0x0112, 1) not in (0, 1)
+        if (ext in extensions and not crop and not too_big and not rotated
+                and not (max_bytes and os.path.getsize(src) > max_bytes)):
+            return False
+
+        out = ImageOps.exif_transpose(img)
+        crop = _crop_box(out.width, out.height, profile.get("aspect"))
+        if crop:
+            left, top = (out.width - crop[0]) // 2, (out.height - crop[1]) // 2
+            out = out.crop((left, top, left + crop[0], top + crop[1]))
+        if max_dim:
+            out.thumbnail((max_dim, max_dim), Image.LANCZOS)
+
+    if dst.suffix in (".jpg", ".jpeg"):
+        out = out.convert("RGB")
+        # Step quality down until the file fits
+        for quality in (90, 82, 75, 68, 60):
+            out.save(dst, "JPEG", quality=quality, optimize=True, progressive=True)
+            if not max_bytes or dst.stat().st_size <= max_bytes:
+                break
+    else:
+        out.save(dst, optimize=True)
+    return True
+
+def _probe_video(ffmpeg: str, src: str) -> Dict[str, Any]:
+    """width/height/duration via ffprobe, when it's installed next to ffmpeg"""
+    ffprobe = shutil.which("ffprobe") or str(Path(ffmpeg).with_name("ffprobe"))
+    try:
+        out = subprocess.run(
+            [ffprobe, "-v", "error", "-select_streams", "v:0",
+             "-show_entries", "stream=width,height:format=duration", "-of", "json", src],
+            capture_output=True, text=True, timeout=60, check=True,
+        ).stdout
+        data = json.loads(out)
+        stream = (data.get("streams") or [{}])[0]
+        return {
+            "width": int(stream.get("width") or 0),
+            "height": int(stream.get("height") or 0),
+            "duration": float((data.get("format") or {}).get("duration") or 0),
+        }
+    except Exception:
+        return {}
+
+def _prepare_video(src: str, dst: Path, profile: Dict[str, Any]) -> bool:
+    ffmpeg = find_ffmpeg()
+    ext = Path(src).suffix.lower()
+    info = _probe_video(ffmpeg, src)
+    max_w, max_h = profile.get("max_width"), profile.get("max_height")
+    max_seconds, max_bytes = profile.get("max_seconds"), profile.get("max_bytes")
+    width, height = info.get("width", 0), info.get("height", 0)
+    crop = _crop_box(width, height, profile.get("aspect"))
+    if (ext in profile["extensions"] and info and not crop
+            and not (max_w and width > max_w) and not (max_h and height > max_h)
+            and not (max_seconds and info.get("duration", 0) > max_seconds)
+            and not (max_bytes and os.path.getsize(src) > max_bytes)):
+        return False
+
+    filters = []
+    if crop:
+        filters.append(f"crop={crop[0] // 2 * 2}:{crop[1] // 2 * 2}")
+    if max_w or max_h:
+        filters.append(
+            f"scale=w='min({max_w or 'iw'},iw)':h='min({max_h or 'ih'},ih)':force_original_aspect_ratio=decrease"
+        )
+    filters.append("scale=trunc(iw/2)*2:trunc(ih/2)*2")
+    cmd = [ffmpeg, "-y", "-v", "error", "-i", src, "-vf", ",".join(filters),
+           "-c:v", "libx264", "-preset", "veryfast", "-crf", "23", "-pix_fmt", "yuv420p",
+           "-c:a", "aac", "-b:a", "128k", "-movflags", "+faststart"]
+    if max_seconds:
+        cmd += ["-t", str(max_seconds)]
+    subprocess.run(cmd + [str(dst)], capture_output=True, timeout=3600, check=True)
+    return True
+
+def _prepare(src: str, digest: str, profile: Dict[str, Any], cache_dir: str) -> str:
+    """Path of the file to upload for `src` (content hash `digest`) under `profile` (cached, or `src` itself)"""
+    key = f"{digest}-{profile_key(profile)}"
+    folder = Path(cache_dir) / digest[:2]
+    keep = folder / f"{key}.keep"  # marker: the original already meets the profile
+    ext = Path(src).suffix.lower()
+    extensions = profile["extensions"]
+    if ext not in extensions and extensions:
+        ext = ".jpg" if ".jpg" in extensions else (".mp4" if ".mp4" in extensions else extensions[0])
+    if profile["kind"] == "video" and ext != ".mp4" and ".mp4" in extensions:
+        ext = ".mp4"  # always H.264 in an mp4 when we transcode
+    dst = folder / f"{key}{ext}"
+
+    for hit in (dst, keep):
+        if hit.exists():
+            os.utime(hit)  # keeps it from being pruned
+            return src if hit is keep else str(dst)
+
+    folder.mkdir(parents=True, exist_ok=True)
+    tmp = dst.with_name(f".{dst.stem}.{os.getpid()}{ext}")
+    try:
+        worker = _prepare_image if profile["kind"] == "image" else _prepare_video
+        if not worker(src, tmp, profile):
+            keep.touch()
+            return src
+        os.replace(tmp, dst)
+        return str(dst)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+# -------- Pool --------
+
+class MediaPreparer:
+    """Process pool plus on-disk cache for prepared uploads"""
+
+    def __init__(self, max_workers: int = PREP_WORKERS, cache_dir: Path = CACHE_DIR):
+        self.max_workers = max_workers
+        self.cache_dir = cache_dir
+        self.ffmpeg = find_ffmpeg()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._guard = threading.Lock()
+        # Identical requests in flight share one job
+        self._inflight: Dict[tuple, Future] = {}
+        if not PIL_AVAILABLE:
+            logger.warning("Pillow not installed; images are uploaded without preparation")
+        if not self.ffmpeg:
+            logger.warning("ffmpeg not found; videos are uploaded without preparation")
+
+    def can_prepare(self, kind: str) -> bool:
+        return PIL_AVAILABLE if kind == "image" else bool(self.ffmpeg)
+
+    def _submit(self, src: str, digest: str, profile: Dict[str, Any]) -> Future:
+        key = (os.path.abspath(src), digest, profile_key(profile))
+        with self._guard:
+            fut = self._inflight.get(key)
+            if fut is not None:
+                return fut
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            fut = self._inflight[key] = self._pool.submit(_prepare, src, digest, profile, str(self.cache_dir))
+        fut.add_done_callback(lambda _f: self._forget(key))
+        return fut
+
+    def _forget(self, key: tuple):
+        with self._guard:
+            self._inflight.pop(key, None)
+
+    async def prepare(
+        self,
+        file_path: str,
+        platform: str,
+        content_type: str,
+        extensions: List[str],
+        overrides: Optional[Dict[str, Dict[str, Any]]] = None,
+    ) -> str:
+        """
+        Path to upload in place of `file_path` for this platform/content type.
+
+        Returns `file_path` itself when it already meets the profile or the
+        tooling for its kind isn't installed.
+        """
+        kind = media_kind(file_path)
+        if not self.can_prepare(kind):
+            return file_path
+        profile = media_profile(platform, content_type, kind, extensions, overrides)
+        if not profile["extensions"]:
+            return file_path  # platform doesn't take this kind here; leave it to validation
+        started = time.monotonic()
+        try:
+            digest = await asyncio.to_thread(sha256_file, file_path)
+        except OSError as e:
+            raise FileNotFoundError(f"Can't read {file_path}") from e
+        prepared = await asyncio.wrap_future(self._submit(file_path, digest, profile))
+        if prepared != file_path:
+            logger.info(f"{platform}: prepared {Path(file_path).name} -> {Path(prepared).name} "
+                        f"({time.monotonic() - started:.1f}s)")
+        return prepared
+
+    def prune(self, max_age_days: float = 14) -> int:
+        """Delete cache entries not used for `max_age_days`; returns how many"""
+        cutoff = time.time() - max_age_days * 86400
+        removed = 0
+        for path in self.cache_dir.glob("*/*"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def shutdown(self, wait: bool = True):
+        with self._guard:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+_preparer: Optional[MediaPreparer] = None
+_preparer_lock = threading.Lock()
+
+def get_media_preparer() -> MediaPreparer:
+    """Get the process-wide media preparer"""
+    global _preparer
+    if _preparer is None:
+        with _preparer_lock:
+            if _preparer is None:
+                _preparer = MediaPreparer()
+                atexit.register(_preparer.shutdown)
+    return _preparer
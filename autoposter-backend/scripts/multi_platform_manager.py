@@ -129,6 +129,8 @@ class MultiPlatformManager:
         poster = self.platforms[platform]
         
         try:
+            # Upload a copy sized/encoded for this platform (original if it already fits)
+            file_path = await poster.prepare_media(file_path, content_type)
             if content_type == "photo":
                 return await poster.post_photo(file_path, caption, **kwargs)
             elif content_type == "video":
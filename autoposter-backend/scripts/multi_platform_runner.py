@@ -4,22 +4,25 @@ Multi-platform queue runner
 Processes jobs and posts to multiple social media platforms
 """
 import os
+import sys
 import argparse
 import asyncio
 import logging
+import time
 from typing import Dict, Any, List, Optional
 from pathlib import Path
 import importlib.util
-from datetime import datetime, timezone
 
 # Load existing modules
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 DB_PATH = PROJECT_ROOT / "scripts" / "db.py"
 MULTI_PLATFORM_DB_PATH = PROJECT_ROOT / "scripts" / "db_multi_platform.py"
 
-# Import database modules
+# Import database modules. db is registered (as db and scripts.db) before
+# db_multi_platform imports it, so both share one module (and one write batcher).
 spec = importlib.util.spec_from_file_location("db", DB_PATH)
 db = importlib.util.module_from_spec(spec)
+sys.modules["db"] = sys.modules["scripts.db"] = db
 spec.loader.exec_module(db)
 
 spec = importlib.util.spec_from_file_location("db_multi_platform", MULTI_PLATFORM_DB_PATH)
@@ -29,17 +32,36 @@ spec.loader.exec_module(db_mp)
 # Import platform modules
 from multi_platform_manager import MultiPlatformManager, PlatformScheduler
 from platform_abstraction import PlatformError, AuthenticationError, PostingError
+from media_prep import get_media_preparer
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Uploads can be slow; the lease must outlive one job's posting round.
+JOB_LEASE_SECONDS = 900
+# Renew the lease this often while a job is being posted.
+HEARTBEAT_SECONDS = 60
+# Jobs posted at once by run_once (per-account SDK calls are still serialized).
+MAX_CONCURRENT_JOBS = 3
+# Drop prepared uploads unused this long, checked this often.
+MEDIA_CACHE_MAX_AGE_DAYS = 14
+MEDIA_PRUNE_SECONDS = 6 * 3600
+
 class MultiPlatformRunner:
     """Multi-platform posting runner"""
     
-    def __init__(self, client: str, dry_run: bool = False):
+    def __init__(
+        self,
+        client: str,
+        dry_run: bool = False,
+        worker_id: Optional[str] = None,
+        max_concurrent_jobs: int = MAX_CONCURRENT_JOBS,
+    ):
         self.client = client
         self.dry_run = dry_run
+        self.worker_id = worker_id or db.default_worker_id()
+        self.max_concurrent_jobs = max_concurrent_jobs
         self.logger = logging.getLogger(f"MultiPlatformRunner.{client}")
         
         # Load client configuration
@@ -94,7 +116,7 @@ class MultiPlatformRunner:
         
         if not enabled_platforms:
             self.logger.warning(f"No platforms enabled for client {self.client}")
-            return {"success": False, "error": "No platforms enabled"}
+            return {"success": False, "error": "No platforms enabled", "error_class": "permanent"}
         
         # Validate content for all platforms
         validation_results = self.platform_manager.validate_content(
@@ -105,62 +127,51 @@ class MultiPlatformRunner:
         
         if not valid_platforms:
             self.logger.error(f"Content not valid for any platform: {validation_results}")
-            return {"success": False, "error": "Content not valid for any platform"}
+            return {"success": False, "error": "Content not valid for any platform", "error_class": "permanent"}
         
-        # Create platform post records
-        platform_post_ids = {}
-        for platform in valid_platforms:
-            try:
-                post_id = db_mp.add_platform_post(job_id, platform, status="pending")
-                platform_post_ids[platform] = post_id
-                self.logger.info(f"Created platform post record for {platform}")
-            except Exception as e:
-                self.logger.error(f"Failed to create platform post record for {platform}: {e}")
+        # Create all platform post records in one transaction
+        try:
+            platform_post_ids = db_mp.add_platform_posts(job_id, valid_platforms, status="pending")
+            self.logger.info(f"Created platform post records for {', '.join(valid_platforms)}")
+        except Exception as e:
+            self.logger.error(f"Failed to create platform post records: {e}")
+            platform_post_ids = {}
         
         if self.dry_run:
             self.logger.info(f"[DRY RUN] Would post to platforms: {valid_platforms}")
             return {"success": True, "platforms": valid_platforms, "dry_run": True}
         
-        # Post to platforms
+        # Post to every platform at once
+        self.logger.info(f"Posting to {', '.join(valid_platforms)}...")
+        outcomes = await asyncio.gather(
+            *(self.platform_manager._post_to_platform(p, file_path, content_type, caption) for p in valid_platforms),
+            return_exceptions=True,
+        )
+        
         posting_results = {}
-        for platform in valid_platforms:
-            try:
-                self.logger.info(f"Posting to {platform}...")
-                
-                # Post to single platform
-                result = await self.platform_manager._post_to_platform(
-                    platform, file_path, content_type, caption
-                )
-                
-                posting_results[platform] = result
-                
-                # Update platform post record
-                if result.get("success"):
-                    db_mp.update_platform_post(
-                        platform_post_ids[platform],
-                        "posted",
-                        result.get("post_id"),
-                        result.get("url")
-                    )
-                    self.logger.info(f"✅ Posted to {platform}: {result.get('url', 'N/A')}")
-                else:
-                    db_mp.update_platform_post(
-                        platform_post_ids[platform],
-                        "failed",
-                        error=result.get("error", "Unknown error")
-                    )
-                    self.logger.error(f"❌ Failed to post to {platform}: {result.get('error', 'Unknown error')}")
-                
-            except Exception as e:
-                self.logger.error(f"❌ Error posting to {platform}: {e}")
-                posting_results[platform] = {"success": False, "error": str(e)}
-                
-                # Update platform post record
-                db_mp.update_platform_post(
-                    platform_post_ids[platform],
-                    "failed",
-                    error=str(e)
-                )
+        record_updates = []
+        error_classes = set()
+        for platform, result in zip(valid_platforms, outcomes):
+            if isinstance(result, Exception):
+                error_classes.add(db.classify_error(result))
+                self.logger.error(f"❌ Error posting to {platform}: {result}")
+                result = {"success": False, "error": str(result)}
+                update = {"status": "failed", "error": result["error"]}
+            elif result.get("success"):
+                self.logger.info(f"✅ Posted to {platform}: {result.get('url', 'N/A')}")
+                update = {"status": "posted", "platform_post_id_value": result.get("post_id"), "platform_url": result.get("url")}
+            else:
+                self.logger.error(f"❌ Failed to post to {platform}: {result.get('error', 'Unknown error')}")
+                error_classes.add("default")
+                update = {"status": "failed", "error": result.get("error", "Unknown error")}
+            posting_results[platform] = result
+            if platform in platform_post_ids:
+                record_updates.append({"platform_post_id": platform_post_ids[platform], **update})
+        
+        # One transaction for all the records, awaited so a failed write surfaces
+        # here instead of being lost in an unchecked Future.
+        if record_updates:
+            await asyncio.wrap_future(db_mp.update_platform_posts(record_updates, wait=False))
         
         # Check overall success
         successful_platforms = [p for p, r in posting_results.items() if r.get("success")]
@@ -175,9 +186,50 @@ class MultiPlatformRunner:
             "platforms": valid_platforms,
             "successful_platforms": successful_platforms,
             "failed_platforms": failed_platforms,
-            "results": posting_results
+            "results": posting_results,
+            # Retry policy for the job if nothing got posted: one shared cause, or the default
+            "error_class": error_classes.pop() if len(error_classes) == 1 else "default",
         }
     
+    async def _finish_job(self, job: Dict[str, Any]) -> None:
+        """Process one claimed job, then mark it done or hand the failure to the retry policy"""
+        try:
+            # Process the job
+            result = await self.process_job(job)
+            
+            if result.get("success"):
+                # Mark job as done if at least one platform succeeded
+                await asyncio.wrap_future(db.mark_done(job["id"], wait=False))
+                self.logger.info(f"✅ Job #{job['id']} completed successfully")
+            else:
+                # All platforms failed: back off per error class, or go dead
+                retry_at = await asyncio.wrap_future(db.fail_job(
+                    job["id"], result.get("error", "All platforms failed"), result.get("error_class"), wait=False
+                ))
+                self._log_retry(job["id"], retry_at)
+            
+        except Exception as e:
+            self.logger.error(f"❌ Error processing job #{job['id']}: {e}")
+            retry_at = await asyncio.wrap_future(db.fail_job(job["id"], e, wait=False))
+            self._log_retry(job["id"], retry_at)
+    
+    def _log_retry(self, job_id: int, retry_at: Optional[str]) -> None:
+        if retry_at:
+            self.logger.warning(f"⚠️ Job #{job_id} failed, retrying at {retry_at}")
+        else:
+            self.logger.error(f"💀 Job #{job_id} is out of attempts and marked dead")
+    
+    async def _heartbeat(self, job_ids: set) -> None:
+        """Keep the leases on the claimed, unfinished `job_ids` alive until cancelled."""
+        while True:
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            for job_id in list(job_ids):
+                # db.heartbeat blocks on the writer; keep it off the event loop
+                alive = await asyncio.to_thread(db.heartbeat, job_id, self.worker_id, JOB_LEASE_SECONDS)
+                if not alive:
+                    self.logger.warning(f"Lost lease on job #{job_id}")
+                    job_ids.discard(job_id)
+    
     async def run_once(self) -> bool:
         """Run once and process available jobs"""
         self.logger.info(f"Starting multi-platform runner for {self.client}")
@@ -188,40 +240,30 @@ class MultiPlatformRunner:
             self.logger.error("No platforms authenticated successfully")
             return False
         
-        # Get due jobs
-        jobs = db.get_due_jobs(limit=10, client=self.client)
+        # Claim due jobs (atomic select + mark in_progress, leased to this worker)
+        jobs = db.claim_due_jobs(
+            self.worker_id, limit=10, lease_seconds=JOB_LEASE_SECONDS, client=self.client
+        )
         if not jobs:
             self.logger.info("No due jobs found")
             return True
         
         self.logger.info(f"Found {len(jobs)} due jobs")
         
-        # Process jobs
-        for job in jobs:
-            try:
-                # Mark job as in progress
-                db.mark_in_progress(job["id"])
-                
-                # Process the job
-                result = await self.process_job(job)
-                
-                if result.get("success"):
-                    # Mark job as done if at least one platform succeeded
-                    db.mark_done(job["id"])
-                    self.logger.info(f"✅ Job #{job['id']} completed successfully")
-                else:
-                    # Reschedule job if all platforms failed
-                    from datetime import timedelta
-                    new_eta = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
-                    db.reschedule(job["id"], new_eta, reason="All platforms failed")
-                    self.logger.warning(f"⚠️ Job #{job['id']} rescheduled due to failures")
-                
-            except Exception as e:
-                self.logger.error(f"❌ Error processing job #{job['id']}: {e}")
-                # Reschedule job
-                from datetime import timedelta
-                new_eta = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
-                db.reschedule(job["id"], new_eta, reason=f"Processing error: {e}")
+        # Process jobs concurrently, renewing leases on the ones not finished yet
+        pending = {job["id"] for job in jobs}
+        heartbeat = asyncio.create_task(self._heartbeat(pending))
+        slots = asyncio.Semaphore(self.max_concurrent_jobs)
+        
+        async def run_job(job):
+            async with slots:
+                try:
+                    await self._finish_job(job)
+                finally:
+                    pending.discard(job["id"])
+        
+        await asyncio.gather(*(run_job(job) for job in jobs))
+        heartbeat.cancel()
         
         return True
     
@@ -229,8 +271,18 @@ class MultiPlatformRunner:
         """Run continuously with specified interval"""
         self.logger.info(f"Starting continuous multi-platform runner (interval: {interval}s)")
         
+        # Re-queue jobs orphaned by crashed workers, and keep the jobs table small, while we run
+        stop_reaper = db.start_reaper()
+        stop_archiver = db.start_archiver()
+        next_prune = 0.0
+        
         while True:
             try:
+                if time.monotonic() >= next_prune:
+                    next_prune = time.monotonic() + MEDIA_PRUNE_SECONDS
+                    pruned = await asyncio.to_thread(get_media_preparer().prune, MEDIA_CACHE_MAX_AGE_DAYS)
+                    if pruned:
+                        self.logger.info(f"Pruned {pruned} stale prepared upload(s)")
                 await self.run_once()
                 await asyncio.sleep(interval)
             except KeyboardInterrupt:
@@ -239,6 +291,9 @@ class MultiPlatformRunner:
             except Exception as e:
                 self.logger.error(f"Runner error: {e}")
                 await asyncio.sleep(interval)
+        
+        stop_reaper.set()
+        stop_archiver.set()
 
 async def main():
     """Main entry point"""
@@ -247,11 +302,13 @@ async def main():
     parser.add_argument("--dry-run", action="store_true", help="Dry run mode")
     parser.add_argument("--once", action="store_true", help="Run once and exit")
     parser.add_argument("--interval", type=int, default=60, help="Continuous run interval (seconds)")
+    parser.add_argument("--worker-id", default=None, help="Lease owner name (default: <host>:<pid>)")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENT_JOBS, help="Jobs processed at once")
     
     args = parser.parse_args()
     
     try:
-        runner = MultiPlatformRunner(args.client, args.dry_run)
+        runner = MultiPlatformRunner(args.client, args.dry_run, args.worker_id, args.concurrency)
         
         if args.once:
             success = await runner.run_once()
@@ -0,0 +1,214 @@
+# scripts/perceptual_hash.py
+"""
+Near-duplicate image detection with perceptual hashes.
+
+Each image gets a 64-bit difference hash (dHash): the picture is shrunk to
+9x8 grayscale and each bit says whether a pixel is brighter than its right
+neighbour. Recompressing, resizing or lightly editing an image flips only a
+few bits, so a small Hamming distance means "same picture".
+
+Per client, the hashes of all jobs (archived ones included) are kept in a
+multi-index hash table (HammingIndex), which finds every hash within distance
+d by checking a few small buckets instead of scanning them all.
+
+Pillow is optional: without it no perceptual hashes are taken and nothing is
+flagged.
+"""
+import os
+import logging
+import threading
+from functools import lru_cache
+from itertools import combinations
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+try:
+    from scripts.media_prep import IMAGE_EXTENSIONS
+except ImportError:
+    from media_prep import IMAGE_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+# Hamming distance (of 64 bits) at or under which two images count as the same
+MAX_DISTANCE = int(os.getenv("NEAR_DUP_DISTANCE", "6"))
+# What the watcher does with a near-duplicate: "warn", "skip" or "off"
+NEAR_DUP_ACTION = os.getenv("NEAR_DUP_ACTION", "warn").lower()
+
+# Hash this many uncached images or more in a process pool
+_POOL_THRESHOLD = 32
+
+_MASK = (1 << 64) - 1
+
+def to_signed(h: int) -> int:
+    """Fit an unsigned 64-bit hash into SQLite's signed INTEGER"""
+    return h - (1 << 64) if h >= 1 << 63 else h
+
+def to_unsigned(h: int) -> int:
+    return h & _MASK
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+def dhash(path: str, size: int = 8) -> Optional[int]:
+    """64-bit difference hash of an image, or None if it can't be decoded"""
+    if not PIL_AVAILABLE:
+        return None
+    try:
+        with Image.open(path) as img:
+            img.draft("L", (size * 8, size * 8))  # let JPEG decode at reduced scale
+            small = img.convert("L").resize((size + 1, size), Image.LANCZOS)
+            px = small.tobytes()
+    except Exception as e:
+        logger.debug(f"dHash failed for {path}: {e}")
+        return None
+    bits = 0
+    for row in range(size):
+        base = row * (size + 1)
+        for col in range(size):
+            bits = (bits << 1) | (px[base + col] > px[base + col + 1])
+    return bits
+
+@lru_cache(maxsize=None)
+def _flip_masks(bits: int, radius: int) -> Tuple[int, ...]:
+    """Every mask of `bits` bits with at most `radius` bits set"""
+    return tuple(
+        sum(1 << b for b in flipped)
+        for r in range(radius + 1)
+        for flipped in combinations(range(bits), r)
+    )
+
+class HammingIndex:
+    """
+    Multi-index hashing over 64-bit hashes.
+
+    The hash is cut into 4 chunks of 16 bits, each with its own table. If two
+    hashes are within distance d, at least one chunk differs by no more than
+    d // 4 bits (pigeonhole), so a search only has to verify the entries in
+    the buckets that close to the query's chunks. With uniform hashes that is
+    a handful of entries per bucket even at hundreds of thousands of images.
+    A BK-tree was measured at about 2x slower than a linear scan at 300k
+    hashes and d=6, as random 64-bit distances cluster too tightly to prune.
+    """
+
+    CHUNKS = 4
+    CHUNK_BITS = 16
+
+    def __init__(self):
+        self._tables: List[Dict[int, list]] = [{} for _ in range(self.CHUNKS)]
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _chunks(self, h: int):
+        mask = (1 << self.CHUNK_BITS) - 1
+        return ((h >> (self.CHUNK_BITS * i)) & mask for i in range(self.CHUNKS))
+
+    def add(self, h: int, item: Any):
+        entry = (h, item)
+        for table, chunk in zip(self._tables, self._chunks(h)):
+            table.setdefault(chunk, []).append(entry)
+        self._size += 1
+
+    def search(self, h: int, max_distance: int) -> List[Tuple[int, Any]]:
+        """(distance, item) for everything within max_distance, nearest first"""
+        masks = _flip_masks(self.CHUNK_BITS, max_distance // self.CHUNKS)
+        seen = set()
+        found: List[Tuple[int, Any]] = []
+        for table, chunk in zip(self._tables, self._chunks(h)):
+            for mask in masks:
+                for entry in table.get(chunk ^ mask, ()):
+                    if id(entry) in seen:
+                        continue
+                    seen.add(id(entry))
+                    d = (h ^ entry[0]).bit_count()
+                    if d <= max_distance:
+                        found.append((d, entry[1]))
+        found.sort(key=lambda m: m[0])
+        return found
+
+def perceptual_hashes(db, paths: List[str]) -> Dict[str, int]:
+    """
+    dHash for each image in `paths` (unsigned; non-images and unreadable files left out).
+
+    Hashes are stored in file_hashes beside the content hash, so an image
+    whose size and mtime haven't changed is never decoded twice.
+    """
+    images = [p for p in dict.fromkeys(paths) if Path(p).suffix.lower() in IMAGE_EXTENSIONS]
+    if not PIL_AVAILABLE or not images:
+        return {}
+    db.file_hashes(images)  # clears the stored dHash of any file that changed
+    stored = db.stored_phashes(images)
+    missing = [p for p, h in stored.items() if h is None]
+    if len(missing) >= _POOL_THRESHOLD:
+        with ProcessPoolExecutor() as pool:
+            computed = dict(zip(missing, pool.map(dhash, missing, chunksize=16)))
+    else:
+        computed = {p: dhash(p) for p in missing}
+    db.store_phashes({p: to_signed(h) for p, h in computed.items() if h is not None})
+    stored.update((p, to_signed(h)) for p, h in computed.items() if h is not None)
+    return {p: to_unsigned(h) for p, h in stored.items() if h is not None}
+
+class NearDuplicateIndex:
+    """Per-client HammingIndexes of job dHashes; `db` is the scripts/db.py module in use"""
+
+    def __init__(self, db, max_distance: int = MAX_DISTANCE):
+        self.db = db
+        self.max_distance = max_distance
+        self._indexes: Dict[str, HammingIndex] = {}
+        self._last_id: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _refresh(self, client: str) -> HammingIndex:
+        # Loads everything the first time, then only jobs added since
+        index = self._indexes.setdefault(client, HammingIndex())
+        last = self._last_id.get(client, 0)
+        for job_id, h in self.db.client_phashes(client, last):
+            index.add(to_unsigned(h), job_id)
+            last = max(last, job_id)
+        self._last_id[client] = last
+        return index
+
+    def find(self, client: str, h: int, max_distance: Optional[int] = None) -> List[Tuple[int, int]]:
+        """(distance, job id) of the client's jobs that look like hash `h`, nearest first"""
+        with self._lock:
+            index = self._refresh(client)
+            return index.search(h, self.max_distance if max_distance is None else max_distance)
+
+    def screen(self, rows: List[Dict[str, Any]], skip: bool = False) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Hash the images in enqueue `rows` and look for near-duplicates among
+        the client's jobs and earlier rows of the same batch.
+
+        Each row gets "phash" (stored with the job); matched rows also get
+        "near_duplicates": [(distance, job id or path)]. Returns (rows to
+        enqueue, matched rows); with skip=True matched rows are left out of
+        the first list.
+        """
+        hashes = perceptual_hashes(self.db, [r["path"] for r in rows])
+        batch: Dict[str, HammingIndex] = {}
+        keep: List[Dict[str, Any]] = []
+        flagged: List[Dict[str, Any]] = []
+        for r in rows:
+            h = hashes.get(r["path"])
+            if h is None:
+                keep.append(r)
+                continue
+            r["phash"] = to_signed(h)
+            matches = self.find(r["client"], h)
+            matches += batch.setdefault(r["client"], HammingIndex()).search(h, self.max_distance)
+            if matches:
+                r["near_duplicates"] = sorted(matches, key=lambda m: m[0])
+                flagged.append(r)
+                if skip:
+                    continue
+            batch[r["client"]].add(h, r["path"])
+            keep.append(r)
+        return keep, flagged
@@ -51,6 +51,15 @@ try:
 except ImportError:
     TIKTOK_AVAILABLE = False
 
+try:
+    from scripts.sdk_executor import run_blocking
+    from scripts.client_registry import get_client_registry
+    from scripts.media_prep import get_media_preparer
+except ImportError:
+    from sdk_executor import run_blocking
+    from client_registry import get_client_registry
+    from media_prep import get_media_preparer
+
 logger = logging.getLogger(__name__)
 
 class PlatformError(Exception):
@@ -69,6 +78,10 @@ class PostingError(PlatformError):
     """Raised when posting fails"""
     pass
 
+class UnsupportedMediaError(PlatformError, ValueError):
+    """Raised when a file can never be posted to a platform (wrong format)"""
+    pass
+
 class PlatformPoster(ABC):
     """Abstract base class for platform-specific posting"""
     
@@ -77,6 +90,15 @@ class PlatformPoster(ABC):
         self.config = config
         self.logger = logging.getLogger(f"{self.__class__.__name__}.{client_name}")
     
+    @property
+    def account_key(self) -> str:
+        """Key that serializes blocking SDK calls for this account (see sdk_executor)"""
+        return f"{self.get_platform_name()}:{self.client_name}"
+    
+    async def run_sdk(self, fn, *args, **kwargs):
+        """Run a blocking SDK call off the event loop, one at a time per account"""
+        return await run_blocking(self.account_key, fn, *args, **kwargs)
+    
     @abstractmethod
     async def authenticate(self) -> bool:
         """Authenticate with the platform"""
@@ -111,7 +133,7 @@ class PlatformPoster(ABC):
         supported_extensions = self.get_supported_extensions(content_type)
         
         if file_ext not in supported_extensions:
-            raise ValueError(f"Unsupported file format {file_ext} for {self.get_platform_name()}")
+            raise UnsupportedMediaError(f"Unsupported file format {file_ext} for {self.get_platform_name()}")
         
         return True
     
@@ -119,6 +141,17 @@ class PlatformPoster(ABC):
     def get_supported_extensions(self, content_type: str) -> List[str]:
         """Get supported file extensions for content type"""
         pass
+    
+    async def prepare_media(self, file_path: str, content_type: str) -> str:
+        """Resize/re-encode the file to this platform's spec (cached); returns the path to upload"""
+        overrides = (self.config.get("media_profiles") or {}).get(self.get_platform_name())
+        return await get_media_preparer().prepare(
+            file_path,
+            self.get_platform_name(),
+            content_type,
+            self.get_supported_extensions(content_type),
+            overrides,
+        )
 
 class InstagramPoster(PlatformPoster):
     """Instagram posting implementation"""
@@ -135,43 +168,51 @@ class InstagramPoster(PlatformPoster):
         if not self.username or not self.password:
             raise AuthenticationError("Instagram credentials not provided")
     
+    def _login(self):
+        """Blocking session load / login (runs on the SDK pool); returns the client"""
+        client = InstagramClient()
+        
+        # Try to load existing session
+        session_file = Path(__file__).parent.parent / "config" / "sessions" / f"{self.client_name}_instagram.json"
+        if session_file.exists():
+            try:
+                client.load_settings(str(session_file))
+                client.account_info()  # Test session
+                return client
+            except Exception:
+                pass  # Session invalid, re-authenticate
+        
+        # Fresh login
+        twofa = os.getenv("IG_2FA_CODE")
+        if twofa:
+            client.login(self.username, self.password, verification_code=twofa)
+        else:
+            client.login(self.username, self.password)
+        
+        # Save session
+        session_file.parent.mkdir(parents=True, exist_ok=True)
+        client.dump_settings(str(session_file))
+        return client
+    
     async def authenticate(self) -> bool:
-        """Authenticate with Instagram"""
+        """Authenticate with Instagram (reuses the cached session while it is fresh)"""
         try:
-            self.client = InstagramClient()
-            
-            # Try to load existing session
-            session_file = Path(__file__).parent.parent / "config" / "sessions" / f"{self.client_name}_instagram.json"
-            if session_file.exists():
-                try:
-                    self.client.load_settings(str(session_file))
-                    self.client.account_info()  # Test session
-                    return True
-                except Exception:
-                    pass  # Session invalid, re-authenticate
-            
-            # Fresh login
-            twofa = os.getenv("IG_2FA_CODE")
-            if twofa:
-                self.client.login(self.username, self.password, verification_code=twofa)
-            else:
-                self.client.login(self.username, self.password)
-            
-            # Save session
-            session_file.parent.mkdir(parents=True, exist_ok=True)
-            self.client.dump_settings(str(session_file))
+            self.client = await get_client_registry().get(
+                "instagram", self.client_name,
+                factory=lambda: self.run_sdk(self._login),
+                validate=lambda client: self.run_sdk(client.account_info),
+            )
             return True
-            
         except Exception as e:
             self.logger.error(f"Instagram authentication failed: {e}")
-            raise AuthenticationError(f"Instagram authentication failed: {e}")
+            raise AuthenticationError(f"Instagram authentication failed: {e}") from e
     
     async def post_photo(self, file_path: str, caption: str = None, **kwargs) -> Dict[str, Any]:
         """Post a photo to Instagram"""
         self.validate_file(file_path, "photo")
         
         try:
-            result = self.client.photo_upload(file_path, caption or "")
+            result = await self.run_sdk(self.client.photo_upload, file_path, caption or "")
             return {
                 "success": True,
                 "platform": "instagram",
@@ -180,15 +221,16 @@ class InstagramPoster(PlatformPoster):
                 "timestamp": datetime.now().isoformat()
             }
         except Exception as e:
+            get_client_registry().evict_on_auth_error("instagram", self.client_name, e)
             self.logger.error(f"Instagram photo upload failed: {e}")
-            raise PostingError(f"Instagram photo upload failed: {e}")
+            raise PostingError(f"Instagram photo upload failed: {e}") from e
     
     async def post_video(self, file_path: str, caption: str = None, **kwargs) -> Dict[str, Any]:
         """Post a video to Instagram"""
         self.validate_file(file_path, "video")
         
         try:
-            result = self.client.video_upload(file_path, caption or "")
+            result = await self.run_sdk(self.client.video_upload, file_path, caption or "")
             return {
                 "success": True,
                 "platform": "instagram",
@@ -197,15 +239,16 @@ class InstagramPoster(PlatformPoster):
                 "timestamp": datetime.now().isoformat()
             }
         except Exception as e:
+            get_client_registry().evict_on_auth_error("instagram", self.client_name, e)
             self.logger.error(f"Instagram video upload failed: {e}")
-            raise PostingError(f"Instagram video upload failed: {e}")
+            raise PostingError(f"Instagram video upload failed: {e}") from e
     
     async def post_story(self, file_path: str, **kwargs) -> Dict[str, Any]:
         """Post a story to Instagram"""
         self.validate_file(file_path, "story")
         
         try:
-            result = self.client.story_upload(file_path)
+            result = await self.run_sdk(self.client.story_upload, file_path)
             return {
                 "success": True,
                 "platform": "instagram",
@@ -214,8 +257,9 @@ class InstagramPoster(PlatformPoster):
                 "timestamp": datetime.now().isoformat()
             }
         except Exception as e:
+            get_client_registry().evict_on_auth_error("instagram", self.client_name, e)
             self.logger.error(f"Instagram story upload failed: {e}")
-            raise PostingError(f"Instagram story upload failed: {e}")
+            raise PostingError(f"Instagram story upload failed: {e}") from e
     
     def get_platform_name(self) -> str:
         return "instagram"
@@ -246,32 +290,41 @@ class TwitterPoster(PlatformPoster):
         if not all([self.api_key, self.api_secret, self.access_token, self.access_secret]):
             raise AuthenticationError("Twitter credentials not provided")
     
+    async def _connect(self):
+        auth = tweepy.OAuth1UserHandler(
+            self.api_key,
+            self.api_secret,
+            self.access_token,
+            self.access_secret
+        )
+        client = tweepy.API(auth)
+        
+        # Test authentication
+        await self.run_sdk(client.verify_credentials)
+        return client
+    
     async def authenticate(self) -> bool:
-        """Authenticate with Twitter"""
+        """Authenticate with Twitter (reuses the cached API client while it is fresh)"""
         try:
-            auth = tweepy.OAuth1UserHandler(
-                self.api_key,
-                self.api_secret,
-                self.access_token,
-                self.access_secret
+            self.client = await get_client_registry().get(
+                "twitter", self.client_name,
+                factory=self._connect,
+                validate=lambda client: self.run_sdk(client.verify_credentials),
             )
-            self.client = tweepy.API(auth)
-            
-            # Test authentication
-            self.client.verify_credentials()
             return True
             
         except Exception as e:
             self.logger.error(f"Twitter authentication failed: {e}")
-            raise AuthenticationError(f"Twitter authentication failed: {e}")
+            raise AuthenticationError(f"Twitter authentication failed: {e}") from e
     
     async def post_photo(self, file_path: str, caption: str = None, **kwargs) -> Dict[str, Any]:
         """Post a photo to Twitter"""
         self.validate_file(file_path, "photo")
         
         try:
-            media = self.client.media_upload(file_path)
-            result = self.client.update_status(
+            media = await self.run_sdk(self.client.media_upload, file_path)
+            result = await self.run_sdk(
+                self.client.update_status,
                 status=caption or "",
                 media_ids=[media.media_id]
             )
@@ -283,16 +336,18 @@ class TwitterPoster(PlatformPoster):
                 "timestamp": datetime.now().isoformat()
             }
         except Exception as e:
+            get_client_registry().evict_on_auth_error("twitter", self.client_name, e)
             self.logger.error(f"Twitter photo upload failed: {e}")
-            raise PostingError(f"Twitter photo upload failed: {e}")
+            raise PostingError(f"Twitter photo upload failed: {e}") from e
     
     async def post_video(self, file_path: str, caption: str = None, **kwargs) -> Dict[str, Any]:
         """Post a video to Twitter"""
         self.validate_file(file_path, "video")
         
         try:
-            media = self.client.media_upload(file_path, media_category="tweet_video")
-            result = self.client.update_status(
+            media = await self.run_sdk(self.client.media_upload, file_path, media_category="tweet_video")
+            result = await self.run_sdk(
+                self.client.update_status,
                 status=caption or "",
                 media_ids=[media.media_id]
             )
@@ -304,8 +359,9 @@ class TwitterPoster(PlatformPoster):
                 "timestamp": datetime.now().isoformat()
             }
         except Exception as e:
+            get_client_registry().evict_on_auth_error("twitter", self.client_name, e)
             self.logger.error(f"Twitter video upload failed: {e}")
-            raise PostingError(f"Twitter video upload failed: {e}")
+            raise PostingError(f"Twitter video upload failed: {e}") from e
     
     async def post_story(self, file_path: str, **kwargs) -> Dict[str, Any]:
         """Twitter doesn't support stories, post as regular tweet"""
@@ -339,11 +395,11 @@ class LinkedInPoster(PlatformPoster):
     async def authenticate(self) -> bool:
         """Authenticate with LinkedIn"""
         try:
-            self.client = Linkedin(self.username, self.password)
+            self.client = await self.run_sdk(Linkedin, self.username, self.password)
             return True
         except Exception as e:
             self.logger.error(f"LinkedIn authentication failed: {e}")
-            raise AuthenticationError(f"LinkedIn authentication failed: {e}")
+            raise AuthenticationError(f"LinkedIn authentication failed: {e}") from e
     
     async def post_photo(self, file_path: str, caption: str = None, **kwargs) -> Dict[str, Any]:
         """Post a photo to LinkedIn"""
@@ -362,7 +418,7 @@ class LinkedInPoster(PlatformPoster):
             return result
         except Exception as e:
             self.logger.error(f"LinkedIn photo upload failed: {e}")
-            raise PostingError(f"LinkedIn photo upload failed: {e}")
+            raise PostingError(f"LinkedIn photo upload failed: {e}") from e
     
     async def post_video(self, file_path: str, caption: str = None, **kwargs) -> Dict[str, Any]:
         """Post a video to LinkedIn"""
@@ -380,7 +436,7 @@ class LinkedInPoster(PlatformPoster):
             return result
         except Exception as e:
             self.logger.error(f"LinkedIn video upload failed: {e}")
-            raise PostingError(f"LinkedIn video upload failed: {e}")
+            raise PostingError(f"LinkedIn video upload failed: {e}") from e
     
     async def post_story(self, file_path: str, **kwargs) -> Dict[str, Any]:
         """LinkedIn doesn't support stories, post as regular post"""
@@ -415,11 +471,11 @@ class YouTubePoster(PlatformPoster):
         """Authenticate with YouTube"""
         try:
             credentials = Credentials.from_authorized_user_file(self.credentials_file)
-            self.client = build('youtube', 'v3', credentials=credentials)
+            self.client = await self.run_sdk(build, 'youtube', 'v3', credentials=credentials)
             return True
         except Exception as e:
             self.logger.error(f"YouTube authentication failed: {e}")
-            raise AuthenticationError(f"YouTube authentication failed: {e}")
+            raise AuthenticationError(f"YouTube authentication failed: {e}") from e
     
     async def post_video(self, file_path: str, caption: str = None, **kwargs) -> Dict[str, Any]:
         """Post a video to YouTube Shorts"""
@@ -437,7 +493,7 @@ class YouTubePoster(PlatformPoster):
             return result
         except Exception as e:
             self.logger.error(f"YouTube video upload failed: {e}")
-            raise PostingError(f"YouTube video upload failed: {e}")
+            raise PostingError(f"YouTube video upload failed: {e}") from e
     
     async def post_photo(self, file_path: str, caption: str = None, **kwargs) -> Dict[str, Any]:
         """YouTube doesn't support photos, convert to video or skip"""
@@ -478,7 +534,7 @@ class TikTokPoster(PlatformPoster):
             return True
         except Exception as e:
             self.logger.error(f"TikTok authentication failed: {e}")
-            raise AuthenticationError(f"TikTok authentication failed: {e}")
+            raise AuthenticationError(f"TikTok authentication failed: {e}") from e
     
     async def post_video(self, file_path: str, caption: str = None, **kwargs) -> Dict[str, Any]:
         """Post a video to TikTok"""
@@ -496,7 +552,7 @@ class TikTokPoster(PlatformPoster):
             return result
         except Exception as e:
             self.logger.error(f"TikTok video upload failed: {e}")
-            raise PostingError(f"TikTok video upload failed: {e}")
+            raise PostingError(f"TikTok video upload failed: {e}") from e
     
     async def post_photo(self, file_path: str, caption: str = None, **kwargs) -> Dict[str, Any]:
         """TikTok doesn't support photos"""
@@ -536,18 +592,20 @@ class FacebookPoster(PlatformPoster):
             return True
         except Exception as e:
             self.logger.error(f"Facebook authentication failed: {e}")
-            raise AuthenticationError(f"Facebook authentication failed: {e}")
+            raise AuthenticationError(f"Facebook authentication failed: {e}") from e
     
     async def post_photo(self, file_path: str, caption: str = None, **kwargs) -> Dict[str, Any]:
         """Post a photo to Facebook"""
         self.validate_file(file_path, "photo")
         
         try:
-            with open(file_path, 'rb') as f:
-                result = self.client.put_photo(
-                    image=f,
-                    message=caption or ""
-                )
+            def upload():
+                with open(file_path, 'rb') as f:
+                    return self.client.put_photo(
+                        image=f,
+                        message=caption or ""
+                    )
+            result = await self.run_sdk(upload)
             return {
                 "success": True,
                 "platform": "facebook",
@@ -557,18 +615,20 @@ class FacebookPoster(PlatformPoster):
             }
         except Exception as e:
             self.logger.error(f"Facebook photo upload failed: {e}")
-            raise PostingError(f"Facebook photo upload failed: {e}")
+            raise PostingError(f"Facebook photo upload failed: {e}") from e
     
     async def post_video(self, file_path: str, caption: str = None, **kwargs) -> Dict[str, Any]:
         """Post a video to Facebook"""
         self.validate_file(file_path, "video")
         
         try:
-            with open(file_path, 'rb') as f:
-                result = self.client.put_video(
-                    video=f,
-                    message=caption or ""
-                )
+            def upload():
+                with open(file_path, 'rb') as f:
+                    return self.client.put_video(
+                        video=f,
+                        message=caption or ""
+                    )
+            result = await self.run_sdk(upload)
             return {
                 "success": True,
                 "platform": "facebook",
@@ -578,20 +638,22 @@ class FacebookPoster(PlatformPoster):
             }
         except Exception as e:
             self.logger.error(f"Facebook video upload failed: {e}")
-            raise PostingError(f"Facebook video upload failed: {e}")
+            raise PostingError(f"Facebook video upload failed: {e}") from e
     
     async def post_story(self, file_path: str, **kwargs) -> Dict[str, Any]:
         """Post a story to Facebook"""
         self.validate_file(file_path, "story")
         
         try:
-            with open(file_path, 'rb') as f:
-                result = self.client.put_object(
-                    parent_object=f"{self.page_id}/feed",
-                    connection_name="photos",
-                    message=kwargs.get('caption', ''),
-                    source=f
-                )
+            def upload():
+                with open(file_path, 'rb') as f:
+                    return self.client.put_object(
+                        parent_object=f"{self.page_id}/feed",
+                        connection_name="photos",
+                        message=kwargs.get('caption', ''),
+                        source=f
+                    )
+            result = await self.run_sdk(upload)
             return {
                 "success": True,
                 "platform": "facebook",
@@ -601,7 +663,7 @@ class FacebookPoster(PlatformPoster):
             }
         except Exception as e:
             self.logger.error(f"Facebook story upload failed: {e}")
-            raise PostingError(f"Facebook story upload failed: {e}")
+            raise PostingError(f"Facebook story upload failed: {e}") from e
     
     def get_platform_name(self) -> str:
         return "facebook"
@@ -1,22 +1,20 @@
 # C:\autoposter\scripts\purge_done.py
 from __future__ import annotations
-import sqlite3
+import sys
+import importlib.util
 from pathlib import Path
-from datetime import datetime, timezone, timedelta
 
 ROOT = Path(__file__).resolve().parents[1]
-DB = ROOT / "data" / "autoposter.db"
+spec = importlib.util.spec_from_file_location("db", str(ROOT / "scripts" / "db.py"))
+db = importlib.util.module_from_spec(spec); spec.loader.exec_module(db)  # type: ignore
 
 def main(days=30):
-    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
-    con = sqlite3.connect(DB)
-    try:
-        cur = con.cursor()
-        cur.execute("DELETE FROM jobs WHERE status='done' AND posted_at IS NOT NULL AND posted_at < ?", (cutoff.isoformat(),))
-        print(f"Deleted {cur.rowcount} old done rows (< {cutoff.isoformat()})")
-        con.commit()
-    finally:
-        con.close()
+    # Moves finished jobs into jobs_archive (batched, safe to re-run), then compacts the file.
+    moved = db.archive_jobs(older_than_days=days)
+    print(f"Archived {moved} finished job(s) older than {days} day(s)")
+    # Run offline: switching an old database to incremental vacuum rewrites it once
+    db.compact_db(full_vacuum=True)
+    print("Compacted database (incremental_vacuum + optimize)")
 
 if __name__ == "__main__":
-    main()
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 30)
@@ -4,7 +4,11 @@ from __future__ import annotations
 import os
 import argparse
 import json
-from typing import Dict, Any, Optional
+import signal
+import threading
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Any, Iterator, Optional, Set, Tuple
 from pathlib import Path
 import importlib.util
 
@@ -17,6 +21,13 @@ db = importlib.util.module_from_spec(spec)
 assert spec and spec.loader, "Failed to prepare db module spec"
 spec.loader.exec_module(db)  # type: ignore[attr-defined]
 
+spec = importlib.util.spec_from_file_location("rate_limiter", PROJECT_ROOT / "scripts" / "rate_limiter.py")
+rate_limiter = importlib.util.module_from_spec(spec)
+assert spec and spec.loader, "Failed to prepare rate_limiter module spec"
+spec.loader.exec_module(rate_limiter)  # type: ignore[attr-defined]
+
+limiter = rate_limiter.RateLimiter(db)
+
 CLIENTS_DIR = PROJECT_ROOT / "config" / "clients"
 
 def load_client_config(client: str) -> Dict[str, Any]:
@@ -26,32 +37,76 @@ def load_client_config(client: str) -> Dict[str, Any]:
     except Exception:
         return {}
 
-def today_quota_used(conn, client: str, content_type: str) -> int:
-    row = conn.execute(
-        """
-        SELECT COUNT(*) AS c
-        FROM jobs
-        WHERE client = ? AND content_type = ? AND status = 'done'
-          AND date(created_at) = date('now')
-        """,
-        (client, content_type),
-    ).fetchone()
-    return int((row or {"c": 0})["c"] or 0)
-
-def should_throttle(conn, client: str, content_type: str, cfg: Dict[str, Any]) -> Optional[str]:
+class ConfigCache:
+    """client.json per client, re-read only when the file's mtime changes."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Tuple[Optional[float], Dict[str, Any]]] = {}
+
+    def get(self, client: str) -> Dict[str, Any]:
+        p = CLIENTS_DIR / client / "client.json"
+        try:
+            mtime: Optional[float] = p.stat().st_mtime
+        except OSError:
+            mtime = None
+        with self._lock:
+            hit = self._cache.get(client)
+            if hit and hit[0] == mtime:
+                return hit[1]
+        cfg = load_client_config(client)
+        with self._lock:
+            self._cache[client] = (mtime, cfg)
+        return cfg
+
+class LeaseKeeper:
+    """
+    Heartbeats the jobs this process is working on from a daemon thread.
+
+    Each held job's lease is extended every lease_seconds / 3, so an upload
+    that outlasts the lease isn't reaped and handed to another runner.
+    """
+
+    def __init__(self, worker_id: str, lease_seconds: int, interval: float | None = None) -> None:
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self._interval = interval if interval is not None else max(1.0, lease_seconds / 3)
+        self._lock = threading.Lock()
+        self._jobs: Set[int] = set()
+        self._stop = threading.Event()
+        threading.Thread(target=self._loop, name="lease-keeper", daemon=True).start()
+
+    @contextmanager
+    def hold(self, job_id: int) -> Iterator[None]:
+        with self._lock:
+            self._jobs.add(job_id)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._jobs.discard(job_id)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self._interval):
+            with self._lock:
+                jobs = sorted(self._jobs)
+            for jid in jobs:
+                try:
+                    if not db.heartbeat(jid, self.worker_id, self.lease_seconds):
+                        print(f"[runner] lost the lease on job#{jid}")
+                        with self._lock:
+                            self._jobs.discard(jid)
+                except Exception as e:
+                    print(f"[runner] heartbeat error on job#{jid}: {e}")
+
+def next_slot(client: str, platform: str, content_type: str, cfg: Dict[str, Any]) -> Optional[str]:
+    """None if the upload may go now (a token is taken); else the ETA when capacity frees up."""
     if os.environ.get("IGNORE_QUOTA") == "1":
         return None
-    max_per_day = (cfg.get("max_per_day") or {}).get(content_type)
-    if not max_per_day:
-        return None
-    used = today_quota_used(conn, client, content_type)
-    try:
-        limit = int(max_per_day)
-    except Exception:
-        return None
-    if used >= limit:
-        return f"QUOTA REACHED {client}/{content_type} ({used}/{limit})"
-    return None
+    return limiter.acquire(client, platform, content_type, cfg)
 
 def simulate_upload(kind: str, client: str, path: str, caption: str | None, dry_run: bool) -> bool:
     if dry_run:
@@ -60,56 +115,148 @@ def simulate_upload(kind: str, client: str, path: str, caption: str | None, dry_
     print(f"[LIVE] Uploaded {kind} for {client}: {path}")
     return True
 
-def _reschedule_one_hour(job_id: int) -> str:
-    from datetime import datetime, timedelta, timezone
-    new_eta = (datetime.now(timezone.utc) + timedelta(hours=1)).replace(microsecond=0).isoformat()
-    db.reschedule(job_id, new_eta, reason="quota")
-    return new_eta
+def process_job(row, cfg: Dict[str, Any], dry_run: bool) -> bool:
+    """Upload one claimed job and record the outcome; False if it was throttled."""
+    jid = row["id"]
+    client = row["client"]
+    kind = row["content_type"]
+    path = row["path"]
+    caption = row.get("caption")
+    platform = row.extras.get("platform", "instagram")
+
+    new_eta = next_slot(client, platform, kind, cfg)
+    if new_eta:
+        # Straight to the moment a token frees up, not a blind +1h retry
+        db.reschedule(jid, new_eta, reason="rate limit")
+        print(f"[runner] RATE LIMITED {client}/{platform}/{kind}. Rescheduled job#{jid} -> {new_eta}")
+        return False
+
+    try:
+        ok = simulate_upload(kind, client, path, caption, dry_run)
+        error = None if ok else "upload failed"
+    except Exception as e:
+        # Back off per the exception's class instead of holding the lease until it expires
+        error = e
+    if error is None:
+        db.mark_done(jid)
+        print(f"[runner] job#{jid} done")
+    else:
+        retry_at = db.fail_job(jid, error)
+        if retry_at:
+            print(f"[runner] job#{jid} failed -> retry at {retry_at}")
+        else:
+            print(f"[runner] job#{jid} failed -> dead (out of attempts)")
+    return True
+
+def run_held(leases: LeaseKeeper, row, cfg: Dict[str, Any], dry_run: bool) -> bool:
+    """process_job with the job's lease kept alive while it runs."""
+    with leases.hold(row["id"]):
+        return process_job(row, cfg, dry_run)
+
+def run_daemon(args, worker_id: str) -> None:
+    """
+    Serve every client from one process until SIGINT/SIGTERM.
+
+    Claims only as many jobs as there are idle workers (at most
+    --per-client per client per round, interleaved), so leases are never
+    held for jobs sitting in a local backlog, and heartbeats in-flight jobs
+    so long uploads keep theirs. On shutdown it stops claiming and lets
+    in-flight jobs finish.
+    """
+    configs = ConfigCache()
+    stop = threading.Event()
+
+    def request_stop(signum, frame):
+        if not stop.is_set():
+            print("[runner] shutdown requested; draining in-flight jobs")
+        stop.set()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    reaper_stop = db.start_reaper()
+    leases = LeaseKeeper(worker_id, args.lease_seconds)
+    in_flight = set()
+    print(f"[runner] daemon start worker={worker_id} workers={args.workers} per_client={args.per_client}")
+    with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="runner") as pool:
+        while not stop.is_set():
+            jobs = []
+            idle = args.workers - len(in_flight)
+            if idle > 0:
+                jobs = db.claim_due_jobs(
+                    worker_id,
+                    limit=idle,
+                    lease_seconds=args.lease_seconds,
+                    per_client_limit=args.per_client,
+                )
+                for row in jobs:
+                    cfg = configs.get(row["client"])
+                    in_flight.add(pool.submit(run_held, leases, row, cfg, args.dry_run))
+            if in_flight:
+                # Wake when a worker frees up, or to look for newly due work
+                done, _ = wait(in_flight, timeout=args.poll_seconds, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    in_flight.discard(fut)
+                    if fut.exception() is not None:
+                        print(f"[runner] worker error: {fut.exception()}")
+            elif not jobs:
+                stop.wait(args.poll_seconds)
+
+        if in_flight:
+            print(f"[runner] waiting for {len(in_flight)} in-flight job(s)")
+            wait(in_flight)
+    reaper_stop.set()
+    leases.stop()
+    print("[runner] daemon stopped")
 
 def main() -> None:
     ap = argparse.ArgumentParser()
-    ap.add_argument("--client", required=True)
+    target = ap.add_mutually_exclusive_group(required=True)
+    target.add_argument("--client")
+    target.add_argument("--all-clients", action="store_true", help="Run as a daemon serving every client")
     ap.add_argument("--dry-run", action="store_true")
     ap.add_argument("--once", action="store_true")
+    ap.add_argument("--worker-id", default=None, help="Lease owner name (default: <host>:<pid>)")
+    ap.add_argument("--lease-seconds", type=int, default=300)
+    ap.add_argument("--workers", type=int, default=4, help="--all-clients: concurrent jobs")
+    ap.add_argument("--per-client", type=int, default=2, help="--all-clients: max jobs claimed per client per round")
+    ap.add_argument("--poll-seconds", type=float, default=5.0, help="--all-clients: idle poll interval")
     args = ap.parse_args()
 
-    conn = db._conn()
-    cfg = load_client_config(args.client)
     ignore_quota = os.environ.get("IGNORE_QUOTA", "0")
 
     print(f"[runner] start (DRY_RUN={args.dry_run}) (IGNORE_QUOTA={ignore_quota})")
 
-    jobs = db.get_due_jobs(limit=50, client=args.client)
-    if not jobs:
-        print("[runner] no due jobs")
+    # Release jobs left in_progress by runners that died mid-job.
+    reaped = db.reap_expired_leases()
+    if reaped["requeued"] or reaped["poisoned"]:
+        print(f"[runner] reaped expired leases: requeued={reaped['requeued']} poisoned={reaped['poisoned']}")
+
+    worker_id = args.worker_id or db.default_worker_id()
+    if args.all_clients:
+        run_daemon(args, worker_id)
         return
 
-    for row in jobs:
-        jid = row["id"]
-        client = row["client"]
-        kind = row["content_type"]
-        path = row["path"]
-        caption = row.get("caption")
-
-        throttle = should_throttle(conn, client, kind, cfg)
-        if throttle:
-            new_eta = _reschedule_one_hour(jid)
-            print(f"[runner] {throttle}. Rescheduled job#{jid} -> {new_eta}")
-            if args.once:
-                break
-            continue
-
-        db.mark_in_progress(jid)
-        ok = simulate_upload(kind, client, path, caption, args.dry_run)
-        if ok:
-            db.mark_done(jid)
-            print(f"[runner] job#{jid} done")
-        else:
-            db.reschedule(jid, db._now_iso(), reason="upload failed")
-            print(f"[runner] job#{jid} failed -> rescheduled")
+    cfg = load_client_config(args.client)
 
-        if args.once:
-            break
+    # Claim (select + mark in_progress atomically) so parallel runners never
+    # share a job; one at a time, so no lease ticks while its job waits its turn.
+    leases = LeaseKeeper(worker_id, args.lease_seconds)
+    try:
+        for n in range(1 if args.once else 50):
+            jobs = db.claim_due_jobs(
+                worker_id,
+                limit=1,
+                lease_seconds=args.lease_seconds,
+                client=args.client,
+            )
+            if not jobs:
+                if n == 0:
+                    print("[runner] no due jobs")
+                return
+            run_held(leases, jobs[0], cfg, args.dry_run)
+    finally:
+        leases.stop()
 
 if __name__ == "__main__":
     main()
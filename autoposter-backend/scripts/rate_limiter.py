@@ -0,0 +1,109 @@
+# scripts/rate_limiter.py
+"""
+Posting rate limits as token buckets, with exact next-slot times.
+
+Two kinds of bucket guard each upload:
+  - quota: client.json `max_per_day[content_type]`, one bucket per
+    (client, platform, content_type) holding up to N tokens and refilling
+    N per 24h;
+  - api: the platform's API limits (PLATFORM_LIMITS, overridable per client
+    via client.json `rate_limits: {"instagram": {"per_hour": 20}}`), shared by
+    every content type of the same (client, platform) account.
+
+Bucket state lives in the rate_buckets table (db.take_tokens), so every
+runner process sees the same counts.
+"""
+from __future__ import annotations
+
+import math
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+# Conservative defaults for unofficial/official API posting limits.
+PLATFORM_LIMITS: Dict[str, Dict[str, int]] = {
+    "instagram": {"per_hour": 25, "per_day": 100},
+    "twitter": {"per_hour": 50, "per_day": 300},
+    "facebook": {"per_hour": 50},
+    "linkedin": {"per_day": 50},
+    "youtube": {"per_day": 6},
+    "tiktok": {"per_day": 20},
+}
+
+_WINDOWS = {"per_minute": 60, "per_hour": 3600, "per_day": 86400}
+
+def _utc_iso(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).replace(microsecond=0).isoformat()
+
+def platform_limits(cfg: Dict[str, Any], platform: str) -> Dict[str, int]:
+    limits = dict(PLATFORM_LIMITS.get(platform, {}))
+    limits.update((cfg.get("rate_limits") or {}).get(platform) or {})
+    return limits
+
+def daily_quota(cfg: Dict[str, Any], content_type: str) -> Optional[int]:
+    try:
+        n = int((cfg.get("max_per_day") or {}).get(content_type))
+    except (TypeError, ValueError):
+        return None
+    return n if n > 0 else None  # 0 / missing means "no daily cap", as before
+
+class RateLimiter:
+    """Admission control for uploads; `db` is the scripts/db.py module in use."""
+
+    def __init__(self, db) -> None:
+        self.db = db
+
+    def buckets(self, client: str, platform: str, content_type: str, cfg: Dict[str, Any]) -> Dict[str, tuple]:
+        """Named buckets that one upload of `content_type` must take a token from."""
+        out: Dict[str, tuple] = {}
+        quota = daily_quota(cfg, content_type)
+        if quota is not None:
+            # A new bucket starts from what today's completions have left
+            used = self.db.quota_used(client, content_type)
+            out["quota"] = (f"{client}|{platform}|{content_type}|quota", quota, quota / 86400.0, max(0, quota - used))
+        for window, limit in platform_limits(cfg, platform).items():
+            seconds = _WINDOWS.get(window)
+            if seconds and limit:
+                out[window] = (f"{client}|{platform}|api|{window}", int(limit), int(limit) / seconds)
+        return out
+
+    def acquire(
+        self, client: str, platform: str, content_type: str, cfg: Dict[str, Any], now_epoch: float | None = None
+    ) -> Optional[str]:
+        """
+        Reserve capacity for one upload.
+
+        Returns None when granted; otherwise the UTC ISO time at which every
+        bucket will have a token again (the job's new ETA). Raises ValueError
+        if a bucket can never refill.
+        """
+        buckets = list(self.buckets(client, platform, content_type, cfg).values())
+        wait = self.db.take_tokens(buckets, now_epoch)
+        if wait == 0:
+            return None
+        if math.isinf(wait):
+            raise ValueError(f"{client}/{platform}/{content_type} has no posting capacity")
+        now = (now_epoch if now_epoch is not None else datetime.now(timezone.utc).timestamp())
+        return _utc_iso(math.ceil(now + wait))
+
+    def capacity(
+        self, client: str, platform: str, content_types: List[str], cfg: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Remaining tokens and next-slot time per bucket, for each content type."""
+        now = datetime.now(timezone.utc).timestamp()
+        report: Dict[str, Any] = {}
+        for content_type in content_types:
+            named = self.buckets(client, platform, content_type, cfg)
+            levels = self.db.peek_tokens(list(named.values()), now)
+            entry: Dict[str, Any] = {}
+            for (name, bucket), (tokens, wait) in zip(named.items(), levels):
+                entry[name] = {
+                    "limit": bucket[1],
+                    "remaining": int(tokens),
+                    "next_slot": None if math.isinf(wait) else _utc_iso(math.ceil(now + wait)),
+                }
+            waits = [w for _, w in levels]
+            entry["available"] = all(w == 0 for w in waits)
+            blocked = max(waits, default=0.0)
+            entry["next_slot"] = None if math.isinf(blocked) else _utc_iso(math.ceil(now + blocked))
+            report[content_type] = entry
+        return report
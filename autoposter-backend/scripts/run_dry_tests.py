@@ -48,9 +48,9 @@ def enqueue_samples() -> List[int]:
     make_dummy(story_path, 4096)
 
     # Use the new add_job signature with kind=
-    jobs.append(db.add_job(CLIENT, str(feed_path),  kind="feed",   caption="(dry feed)",   extras={"source":"dry-test"}))
-    jobs.append(db.add_job(CLIENT, str(reels_path), kind="reels",  caption="(dry reels)",  extras={"source":"dry-test"}))
-    jobs.append(db.add_job(CLIENT, str(story_path), kind="stories",caption="(dry story)",  extras={"source":"dry-test"}))
+    jobs.append(db.add_job(CLIENT, str(feed_path),  kind="feed",   caption="(dry feed)",   extras={"source":"dry-test"}, on_conflict="replace"))
+    jobs.append(db.add_job(CLIENT, str(reels_path), kind="reels",  caption="(dry reels)",  extras={"source":"dry-test"}, on_conflict="replace"))
+    jobs.append(db.add_job(CLIENT, str(story_path), kind="stories",caption="(dry story)",  extras={"source":"dry-test"}, on_conflict="replace"))
     return jobs
 
 def force_eta_now(job_ids: List[int]) -> None:
@@ -0,0 +1,130 @@
+# scripts/sdk_executor.py
+"""
+Thread-pool execution layer for blocking platform SDK calls
+(instagrapi, tweepy, facebook-sdk, ...), so uploads never block the event loop.
+
+Calls are serialized per account: SDK clients such as instagrapi's Client are
+not thread-safe, and one account should never upload two things at once anyway.
+"""
+import os
+import time
+import asyncio
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+SDK_THREADS = int(os.getenv("SDK_EXECUTOR_THREADS", "8"))
+
+class SDKExecutor:
+    """Sized thread pool for blocking SDK calls, one call at a time per account"""
+
+    def __init__(self, max_workers: int = SDK_THREADS):
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sdk")
+        self._guard = threading.Lock()
+        # asyncio locks queue callers on the loop without tying up pool threads;
+        # the thread locks also cover callers from different event loops.
+        self._async_locks: Dict[tuple, asyncio.Lock] = {}
+        self._thread_locks: Dict[str, threading.Lock] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def _locks_for(self, account: str):
+        loop_key = (id(asyncio.get_running_loop()), account)
+        with self._guard:
+            alock = self._async_locks.get(loop_key)
+            if alock is None:
+                alock = self._async_locks[loop_key] = asyncio.Lock()
+            tlock = self._thread_locks.get(account)
+            if tlock is None:
+                tlock = self._thread_locks[account] = threading.Lock()
+        return alock, tlock
+
+    def _record(self, account: str, **values: float):
+        with self._guard:
+            s = self._stats.setdefault(account, {
+                "calls": 0, "errors": 0, "waiting": 0,
+                "wait_total": 0.0, "wait_max": 0.0, "run_total": 0.0, "run_max": 0.0,
+            })
+            for key, value in values.items():
+                if key in ("wait", "run"):
+                    s[f"{key}_total"] += value
+                    s[f"{key}_max"] = max(s[f"{key}_max"], value)
+                else:
+                    s[key] += value
+
+    async def run(self, account: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) on the pool once `account` has no other call in flight"""
+        alock, tlock = self._locks_for(account)
+        queued_at = time.monotonic()
+        self._record(account, waiting=1)
+        dequeued = []
+
+        def leave_queue() -> bool:
+            # Exactly once per call, whether it starts or is cancelled first
+            with self._guard:
+                if dequeued:
+                    return False
+                dequeued.append(True)
+            self._record(account, waiting=-1)
+            return True
+
+        def call():
+            with tlock:
+                started = time.monotonic()
+                leave_queue()
+                # Queue wait covers both the account lock and the pool backlog
+                self._record(account, calls=1, wait=started - queued_at)
+                try:
+                    return fn(*args, **kwargs)
+                except Exception:
+                    self._record(account, errors=1)
+                    raise
+                finally:
+                    self._record(account, run=time.monotonic() - started)
+
+        try:
+            async with alock:
+                return await asyncio.get_running_loop().run_in_executor(self._pool, call)
+        except asyncio.CancelledError:
+            # A call that already started runs to completion in its thread
+            leave_queue()
+            raise
+
+    def metrics(self) -> Dict[str, Any]:
+        """Per-account call counts and queue-wait / run-time figures (seconds)"""
+        with self._guard:
+            accounts = {}
+            for account, s in self._stats.items():
+                calls = s["calls"] or 1
+                accounts[account] = {
+                    "calls": int(s["calls"]),
+                    "errors": int(s["errors"]),
+                    "waiting": int(s["waiting"]),
+                    "avg_wait": s["wait_total"] / calls,
+                    "max_wait": s["wait_max"],
+                    "avg_run": s["run_total"] / calls,
+                    "max_run": s["run_max"],
+                }
+        return {"threads": self.max_workers, "accounts": accounts}
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+
+_sdk_executor: Optional[SDKExecutor] = None
+_sdk_executor_lock = threading.Lock()
+
+def get_sdk_executor() -> SDKExecutor:
+    """Get the process-wide SDK executor"""
+    global _sdk_executor
+    if _sdk_executor is None:
+        with _sdk_executor_lock:
+            if _sdk_executor is None:
+                _sdk_executor = SDKExecutor()
+    return _sdk_executor
+
+async def run_blocking(account: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Shortcut for get_sdk_executor().run(...)"""
+    return await get_sdk_executor().run(account, fn, *args, **kwargs)
@@ -10,5 +10,5 @@ p = ROOT / "content/Luchiano/feed/test_photo.jpg"
 p.parent.mkdir(parents=True, exist_ok=True)
 if not p.exists():
     p.write_bytes(b"x")
-jid = db.add_job("Luchiano", str(p), kind="feed", caption="(smoke)", extras={"source":"smoke"})
+jid = db.add_job("Luchiano", str(p), kind="feed", caption="(smoke)", extras={"source":"smoke"}, on_conflict="replace")
 print("INSERTED job#", jid)
@@ -0,0 +1,88 @@
+# scripts/test_add_job.py
+"""
+Enqueue tests: only active jobs are unique per (client, path), and the
+migration to that index never drops history.
+"""
+import sqlite3
+
+def statuses(db, client, path):
+    with db.read_conn() as conn:
+        return [r["status"] for r in conn.execute(
+            "SELECT status FROM jobs WHERE client = ? AND path = ? ORDER BY id", (client, path)
+        )]
+
+def test_skip_and_replace_only_touch_the_active_job(fresh_db):
+    db = fresh_db
+    first = db.add_job("C", "/m/a.jpg", kind="feed", caption="one")
+    assert db.add_job("C", "/m/a.jpg", kind="feed") is None  # skip: already queued
+
+    again = db.add_job("C", "/m/a.jpg", kind="feed", caption="two", on_conflict="replace")
+    assert again == first
+    assert db.get_job_by_path("C", "/m/a.jpg")["caption"] == "two"
+
+    # Another client's file with the same path is a different job
+    assert db.add_job("D", "/m/a.jpg", kind="feed") not in (None, first)
+
+def test_posted_file_can_be_queued_again(fresh_db):
+    db = fresh_db
+    first = db.add_job("C", "/m/b.jpg", kind="feed")
+    db.claim_due_jobs("w", limit=1, client="C")
+    db.mark_done(first)
+
+    second = db.add_job("C", "/m/b.jpg", kind="feed")
+    assert second is not None and second != first
+    assert statuses(db, "C", "/m/b.jpg") == ["done", "queued"]
+
+    # replace re-queues the active job; the done row stays as history
+    assert db.add_job("C", "/m/b.jpg", kind="feed", on_conflict="replace") == second
+    assert statuses(db, "C", "/m/b.jpg") == ["done", "queued"]
+
+def test_requeue_dead_leaves_a_newer_active_job_alone(fresh_db):
+    db = fresh_db
+    dead = db.add_job("C", "/m/c.jpg", kind="feed")
+    db.set_retry_policy("permanent", max_attempts=1)
+    db.fail_job(dead, "bad file", "permanent")
+    db.add_job("C", "/m/c.jpg", kind="feed")
+
+    assert db.requeue_dead(client="C") == 0
+    assert statuses(db, "C", "/m/c.jpg") == ["dead", "queued"]
+
+def test_migration_keeps_history_and_marks_active_duplicates(tmp_path, db_loader):
+    (tmp_path / "data").mkdir()
+    con = sqlite3.connect(tmp_path / "data" / "autoposter.db")
+    con.execute(
+        """
+        CREATE TABLE jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, client TEXT NOT NULL, path TEXT NOT NULL,
+            content_type TEXT NOT NULL, caption TEXT, eta TEXT,
+            status TEXT NOT NULL DEFAULT 'queued', extras TEXT NOT NULL DEFAULT '{}',
+            created_at TEXT NOT NULL, started_at TEXT, done_at TEXT, error TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    now = "2026-01-01T00:00:00+00:00"
+    con.executemany(
+        "INSERT INTO jobs (client, path, content_type, eta, status, created_at) VALUES (?, ?, 'feed', ?, ?, ?)",
+        [
+            ("C", "/m/posted.jpg", now, "done", now),    # posted once...
+            ("C", "/m/posted.jpg", now, "queued", now),  # ...and re-queued: both must survive
+            ("C", "/m/twice.jpg", now, "queued", now),
+            ("C", "/m/twice.jpg", now, "queued", now),   # real duplicate of the row above
+        ],
+    )
+    con.commit()
+    con.close()
+
+    db = db_loader(tmp_path)
+
+    assert statuses(db, "C", "/m/posted.jpg") == ["done", "queued"]
+    assert statuses(db, "C", "/m/twice.jpg") == ["queued", "duplicate"]
+    assert sorted(j["id"] for j in db.list_queue(client="C")) == [2, 3]
+    assert db.job_timeline(4)[-1]["kind"] == "duplicate"
+    with db.read_conn() as conn:
+        ddl = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'ux_jobs_client_path'"
+        ).fetchone()["sql"]
+    assert "WHERE" in ddl.upper()
+    db._BATCHER.drain()
@@ -0,0 +1,81 @@
+# scripts/test_add_jobs_bulk.py
+"""
+Bulk enqueue tests: add_jobs_bulk skips known (client, path) pairs and dedupes
+media by content hash within each client, archived jobs included.
+"""
+
+def job(client, path, digest):
+    return {"client": client, "path": path, "kind": "feed", "content_hash": digest}
+
+def rows_for(db, client):
+    with db.read_conn() as conn:
+        return {r["path"]: r for r in conn.execute(
+            "SELECT id, path, status, extras FROM jobs WHERE client = ?", (client,)
+        )}
+
+def test_link_records_copies_of_known_media(fresh_db):
+    db = fresh_db
+    original = db.add_job("C", "/m/orig.jpg", kind="feed", content_hash="h1")
+    db.claim_due_jobs("w", limit=1, client="C")
+    db.mark_done(original)
+    assert db.archive_jobs(older_than_days=-1) == 1
+
+    result = db.add_jobs_bulk(
+        [
+            job("C", "/m/copy.jpg", "h1"),     # same media as the archived job
+            job("D", "/m/other.jpg", "h1"),    # same media, different client
+            job("C", "/m/new.jpg", "h2"),
+            job("C", "/m/new-copy.jpg", "h2"), # repeated within the batch
+            job("C", "/m/new.jpg", "h3"),      # repeated path
+        ],
+        on_duplicate="link",
+    )
+
+    assert [r["path"] for r in result["inserted"]] == ["/m/other.jpg", "/m/new.jpg"]
+    assert [r["path"] for r in result["skipped"]] == ["/m/new.jpg"]
+    c_rows = rows_for(db, "C")
+    assert [(r["path"], r["duplicate_of"]) for r in result["duplicates"]] == [
+        ("/m/copy.jpg", original),
+        ("/m/new-copy.jpg", c_rows["/m/new.jpg"]["id"]),
+    ]
+    assert c_rows["/m/copy.jpg"]["status"] == "duplicate"
+    assert '"duplicate_of": %d' % original in c_rows["/m/copy.jpg"]["extras"]
+    assert c_rows["/m/new.jpg"]["status"] == "queued"
+    assert rows_for(db, "D")["/m/other.jpg"]["status"] == "queued"
+
+def test_skip_leaves_duplicates_out(fresh_db):
+    db = fresh_db
+    db.add_job("C", "/m/a.jpg", kind="feed", content_hash="h1")
+    result = db.add_jobs_bulk([job("C", "/m/b.jpg", "h1"), job("C", "/m/c.jpg", "h2")])
+    assert [r["path"] for r in result["duplicates"]] == ["/m/b.jpg"]
+    assert sorted(rows_for(db, "C")) == ["/m/a.jpg", "/m/c.jpg"]
+
+def lookup_plans(db, rows, keyword):
+    """EXPLAIN QUERY PLAN of each SELECT add_jobs_bulk runs that mentions `keyword`"""
+    with db.write_conn() as conn:
+        statements = []
+        conn.set_trace_callback(statements.append)
+        try:
+            db.add_jobs_bulk(rows)
+        finally:
+            conn.set_trace_callback(None)
+        lookups = [s for s in statements if s.lstrip().startswith("SELECT") and keyword in s]
+        return {s: [r["detail"] for r in conn.execute("EXPLAIN QUERY PLAN " + s)] for s in lookups}
+
+def test_content_hash_lookups_seek_by_client(fresh_db):
+    plans = lookup_plans(fresh_db, [job("C", "/m/a.jpg", "h1"), job("D", "/m/b.jpg", "h2")], "content_hash IN")
+    assert len(plans) == 4  # two clients x (jobs, jobs_archive)
+    for sql, plan in plans.items():
+        assert any("(client=? AND content_hash=?)" in step for step in plan), (sql, plan)
+        assert not any(step.startswith("SCAN") for step in plan), (sql, plan)
+
+def test_existing_path_lookups_seek_by_client(fresh_db):
+    db = fresh_db
+    done = db.add_job("C", "/m/a.jpg", kind="feed")
+    db.claim_due_jobs("w", limit=1, client="C")
+    db.mark_done(done)
+    plans = lookup_plans(db, [job("C", "/m/a.jpg", None), job("D", "/m/b.jpg", None)], "path IN")
+    assert len(plans) == 4  # two clients x (jobs, jobs_archive)
+    for sql, plan in plans.items():
+        assert any("(client=? AND path=?)" in step for step in plan), (sql, plan)
+        assert not any(step.startswith("SCAN") for step in plan), (sql, plan)
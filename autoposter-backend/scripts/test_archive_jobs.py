@@ -0,0 +1,115 @@
+# scripts/test_archive_jobs.py
+"""
+Archive tests: archive_jobs moves a job's events along with the job, archived
+history survives later archive runs, every terminal state is archived, and
+compaction only vacuums fully when asked.
+Runs against a throwaway database (see conftest.fresh_db), never data/autoposter.db.
+"""
+import sqlite3
+
+def count(db, table, column, value):
+    with db.read_conn() as conn:
+        return conn.execute(f"SELECT COUNT(*) AS n FROM {table} WHERE {column} = ?", (value,)).fetchone()["n"]
+
+def finish(db, client, path):
+    job_id = db.add_job(client, path, kind="feed")
+    db.claim_due_jobs("test-worker", limit=10, client=client)
+    db.mark_done(job_id)
+    return job_id
+
+def test_archive_moves_events(fresh_db):
+    """Events leave job_events in the same batch as their job and stay readable"""
+    db = fresh_db
+    old = db.add_job("ArchiveTest", "/content/old.jpg", kind="feed")
+    kept = db.add_job("ArchiveTest", "/content/kept.jpg", kind="feed")
+    db.claim_due_jobs("test-worker", limit=2, client="ArchiveTest")
+    db.mark_done(old)
+
+    timeline = db.job_timeline(old)
+    assert [e["kind"] for e in timeline] == ["claimed", "done"], timeline
+
+    # older_than_days=-1 puts the cutoff in the future, so the done job qualifies
+    assert db.archive_jobs(older_than_days=-1) == 1
+
+    assert count(db, "jobs", "id", old) == 0
+    assert count(db, "job_events", "job_id", old) == 0
+    assert count(db, "job_events_archive", "job_id", old) == len(timeline)
+    assert [e["kind"] for e in db.job_timeline(old)] == ["claimed", "done"]
+
+    # The unfinished job and its events are untouched
+    assert count(db, "jobs", "id", kept) == 1
+    assert count(db, "job_events", "job_id", kept) == 1
+    assert count(db, "job_events_archive", "job_id", kept) == 0
+
+def test_second_archive_keeps_earlier_history(fresh_db):
+    """Event ids freed by one archive run must not overwrite archived rows on the next"""
+    db = fresh_db
+    first = finish(db, "ArchiveTest", "/content/a.jpg")
+    assert db.archive_jobs(older_than_days=-1) == 1
+
+    # New events are written after the first job's were deleted from job_events
+    second = finish(db, "ArchiveTest", "/content/b.jpg")
+    assert db.archive_jobs(older_than_days=-1) == 1
+
+    assert [e["kind"] for e in db.job_timeline(first)] == ["claimed", "done"]
+    assert [e["kind"] for e in db.job_timeline(second)] == ["claimed", "done"]
+    assert db.job_timeline(first, limit=1)[0]["kind"] == "done"
+
+def test_events_table_migrates_to_autoincrement(fresh_db):
+    """A job_events table created without AUTOINCREMENT is rebuilt with its rows kept"""
+    db = fresh_db
+    job_id = finish(db, "ArchiveTest", "/content/c.jpg")
+    before = db.job_timeline(job_id)
+    with db.write_conn() as conn, conn:
+        conn.execute("ALTER TABLE job_events RENAME TO job_events_new")
+        conn.execute(
+            "CREATE TABLE job_events (id INTEGER PRIMARY KEY, job_id INTEGER NOT NULL, "
+            "ts TEXT NOT NULL, kind TEXT NOT NULL, detail TEXT)"
+        )
+        conn.execute("INSERT INTO job_events SELECT * FROM job_events_new")
+        conn.execute("DROP TABLE job_events_new")
+
+    db.init_db()
+
+    with db.read_conn() as conn:
+        ddl = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'job_events'").fetchone()["sql"]
+        assert "AUTOINCREMENT" in ddl.upper()
+        assert conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_job_events_job'"
+        ).fetchone()
+    assert db.job_timeline(job_id) == before
+
+def test_dead_and_poisoned_jobs_are_archived(fresh_db):
+    db = fresh_db
+    dead = db.add_job("ArchiveTest", "/content/dead.jpg", kind="feed")
+    poison = db.add_job("ArchiveTest", "/content/poison.jpg", kind="feed")
+    db.claim_due_jobs("test-worker", limit=2, client="ArchiveTest")
+    db.fail_job(dead, "ValueError: bad caption", error_class="permanent")
+    assert db.reap_expired_leases(max_lease_losses=1, now_iso="2999-01-01T00:00:00Z")["poisoned"] == 1
+
+    # An old job that died just now is kept for review until it ages out
+    with db.write_conn() as conn, conn:
+        conn.execute("UPDATE jobs SET created_at = '2000-01-01T00:00:00Z'")
+    assert db.archive_jobs(older_than_days=1) == 0
+
+    assert db.archive_jobs(older_than_days=-1) == 2
+    with db.read_conn() as conn:
+        statuses = {r["id"]: r["status"] for r in conn.execute("SELECT id, status FROM jobs_archive")}
+    assert statuses == {dead: "dead", poison: "poison"}
+
+def test_compaction_leaves_full_vacuum_to_purge(fresh_db):
+    db = fresh_db
+    with db.write_conn() as conn:
+        conn.execute("PRAGMA auto_vacuum=NONE;")
+        conn.execute("VACUUM")
+        statements = []
+        conn.set_trace_callback(statements.append)
+        try:
+            db.compact_db(conn=conn)
+        finally:
+            conn.set_trace_callback(None)
+        assert "VACUUM" not in statements
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()["auto_vacuum"] == 0
+
+        db.compact_db(conn=conn, full_vacuum=True)
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()["auto_vacuum"] == 2
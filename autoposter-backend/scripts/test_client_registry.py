@@ -0,0 +1,20 @@
+# scripts/test_client_registry.py
+"""
+client_registry tests: it imports without opening the database, and db's
+retry table classifies the same auth errors it evicts on.
+"""
+import sys
+
+def test_import_does_not_load_db(module_loader, monkeypatch):
+    for name in ("db", "scripts.db"):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    registry = module_loader("client_registry")
+    assert "db" not in sys.modules and "scripts.db" not in sys.modules
+    assert "LoginRequired" in registry.AUTH_ERROR_NAMES
+
+def test_db_retry_table_shares_auth_errors(fresh_db, module_loader):
+    registry = module_loader("client_registry")
+    for name in registry.AUTH_ERROR_NAMES:
+        error = type(name, (Exception,), {})("session expired")
+        assert registry.is_auth_error(error)
+        assert fresh_db.classify_error(error) == "auth", name
@@ -0,0 +1,54 @@
+# scripts/test_db_multi_platform.py
+"""
+db_multi_platform tests: every write goes through db's writer (write_conn /
+submit_write), never the legacy _conn() singleton.
+Runs against a throwaway database (see conftest.fresh_db), never data/autoposter.db.
+"""
+import pytest
+
+@pytest.fixture
+def mp(fresh_db, module_loader, monkeypatch):
+    def no_legacy_conn():
+        raise AssertionError("db_multi_platform used the legacy _conn()")
+    monkeypatch.setattr(fresh_db, "_conn", no_legacy_conn)
+
+    module = module_loader("db_multi_platform")
+    module.init_multi_platform_db()
+
+    ops = []
+    submit_write = module.submit_write
+    def recording_submit_write(op, wait=True):
+        ops.append(op.__qualname__)
+        return submit_write(op, wait)
+    monkeypatch.setattr(module, "submit_write", recording_submit_write)
+    module.ops = ops
+    return module
+
+def test_client_platform_writes_go_through_batcher(mp):
+    row_id = mp.add_client_platform("MPTest", "instagram", credentials={"token": "a"})
+    assert row_id > 0
+    assert mp.update_client_platform("MPTest", "instagram", settings={"hashtags": 3})
+    assert not mp.update_client_platform("MPTest", "tiktok", settings={})
+
+    platforms = mp.get_client_platforms("MPTest")
+    assert [p["platform"] for p in platforms] == ["instagram"]
+    assert platforms[0]["credentials"] == {"token": "a"}
+    assert platforms[0]["settings"] == {"hashtags": 3}
+    assert mp.ops == [
+        "add_client_platform.<locals>.op",
+        "update_client_platform.<locals>.op",
+        "update_client_platform.<locals>.op",
+    ]
+
+def test_retry_failed_post_goes_through_batcher(mp, fresh_db):
+    job_id = fresh_db.add_job("MPTest", "/content/mp.jpg", kind="feed")
+    post_id = mp.add_platform_post(job_id, "twitter")
+    mp.update_platform_post(post_id, "failed", error="boom")
+    assert [p["id"] for p in mp.get_failed_platform_posts()] == [post_id]
+    assert mp.get_platform_post_stats()["status_breakdown"] == {"failed": 1}
+
+    assert mp.retry_failed_platform_post(post_id)
+    assert mp.get_failed_platform_posts() == []
+    post = mp.get_job_platform_posts(job_id)[0]
+    assert (post["status"], post["error"]) == ("pending", None)
+    assert "retry_failed_platform_post.<locals>.op" in mp.ops
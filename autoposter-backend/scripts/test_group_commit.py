@@ -0,0 +1,69 @@
+# scripts/test_group_commit.py
+"""
+Group commit tests: ops share a transaction but fail alone, and writes made
+through the legacy _conn() handle can't commit part of an open batch.
+"""
+import threading
+import time
+
+import pytest
+
+def rows(db, table="jobs"):
+    with db.read_conn() as conn:
+        return [r["path"] for r in conn.execute(f"SELECT path FROM {table} ORDER BY id")]
+
+def insert(path):
+    def op(conn):
+        conn.execute(
+            "INSERT INTO jobs (client, path, content_type, created_at) VALUES ('C', ?, 'feed', '2026-01-01T00:00:00+00:00')",
+            (path,),
+        )
+        return path
+    return op
+
+def test_failed_op_rolls_back_alone(fresh_db):
+    db = fresh_db
+
+    def bad(conn):
+        insert("/m/bad.jpg")(conn)
+        raise RuntimeError("op failed")
+
+    futures = [db.submit_write(insert("/m/a.jpg"), wait=False),
+               db.submit_write(bad, wait=False),
+               db.submit_write(insert("/m/b.jpg"), wait=False)]
+    assert futures[0].result() == "/m/a.jpg"
+    with pytest.raises(RuntimeError, match="op failed"):
+        futures[1].result()
+    assert futures[2].result() == "/m/b.jpg"
+    assert rows(db) == ["/m/a.jpg", "/m/b.jpg"]
+
+def test_legacy_write_during_batch_does_not_commit_it(fresh_db):
+    db = fresh_db
+    in_op = threading.Event()
+    release = threading.Event()
+
+    def slow_bad(conn):
+        insert("/m/rolled-back.jpg")(conn)
+        in_op.set()
+        release.wait(5)
+        raise RuntimeError("op failed")
+
+    fut = db.submit_write(slow_bad, wait=False)
+    assert in_op.wait(5)
+
+    def legacy_write():
+        conn = db._conn()
+        with conn:
+            insert("/m/legacy.jpg")(conn)
+
+    legacy = threading.Thread(target=legacy_write)
+    legacy.start()
+    time.sleep(0.2)  # the legacy write now waits on SQLite's lock, not inside the batch
+    release.set()
+    legacy.join(10)
+
+    with pytest.raises(RuntimeError, match="op failed"):
+        fut.result(5)
+    assert rows(db) == ["/m/legacy.jpg"]
+    # The batcher is still healthy afterwards
+    assert db.submit_write(insert("/m/after.jpg")) == "/m/after.jpg"
@@ -0,0 +1,51 @@
+# scripts/test_leases.py
+"""
+Lease tests: claims are exclusive and leased, heartbeats keep a lease, the
+reaper requeues expired ones and parks a job as 'poison' after
+MAX_LEASE_LOSSES lost leases.
+"""
+LATER = "2999-01-01T00:00:00Z"  # any expiry is in the past by then
+
+def status(db, job_id):
+    with db.read_conn() as conn:
+        return conn.execute("SELECT status, worker_id, lease_losses FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+def test_claims_are_exclusive(fresh_db):
+    db = fresh_db
+    ids = [db.add_job("C", f"/m/{n}.jpg", kind="feed") for n in range(3)]
+    first = db.claim_due_jobs("w1", limit=2, client="C")
+    second = db.claim_due_jobs("w2", limit=5, client="C")
+    assert [j["id"] for j in first] == ids[:2]
+    assert [j["id"] for j in second] == ids[2:]
+    assert db.claim_due_jobs("w3", limit=5, client="C") == []
+    assert status(db, ids[0])["worker_id"] == "w1"
+
+def test_heartbeat_only_for_the_owner(fresh_db):
+    db = fresh_db
+    job_id = db.add_job("C", "/m/a.jpg", kind="feed")
+    db.claim_due_jobs("w1", limit=1, client="C")
+    assert db.heartbeat(job_id, "w1")
+    assert not db.heartbeat(job_id, "w2")
+
+def test_reaper_requeues_then_poisons(fresh_db):
+    db = fresh_db
+    job_id = db.add_job("C", "/m/a.jpg", kind="feed")
+    # Not expired yet: nothing to reap
+    db.claim_due_jobs("w1", limit=1, client="C")
+    assert db.reap_expired_leases() == {"poisoned": 0, "requeued": 0}
+
+    for losses in range(1, db.MAX_LEASE_LOSSES):
+        assert db.reap_expired_leases(now_iso=LATER)["requeued"] == 1
+        row = status(db, job_id)
+        assert (row["status"], row["worker_id"], row["lease_losses"]) == ("queued", None, losses)
+        assert not db.heartbeat(job_id, "w1")  # the old owner lost it
+        assert [j["id"] for j in db.claim_due_jobs("w1", limit=1, client="C")] == [job_id]
+
+    assert db.reap_expired_leases(now_iso=LATER) == {"poisoned": 1, "requeued": 0}
+    assert status(db, job_id)["status"] == "poison"
+    assert db.claim_due_jobs("w1", limit=1, client="C") == []
+    assert [e["kind"] for e in db.job_timeline(job_id)][-1] == "poisoned"
+
+    assert db.requeue_dead(client="C") == 0
+    assert db.requeue_dead(client="C", include_poison=True) == 1
+    assert status(db, job_id)["lease_losses"] == 0
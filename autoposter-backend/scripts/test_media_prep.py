@@ -0,0 +1,18 @@
+# scripts/test_media_prep.py
+"""
+media_prep tests: it hashes media without importing db, and gets the same
+content hash db.file_hashes stores.
+"""
+import sys
+
+def test_import_does_not_load_db(module_loader, monkeypatch):
+    for name in ("db", "scripts.db"):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    module_loader("media_prep")
+    assert "db" not in sys.modules and "scripts.db" not in sys.modules
+
+def test_content_hash_matches_db(fresh_db, module_loader, tmp_path):
+    media = tmp_path / "clip.mp4"
+    media.write_bytes(b"\x00\x01" * 700_000)  # spans more than one read chunk
+    content_hash = module_loader("content_hash")
+    assert fresh_db.file_hashes([str(media)])[str(media)] == content_hash.sha256_file(str(media))
@@ -0,0 +1,54 @@
+# scripts/test_multi_platform_runner.py
+"""
+multi_platform_runner tests: db_multi_platform shares the runner's db module,
+and lease heartbeats run off the event loop.
+Runs against a copy of the runner and db.py in a temp project root.
+"""
+import sys
+import asyncio
+import logging
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+@pytest.fixture
+def runner(script_loader, monkeypatch):
+    # The runner registers db in sys.modules itself; undo that afterwards
+    for name in ("db", "scripts.db"):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    module = script_loader("multi_platform_runner", "db", "db_multi_platform")
+    yield module
+    module.db._BATCHER.drain()
+
+def test_db_multi_platform_shares_the_runners_db(runner):
+    assert runner.db_mp.submit_write is runner.db.submit_write
+    assert sys.modules["scripts.db"] is sys.modules["db"] is runner.db
+
+def test_heartbeat_does_not_block_the_loop(runner, monkeypatch):
+    calls = []
+
+    def slow_heartbeat(job_id, worker_id, lease_seconds):
+        calls.append(threading.current_thread() is threading.main_thread())
+        threading.Event().wait(0.2)  # a writer busy with a batch
+        return job_id != 2
+
+    monkeypatch.setattr(runner, "HEARTBEAT_SECONDS", 0.01)
+    monkeypatch.setattr(runner.db, "heartbeat", slow_heartbeat)
+    owner = SimpleNamespace(worker_id="w", logger=logging.getLogger("test"))
+
+    async def scenario():
+        job_ids = {1, 2}
+        task = asyncio.create_task(runner.MultiPlatformRunner._heartbeat(owner, job_ids))
+        started = asyncio.get_running_loop().time()
+        for _ in range(20):
+            await asyncio.sleep(0.01)
+        elapsed = asyncio.get_running_loop().time() - started
+        await asyncio.sleep(0.3)
+        task.cancel()
+        return job_ids, elapsed
+
+    job_ids, elapsed = asyncio.run(scenario())
+    assert calls and not any(calls)  # never on the loop's thread
+    assert elapsed < 0.5             # 20 ticks of 10ms, not stalled 0.4s per round
+    assert job_ids == {1}            # a lost lease stops being renewed
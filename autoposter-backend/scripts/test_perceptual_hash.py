@@ -0,0 +1,57 @@
+# scripts/test_perceptual_hash.py
+"""
+Near-duplicate tests: HammingIndex finds exactly what a linear scan finds,
+and NearDuplicateIndex searches each client's job hashes, picking up new jobs.
+"""
+import random
+
+import pytest
+
+@pytest.fixture
+def ph(module_loader):
+    return module_loader("perceptual_hash")
+
+def flip(h, bits):
+    for b in bits:
+        h ^= 1 << b
+    return h
+
+def test_search_matches_linear_scan(ph):
+    rng = random.Random(25)
+    hashes = [rng.getrandbits(64) for _ in range(3000)]
+    # Near copies with their flipped bits spread over every 16-bit chunk
+    base = hashes[0]
+    hashes += [flip(base, rng.sample(range(64), d)) for d in range(0, 12)]
+    index = ph.HammingIndex()
+    for n, h in enumerate(hashes):
+        index.add(h, n)
+    assert len(index) == len(hashes)
+
+    for query in [base, flip(base, [1, 17, 33, 49, 63]), rng.getrandbits(64)]:
+        for max_distance in (0, 3, 6, 11):
+            expected = sorted(
+                (ph.hamming(query, h), n) for n, h in enumerate(hashes) if ph.hamming(query, h) <= max_distance
+            )
+            found = index.search(query, max_distance)
+            assert sorted(found) == expected
+            assert [d for d, _ in found] == sorted(d for d, _ in found)
+
+def test_signed_round_trip(ph):
+    for h in (0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1):
+        signed = ph.to_signed(h)
+        assert -(1 << 63) <= signed < 1 << 63
+        assert ph.to_unsigned(signed) == h
+
+def test_near_duplicate_index_per_client(ph, fresh_db):
+    db = fresh_db
+    h = (1 << 63) | 0x0F0F_0F0F
+    first = db.add_job("C", "/m/a.jpg", kind="feed", phash=ph.to_signed(h))
+    db.add_job("D", "/m/a.jpg", kind="feed", phash=ph.to_signed(h))
+    index = ph.NearDuplicateIndex(db, max_distance=4)
+
+    assert index.find("C", flip(h, [0, 20])) == [(2, first)]
+    assert index.find("C", flip(h, [0, 20, 40, 50, 60])) == []
+    # Jobs added after the first search are picked up on the next one
+    later = db.add_job("C", "/m/b.jpg", kind="feed", phash=ph.to_signed(flip(h, [5])))
+    assert index.find("C", h) == [(0, first), (1, later)]
+    assert index.find("E", h) == []
@@ -0,0 +1,57 @@
+# scripts/test_queue_runner.py
+"""
+queue_runner tests: jobs are claimed one at a time and their leases are kept
+alive while they run, so the reaper never requeues work that is in progress.
+Runs against a copy of the runner and db.py in a temp project root.
+"""
+import sys
+import time
+
+import pytest
+
+@pytest.fixture
+def runner(script_loader):
+    module = script_loader("queue_runner", "db", "rate_limiter")
+    yield module
+    module.db._BATCHER.drain()
+
+def job_row(db, job_id):
+    with db.read_conn() as conn:
+        return conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+def test_lease_keeper_extends_held_leases(runner):
+    db = runner.db
+    job_id = db.add_job("C", "/m/a.jpg", kind="feed")
+    db.claim_due_jobs("w", limit=1, lease_seconds=2, client="C")
+    claimed = job_row(db, job_id)["lease_expires_at"]
+
+    leases = runner.LeaseKeeper("w", lease_seconds=2, interval=0.2)
+    try:
+        with leases.hold(job_id):
+            time.sleep(2.5)  # longer than the lease
+            assert job_row(db, job_id)["lease_expires_at"] > claimed
+            assert db.reap_expired_leases()["requeued"] == 0
+    finally:
+        leases.stop()
+    assert job_row(db, job_id)["status"] == "in_progress"
+
+def test_single_client_run_claims_one_job_at_a_time(runner, monkeypatch):
+    db = runner.db
+    ids = [db.add_job("C", f"/m/{n}.jpg", kind="feed") for n in range(3)]
+    in_progress = []
+
+    def record(row, cfg, dry_run):
+        with db.read_conn() as conn:
+            in_progress.append(conn.execute(
+                "SELECT COUNT(*) AS n FROM jobs WHERE status = 'in_progress'"
+            ).fetchone()["n"])
+        db.mark_done(row["id"])
+        return True
+
+    monkeypatch.setattr(runner, "process_job", record)
+    monkeypatch.setattr(sys, "argv", ["queue_runner.py", "--client", "C", "--dry-run"])
+    monkeypatch.setenv("IGNORE_QUOTA", "1")
+    runner.main()
+
+    assert in_progress == [1, 1, 1]
+    assert [job_row(db, i)["status"] for i in ids] == ["done"] * 3
@@ -0,0 +1,36 @@
+# scripts/test_quota.py
+"""
+Quota tests: mark_done counts each finished job once against its client,
+content type and UTC day, and the table is seeded from existing done jobs.
+"""
+
+def finish(db, client, path, kind):
+    job_id = db.add_job(client, path, kind=kind)
+    db.claim_due_jobs("w", limit=10, client=client)
+    db.mark_done(job_id)
+    return job_id
+
+def test_mark_done_counts_once(fresh_db):
+    db = fresh_db
+    job_id = finish(db, "C", "/m/a.jpg", "feed")
+    finish(db, "C", "/m/b.jpg", "feed")
+    finish(db, "C", "/m/c.mp4", "reel")
+    finish(db, "D", "/m/a.jpg", "feed")
+    db.mark_done(job_id)  # already done: not counted again
+
+    assert db.quota_used("C", "feed") == 2
+    assert db.quota_used("C", "reel") == 1
+    assert db.quota_used("D", "feed") == 1
+    assert db.quota_used("C", "story") == 0
+    assert db.quota_used("C", "feed", day="2000-01-01") == 0
+
+def test_counters_are_seeded_from_done_jobs(fresh_db):
+    db = fresh_db
+    finish(db, "C", "/m/a.jpg", "feed")
+    finish(db, "C", "/m/b.jpg", "feed")
+    with db.write_conn() as conn, conn:
+        conn.execute("UPDATE jobs SET done_at = '2024-05-01T12:00:00Z'")
+        conn.execute("DROP TABLE quota_usage")
+    db.init_db()
+    assert db.quota_used("C", "feed", day="2024-05-01") == 2
+    assert db.quota_used("C", "feed") == 0
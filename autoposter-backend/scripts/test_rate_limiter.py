@@ -0,0 +1,54 @@
+# scripts/test_rate_limiter.py
+"""
+Rate limit tests: token buckets are taken all or nothing, refill continuously,
+and a throttled upload gets the exact time its slot frees up.
+"""
+import math
+from datetime import datetime, timezone
+
+import pytest
+
+NOW = 1_700_000_000.0
+
+def slot(seconds_after_now):
+    return datetime.fromtimestamp(math.ceil(NOW + seconds_after_now), timezone.utc).isoformat()
+
+@pytest.fixture
+def limiter(fresh_db, module_loader):
+    return module_loader("rate_limiter").RateLimiter(fresh_db)
+
+def test_take_tokens_is_all_or_nothing(fresh_db):
+    db = fresh_db
+    fast = ("fast", 2, 1 / 10)    # 2 tokens, one back every 10s
+    slow = ("slow", 1, 1 / 100)   # 1 token, one back every 100s
+
+    assert db.take_tokens([fast, slow], NOW) == 0.0
+    assert db.take_tokens([fast, slow], NOW) == pytest.approx(100.0)
+    # The refused request took nothing from the bucket that had a token left
+    assert db.peek_tokens([fast], NOW)[0] == (pytest.approx(1.0), 0.0)
+    assert db.take_tokens([fast], NOW) == 0.0
+    assert db.take_tokens([fast], NOW + 5) == pytest.approx(5.0)
+    assert db.take_tokens([fast, slow], NOW + 100) == 0.0
+
+def test_bucket_that_never_refills(fresh_db):
+    assert math.isinf(fresh_db.take_tokens([("empty", 0, 0.0)], NOW))
+
+def test_acquire_returns_the_next_free_slot(limiter):
+    cfg = {"rate_limits": {"instagram": {"per_hour": 2, "per_day": 0}}}
+    assert limiter.acquire("C", "instagram", "feed", cfg, NOW) is None
+    assert limiter.acquire("C", "instagram", "feed", cfg, NOW) is None
+    # 2 per hour refills one token every 1800s
+    assert limiter.acquire("C", "instagram", "story", cfg, NOW) == slot(1800)
+    # Another account has its own buckets
+    assert limiter.acquire("D", "instagram", "feed", cfg, NOW) is None
+
+def test_daily_quota_starts_from_todays_completions(limiter, fresh_db):
+    db = fresh_db
+    job_id = db.add_job("C", "/m/a.jpg", kind="feed")
+    db.claim_due_jobs("w", limit=1, client="C")
+    db.mark_done(job_id)
+
+    cfg = {"max_per_day": {"feed": 2}, "rate_limits": {"twitter": {"per_hour": 0}}}
+    # One of the two is used up already, so only one token is left today
+    assert limiter.acquire("C", "twitter", "feed", cfg, NOW) is None
+    assert limiter.acquire("C", "twitter", "feed", cfg, NOW) == slot(86400 / 2)
@@ -0,0 +1,71 @@
+# scripts/test_retry.py
+"""
+Retry tests: failures back off per error class, and a job that uses up its
+attempts goes 'dead' until requeue_dead brings it back.
+"""
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+FAR_FUTURE = "2999-01-01T00:00:00Z"
+
+def seconds_from_now(iso):
+    return (datetime.fromisoformat(iso.replace("Z", "+00:00")) - datetime.now(timezone.utc)).total_seconds()
+
+def test_delay_grows_and_is_capped(fresh_db):
+    policy = fresh_db.RetryPolicy(10, 2, 50, 0.0, 5)
+    assert [fresh_db.retry_delay(policy, n) for n in range(1, 6)] == [10, 20, 40, 50, 50]
+
+def test_jitter_only_shortens(fresh_db, monkeypatch):
+    policy = fresh_db.RetryPolicy(100, 1, 100, 0.25, 5)
+    monkeypatch.setattr(fresh_db.random, "random", lambda: 1.0)
+    assert fresh_db.retry_delay(policy, 1) == 75
+    monkeypatch.setattr(fresh_db.random, "random", lambda: 0.0)
+    assert fresh_db.retry_delay(policy, 1) == 100
+
+def test_errors_are_classified(fresh_db):
+    class TooManyRequests(Exception):
+        pass
+
+    class PostingError(Exception):
+        pass
+
+    try:
+        try:
+            raise TooManyRequests("slow down")
+        except TooManyRequests as e:
+            raise PostingError("instagram failed") from e
+    except PostingError as wrapped:
+        assert fresh_db.classify_error(wrapped) == "rate_limit"
+
+    server_error = Exception("bad gateway")
+    server_error.response = SimpleNamespace(status_code=503)
+    assert fresh_db.classify_error(server_error) == "transient"
+    assert fresh_db.classify_error(FileNotFoundError("/m/a.jpg")) == "permanent"
+    assert fresh_db.classify_error(ValueError("garbled reply")) == "default"
+    assert fresh_db.classify_error("plain message") == "default"
+
+def test_retries_then_dead_then_requeued(fresh_db):
+    db = fresh_db
+    db.set_retry_policy("test", base_delay=10, factor=2, max_delay=1000, jitter=0.0, max_attempts=3)
+    job_id = db.add_job("C", "/m/a.jpg", kind="feed")
+
+    for delay in (10, 20):
+        assert [j["id"] for j in db.claim_due_jobs("w", limit=1, client="C", now_iso=FAR_FUTURE)] == [job_id]
+        retry_at = db.fail_job(job_id, "boom", error_class="test")
+        assert seconds_from_now(retry_at) == pytest.approx(delay, abs=2)
+        assert db.get_job_by_path("C", "/m/a.jpg")["status"] == "queued"
+
+    db.claim_due_jobs("w", limit=1, client="C", now_iso=FAR_FUTURE)
+    assert db.fail_job(job_id, RuntimeError("boom"), error_class="test") is None
+    job = db.get_job_by_path("C", "/m/a.jpg")
+    assert (job["status"], job["failures"]) == ("dead", 3)
+    assert "RuntimeError: boom" in job["error"]
+    assert [j["id"] for j in db.list_dead(client="C")] == [job_id]
+    assert [e["kind"] for e in db.job_timeline(job_id) if e["kind"] in ("failed", "dead")] == ["failed", "failed", "dead"]
+    assert db.claim_due_jobs("w", limit=1, client="C", now_iso=FAR_FUTURE) == []
+
+    assert db.requeue_dead(client="C") == 1
+    job = db.get_job_by_path("C", "/m/a.jpg")
+    assert (job["status"], job["failures"]) == ("queued", 0)
@@ -19,8 +19,23 @@ import tempfile
 PROJECT_ROOT = Path(__file__).parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
+from scripts.sdk_executor import run_blocking
+from scripts.client_registry import get_client_registry
+
 logger = logging.getLogger(__name__)
 
+# Per-platform upload timeout (seconds); a platform that overruns stops
+# holding up the others. The SDK call itself runs in a worker thread that
+# can't be cancelled, so it may still publish: overruns are reported with
+# status "unknown", not as failures to retry.
+PLATFORM_TIMEOUTS = {
+    "instagram": 180,
+    "twitter": 60,
+    "facebook": 60,
+    "linkedin": 60,
+}
+DEFAULT_PLATFORM_TIMEOUT = float(os.getenv("POST_PLATFORM_TIMEOUT", "60"))
+
 class PostExecutor:
     """Executes posts to social media platforms"""
     
@@ -62,43 +77,68 @@ class PostExecutor:
             "postId": post.get("id"),
             "success": False,
             "platforms": {},
-            "errors": []
+            "errors": [],
+            "unknown": []
         }
         
         content = post.get("content", "")
         image_url = post.get("imageUrl")
         platforms = post.get("platforms", {})
         
-        # Process each selected platform
-        for platform, enabled in platforms.items():
-            if not enabled:
-                continue
-            
+        handlers = {
+            "instagram": self._post_to_instagram,
+            "twitter": self._post_to_twitter,
+            "facebook": self._post_to_facebook,
+            "linkedin": self._post_to_linkedin,
+        }
+        
+        async def post_one(platform: str) -> Dict[str, Any]:
+            """
+            Post to one platform within its timeout.
+
+            wait_for only stops waiting: the blocking upload keeps running in
+            its sdk_executor thread and may still go live. A timeout is
+            therefore reported as status "unknown" (and listed in
+            results["unknown"]) rather than as a failure, so nothing reposts
+            it blindly.
+            """
+            timeout = PLATFORM_TIMEOUTS.get(platform, DEFAULT_PLATFORM_TIMEOUT)
             try:
-                if platform == "instagram":
-                    result = await self._post_to_instagram(content, image_url)
-                    results["platforms"]["instagram"] = result
-                elif platform == "twitter":
-                    result = await self._post_to_twitter(content, image_url)
-                    results["platforms"]["twitter"] = result
-                elif platform == "facebook":
-                    result = await self._post_to_facebook(content, image_url)
-                    results["platforms"]["facebook"] = result
-                elif platform == "linkedin":
-                    result = await self._post_to_linkedin(content, image_url)
-                    results["platforms"]["linkedin"] = result
-                else:
-                    results["platforms"][platform] = {
-                        "success": False,
-                        "error": f"Platform {platform} not yet implemented"
-                    }
-            except Exception as e:
-                logger.error(f"Error posting to {platform}: {e}")
+                return await asyncio.wait_for(handlers[platform](content, image_url), timeout)
+            except asyncio.TimeoutError:
+                results["unknown"].append(platform)
+                return {
+                    "success": False,
+                    "status": "unknown",
+                    "error": f"timed out after {timeout:g}s; the upload may still have been published"
+                }
+        
+        # Post to every selected platform at once; results keep the input order
+        selected = [p for p, enabled in platforms.items() if enabled]
+        for platform in selected:
+            if platform not in handlers:
                 results["platforms"][platform] = {
                     "success": False,
-                    "error": str(e)
+                    "error": f"Platform {platform} not yet implemented"
                 }
-                results["errors"].append(f"{platform}: {str(e)}")
+        runnable = [p for p in selected if p in handlers]
+        outcomes = await asyncio.gather(*(post_one(p) for p in runnable), return_exceptions=True)
+        
+        for platform, outcome in zip(runnable, outcomes):
+            if isinstance(outcome, asyncio.CancelledError):
+                raise outcome
+            if isinstance(outcome, Exception):
+                logger.error(f"Error posting to {platform}: {outcome}")
+                results["platforms"][platform] = {
+                    "success": False,
+                    "error": str(outcome)
+                }
+                results["errors"].append(f"{platform}: {str(outcome)}")
+            else:
+                results["platforms"][platform] = outcome
+        
+        # Keep the caller's platform order in the result
+        results["platforms"] = {p: results["platforms"][p] for p in selected}
         
         # Overall success if at least one platform succeeded
         results["success"] = any(
@@ -119,7 +159,7 @@ class PostExecutor:
         try:
             # Try to use existing Instagram posting infrastructure
             try:
-                from scripts.post_instagram import post_photo, _build_client
+                from scripts.post_instagram import _build_client
                 from instagrapi import Client
                 
                 # If image_url is provided, download and save it
@@ -151,8 +191,19 @@ class PostExecutor:
                 # Use a default client name or create one
                 client_name = "default"
                 
-                # Post the photo
-                result = post_photo(client_name, image_path, content)
+                # Reuse the logged-in client; the upload runs on the SDK pool
+                account = f"instagram:{client_name}"
+                registry = get_client_registry()
+                client = await registry.get(
+                    "instagram", client_name,
+                    factory=lambda: run_blocking(account, _build_client, client_name),
+                    validate=lambda cl: run_blocking(account, cl.account_info),
+                )
+                try:
+                    result = await run_blocking(account, client.photo_upload, image_path, content or "")
+                except Exception as e:
+                    registry.evict_on_auth_error("instagram", client_name, e)
+                    raise
                 
                 return {
                     "success": True,
@@ -189,19 +240,24 @@ class PostExecutor:
                 "error": "Twitter credentials not configured. Add TWITTER_API_KEY, etc. to .env"
             }
         
+        registry = get_client_registry()
         try:
             import tweepy
             
-            auth = tweepy.OAuth1UserHandler(
-                self.twitter_api_key,
-                self.twitter_api_secret,
-                self.twitter_access_token,
-                self.twitter_access_secret
-            )
-            api = tweepy.API(auth)
+            async def connect():
+                auth = tweepy.OAuth1UserHandler(
+                    self.twitter_api_key,
+                    self.twitter_api_secret,
+                    self.twitter_access_token,
+                    self.twitter_access_secret
+                )
+                return tweepy.API(auth)
+            
+            # One API object per account for the life of the process
+            api = await registry.get("twitter", "default", factory=connect)
             
             # Post text (images would need additional handling)
-            result = api.update_status(content[:280])  # Twitter limit
+            result = await run_blocking("twitter:default", api.update_status, content[:280])  # Twitter limit
             
             return {
                 "success": True,
@@ -211,6 +267,7 @@ class PostExecutor:
                 "message": "Posted successfully to Twitter"
             }
         except Exception as e:
+            registry.evict_on_auth_error("twitter", "default", e)
             logger.error(f"Twitter posting error: {e}")
             return {
                 "success": False,
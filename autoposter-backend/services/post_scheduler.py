@@ -1,15 +1,19 @@
 #!/usr/bin/env python3
 """
 Post Scheduler Service
-Background worker that checks for and executes due posts
+Background worker that executes scheduled posts at their due time
 """
 
 import asyncio
+import bisect
 import logging
-import json
+import os
+import threading
+import time
+from contextlib import AsyncExitStack
 from pathlib import Path
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import sys
 
 # Add project root to path
@@ -17,155 +21,350 @@ PROJECT_ROOT = Path(__file__).parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
 from services.post_executor import get_post_executor
+from services.post_store import PostStore, scheduled_epoch as _due_epoch
 
 logger = logging.getLogger(__name__)
 
+# Concurrency limits for executing due posts. The global cap bounds the whole
+# burst; per-platform caps keep us under each API's rate limits; each account
+# (the post's owner, on one platform) posts one at a time.
+MAX_CONCURRENT_POSTS = int(os.getenv("SCHEDULER_MAX_CONCURRENCY", "16"))
+PLATFORM_CONCURRENCY = {
+    "instagram": 2,
+    "twitter": 4,
+    "facebook": 4,
+    "linkedin": 2,
+}
+DEFAULT_PLATFORM_CONCURRENCY = 2
+ACCOUNT_CONCURRENCY = 1
+
+class KeyedSemaphore:
+    """One asyncio.Semaphore per key, created on first use"""
+    
+    def __init__(self, limits: Dict[str, int], default: int):
+        self.limits = limits
+        self.default = default
+        self._sems: Dict[str, asyncio.Semaphore] = {}
+    
+    def __getitem__(self, key: str) -> asyncio.Semaphore:
+        sem = self._sems.get(key)
+        if sem is None:
+            sem = self._sems[key] = asyncio.Semaphore(self.limits.get(key, self.default))
+        return sem
+
 class PostScheduler:
     """Background scheduler for executing scheduled posts"""
     
-    def __init__(self, storage_file: Path = None):
+    def __init__(
+        self,
+        storage_file: Path = None,
+        store: PostStore = None,
+        max_concurrency: int = MAX_CONCURRENT_POSTS,
+        platform_limits: Dict[str, int] = None,
+    ):
+        # storage_file is the legacy JSON file; it is imported into the store once
         self.storage_file = storage_file or (PROJECT_ROOT / "data" / "scheduled_posts.json")
         self.storage_file.parent.mkdir(parents=True, exist_ok=True)
+        self.store = store or PostStore(self.storage_file.with_suffix(".db"))
         self.executor = get_post_executor()
         self.running = False
+        self._global_sem = asyncio.Semaphore(max_concurrency)
+        self._platform_sems = KeyedSemaphore(platform_limits or PLATFORM_CONCURRENCY, DEFAULT_PLATFORM_CONCURRENCY)
+        self._account_sems = KeyedSemaphore({}, ACCOUNT_CONCURRENCY)
+        # Ordered index of the "scheduled" posts only: parallel lists sorted by
+        # pre-parsed due epoch, plus id -> epoch so entries can be found and removed.
+        self._lock = threading.RLock()
+        self._due_times: List[float] = []
+        self._due_ids: List[str] = []
+        self._due_at: Dict[str, float] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._bursts: set = set()
         self._load_posts()
     
     def _load_posts(self):
-        """Load scheduled posts from storage"""
-        if self.storage_file.exists():
-            try:
-                with open(self.storage_file, 'r') as f:
-                    data = json.load(f)
-                    self.scheduled_posts = data.get("posts", [])
-                    logger.info(f"Loaded {len(self.scheduled_posts)} scheduled posts")
-            except Exception as e:
-                logger.error(f"Error loading posts: {e}")
-                self.scheduled_posts = []
-        else:
-            self.scheduled_posts = []
-    
-    def _save_posts(self):
-        """Save scheduled posts to storage"""
+        """Load pending posts from storage, migrating the JSON file on first start"""
+        if self.store.count() == 0:
+            self.store.migrate_json(self.storage_file)
+        # Only posts still waiting to go out are kept in memory
+        self._posts_by_id = {}
+        for post in self.store.by_status("scheduled"):
+            self._index(post)
+        logger.info(f"Loaded {len(self._posts_by_id)} scheduled posts")
+    
+    def _unindex(self, post_id: str):
+        """Remove a post from the index, if present"""
+        due = self._due_at.pop(post_id, None)
+        self._posts_by_id.pop(post_id, None)
+        if due is None:
+            return
+        i = bisect.bisect_left(self._due_times, due)
+        while self._due_ids[i] != post_id:
+            i += 1
+        del self._due_times[i]
+        del self._due_ids[i]
+    
+    def _index(self, post: Dict[str, Any]) -> bool:
+        """(Re)index a post if it is waiting to go out; True if it is now indexed"""
+        post_id = post.get("id")
+        with self._lock:
+            self._unindex(post_id)
+            if post.get("status", "scheduled") != "scheduled":
+                return False
+            due = _due_epoch(post)
+            if due is None:
+                return False
+            i = bisect.bisect_right(self._due_times, due)
+            self._due_times.insert(i, due)
+            self._due_ids.insert(i, post_id)
+            self._due_at[post_id] = due
+            self._posts_by_id[post_id] = post
+            return True
+    
+    def _wake(self):
+        """Wake run_loop so it re-reads the next due time (safe from any thread)"""
+        if self._loop is None or self._wakeup is None:
+            return
         try:
-            data = {
-                "posts": self.scheduled_posts,
-                "last_updated": datetime.now().isoformat()
-            }
-            with open(self.storage_file, 'w') as f:
-                json.dump(data, f, indent=2)
-        except Exception as e:
-            logger.error(f"Error saving posts: {e}")
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._wakeup.set()
+        elif not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
     
     def add_post(self, post: Dict[str, Any]):
         """Add a new scheduled post"""
-        self.scheduled_posts.append(post)
-        self._save_posts()
+        self.store.add(post)
+        if self._index(post):
+            self._wake()
         logger.info(f"Added scheduled post: {post.get('id')}")
     
     def update_post(self, post_id: str, updates: Dict[str, Any]):
         """Update an existing post"""
-        for i, post in enumerate(self.scheduled_posts):
-            if post.get("id") == post_id:
-                self.scheduled_posts[i].update(updates)
-                self._save_posts()
-                logger.info(f"Updated post: {post_id}")
-                return True
-        return False
+        post = self.store.update(post_id, updates)
+        if post is None:
+            return False
+        if self._index(post) and ("scheduledTime" in updates or "status" in updates):
+            self._wake()
+        logger.info(f"Updated post: {post_id}")
+        return True
+    
+    def cancel_post(self, post_id: str) -> bool:
+        """Cancel a post that has not gone out yet"""
+        with self._lock:
+            if post_id not in self._due_at:
+                return False
+            self._unindex(post_id)
+        self.store.update(post_id, {"status": "cancelled", "cancelledAt": datetime.now().isoformat()})
+        self._wake()
+        logger.info(f"Cancelled post: {post_id}")
+        return True
+    
+    def next_due_epoch(self) -> Optional[float]:
+        """Due time of the earliest scheduled post, or None if nothing is scheduled"""
+        with self._lock:
+            return self._due_times[0] if self._due_times else None
     
     def get_due_posts(self) -> List[Dict[str, Any]]:
-        """Get posts that are due to be executed"""
-        now = datetime.now()
-        due_posts = []
-        
-        for post in self.scheduled_posts:
-            status = post.get("status", "scheduled")
-            if status != "scheduled":
-                continue
-            
-            scheduled_time_str = post.get("scheduledTime")
-            if not scheduled_time_str:
-                continue
-            
-            try:
-                scheduled_time = datetime.fromisoformat(scheduled_time_str.replace('Z', '+00:00'))
-                # Convert to local time if needed
-                if scheduled_time.tzinfo:
-                    scheduled_time = scheduled_time.astimezone().replace(tzinfo=None)
-                
-                # Check if due (within last minute to account for timing)
-                if scheduled_time <= now:
-                    due_posts.append(post)
-            except Exception as e:
-                logger.error(f"Error parsing scheduled time for post {post.get('id')}: {e}")
+        """Get posts that are due to be executed (O(log n + k) over the index)"""
+        with self._lock:
+            end = bisect.bisect_right(self._due_times, time.time())
+            return [self._posts_by_id[post_id] for post_id in self._due_ids[:end]]
+    
+    def _take_due_posts(self) -> List[Dict[str, Any]]:
+        """Remove every due post from the index and return them, earliest first"""
+        with self._lock:
+            end = bisect.bisect_right(self._due_times, time.time())
+            # The due posts are a prefix of the index: drop it in one slice
+            # instead of shifting both lists once per post
+            due_ids = self._due_ids[:end]
+            del self._due_times[:end]
+            del self._due_ids[:end]
+            for post_id in due_ids:
+                self._due_at.pop(post_id, None)
+            return [self._posts_by_id.pop(post_id) for post_id in due_ids]
+    
+    def _mark_posting(self, due_posts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Record 'posting' for posts taken off the index, in one store transaction.
         
-        return due_posts
+        Returns the ones still in the store, now marked. If the write fails they
+        go back in the index.
+        """
+        posting = {"status": "posting", "postingAt": datetime.now().isoformat()}
+        try:
+            stored = self.store.update_many({post.get("id"): posting for post in due_posts})
+        except Exception:
+            for post in due_posts:
+                self._index(post)
+            raise
+        found = {post.get("id") for post in stored}
+        claimed = [post for post in due_posts if post.get("id") in found]
+        for post in claimed:
+            post.update(posting)
+        return claimed
+    
+    async def _claim_due_posts(self) -> List[Dict[str, Any]]:
+        """Mark every due post 'posting' (taking it out of the index) and return them"""
+        # Off the index right away, so the next pass can't pick them up again;
+        # the store write runs in a thread so it doesn't stall the event loop
+        due_posts = self._take_due_posts()
+        if not due_posts:
+            return []
+        logger.info(f"Found {len(due_posts)} due posts to execute")
+        return await asyncio.to_thread(self._mark_posting, due_posts)
     
-    async def execute_due_posts(self):
-        """Execute all due posts"""
-        due_posts = self.get_due_posts()
+    async def execute_due_posts(self) -> Dict[str, str]:
+        """
+        Execute all due posts concurrently, within the configured limits.
         
+        Returns post id -> final status, collected as each post completes.
+        """
+        return await self._execute_burst(await self._claim_due_posts())
+    
+    async def _execute_burst(self, due_posts: List[Dict[str, Any]]) -> Dict[str, str]:
         if not due_posts:
-            return
+            return {}
+        outcomes = {}
+        tasks = [asyncio.create_task(self._execute_limited(post)) for post in due_posts]
+        for finished in asyncio.as_completed(tasks):
+            post_id, status = await finished
+            outcomes[post_id] = status
         
-        logger.info(f"Found {len(due_posts)} due posts to execute")
+        posted = sum(1 for status in outcomes.values() if status == "posted")
+        unknown = sum(1 for status in outcomes.values() if status == "unknown")
+        logger.info(
+            f"Executed {len(outcomes)} due posts "
+            f"({posted} posted, {len(outcomes) - posted - unknown} failed, {unknown} unknown)"
+        )
+        return outcomes
+    
+    async def _execute_limited(self, post: Dict[str, Any]):
+        """Run one post once its platform, account and global slots are free"""
+        platforms = sorted(p for p, enabled in (post.get("platforms") or {}).items() if enabled)
+        # Scheduled posts carry the owner's uid; posts with no owner get no account limit
+        owner = post.get("account") or post.get("uid") or post.get("client")
+        async with AsyncExitStack() as stack:
+            # Fixed order (platforms sorted, each platform's slot before that
+            # account's slot, then the global slot) so cross-posts can't
+            # deadlock, and a post waiting on a busy platform or account
+            # doesn't sit on a global slot meanwhile.
+            for platform in platforms:
+                await stack.enter_async_context(self._platform_sems[platform])
+                if owner:
+                    await stack.enter_async_context(self._account_sems[f"{platform}:{owner}"])
+            await stack.enter_async_context(self._global_sem)
+            return await self._execute_one(post)
+    
+    async def _execute_one(self, post: Dict[str, Any]):
+        """Execute a claimed post and record the result; returns (post id, status)"""
+        post_id = post.get("id")
+        logger.info(f"Executing post: {post_id}")
         
-        for post in due_posts:
-            post_id = post.get("id")
-            logger.info(f"Executing post: {post_id}")
-            
-            # Update status to "posting"
-            self.update_post(post_id, {"status": "posting", "postingAt": datetime.now().isoformat()})
+        try:
+            # Execute the post
+            results = await self.executor.execute_post(post)
             
-            try:
-                # Execute the post
-                results = await self.executor.execute_post(post)
-                
-                if results.get("success"):
-                    # Update status to "posted"
-                    self.update_post(post_id, {
-                        "status": "posted",
-                        "postedAt": datetime.now().isoformat(),
-                        "postResults": results
-                    })
-                    logger.info(f"✅ Post {post_id} executed successfully")
-                else:
-                    # Update status to "failed"
-                    self.update_post(post_id, {
-                        "status": "failed",
-                        "failedAt": datetime.now().isoformat(),
-                        "error": results.get("errors", ["Unknown error"])
-                    })
-                    logger.error(f"❌ Post {post_id} failed: {results.get('errors')}")
-                    
-            except Exception as e:
-                logger.error(f"Error executing post {post_id}: {e}")
+            if results.get("success"):
+                # Update status to "posted"
+                self.update_post(post_id, {
+                    "status": "posted",
+                    "postedAt": datetime.now().isoformat(),
+                    "postResults": results
+                })
+                logger.info(f"✅ Post {post_id} executed successfully")
+                return post_id, "posted"
+            elif results.get("unknown"):
+                # A platform timed out mid-upload and may have published: check it
+                # before reposting instead of marking the post as plainly failed
+                self.update_post(post_id, {
+                    "status": "unknown",
+                    "unknownAt": datetime.now().isoformat(),
+                    "error": results.get("errors") or [
+                        f"{p}: outcome unknown (timed out)" for p in results["unknown"]
+                    ],
+                    "postResults": results
+                })
+                logger.warning(f"⚠️ Post {post_id} outcome unknown on {results['unknown']}")
+                return post_id, "unknown"
+            else:
+                # Update status to "failed"
                 self.update_post(post_id, {
                     "status": "failed",
                     "failedAt": datetime.now().isoformat(),
-                    "error": str(e)
+                    "error": results.get("errors", ["Unknown error"])
                 })
+                logger.error(f"❌ Post {post_id} failed: {results.get('errors')}")
+                return post_id, "failed"
+                
+        except Exception as e:
+            logger.error(f"Error executing post {post_id}: {e}")
+            self.update_post(post_id, {
+                "status": "failed",
+                "failedAt": datetime.now().isoformat(),
+                "error": str(e)
+            })
+            return post_id, "failed"
     
-    async def run_loop(self, interval_seconds: int = 60):
-        """Run the scheduler loop"""
+    async def run_loop(self, interval_seconds: Optional[float] = None):
+        """
+        Run the scheduler loop.
+        
+        Sleeps until the earliest scheduled post is due, or until add_post /
+        update_post / stop wakes it. interval_seconds, if given, caps a single
+        sleep (a safety re-check); by default an idle scheduler does no work.
+        
+        Each burst of due posts runs as its own task, so posts coming due
+        while a slow burst is still going out are started on time. Bursts
+        still running when the loop stops are waited for.
+        """
         self.running = True
-        logger.info(f"Post scheduler started (checking every {interval_seconds} seconds)")
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        logger.info("Post scheduler started (event-driven)")
         
-        while self.running:
-            try:
-                await self.execute_due_posts()
-            except Exception as e:
-                logger.error(f"Error in scheduler loop: {e}")
-            
-            await asyncio.sleep(interval_seconds)
+        try:
+            while self.running:
+                try:
+                    due_posts = await self._claim_due_posts()
+                    if due_posts:
+                        burst = asyncio.create_task(self._execute_burst(due_posts))
+                        self._bursts.add(burst)
+                        burst.add_done_callback(self._burst_done)
+                except Exception as e:
+                    logger.error(f"Error in scheduler loop: {e}")
+                
+                self._wakeup.clear()
+                next_due = self.next_due_epoch()
+                timeout = None if next_due is None else max(0.0, next_due - time.time())
+                if interval_seconds is not None:
+                    timeout = interval_seconds if timeout is None else min(timeout, interval_seconds)
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if self._bursts:
+                await asyncio.gather(*self._bursts, return_exceptions=True)
+            self._loop = None
+            self._wakeup = None
+    
+    def _burst_done(self, burst: asyncio.Task):
+        self._bursts.discard(burst)
+        if not burst.cancelled() and burst.exception() is not None:
+            logger.error(f"Error executing due posts: {burst.exception()}")
     
     def stop(self):
         """Stop the scheduler"""
         self.running = False
+        self._wake()
         logger.info("Post scheduler stopped")
     
     def get_all_posts(self) -> List[Dict[str, Any]]:
         """Get all scheduled posts"""
-        return self.scheduled_posts.copy()
+        return self.store.all()
 
 # Global scheduler instance
 _scheduler = None
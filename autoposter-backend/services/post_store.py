@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Post Store
+SQLite-backed storage for scheduled posts (replaces scheduled_posts.json)
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scheduled_posts (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'scheduled',
+    scheduled_epoch REAL,
+    data TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_scheduled_posts_status_time
+    ON scheduled_posts(status, scheduled_epoch);
+CREATE INDEX IF NOT EXISTS idx_scheduled_posts_time
+    ON scheduled_posts(scheduled_epoch);
+"""
+
+# Bound parameters per IN (...) lookup; stays under SQLite's historical 999 limit
+_ID_CHUNK = 500
+
+def scheduled_epoch(post: Dict[str, Any]) -> Optional[float]:
+    """Epoch seconds of a post's scheduledTime (naive times are local), or None"""
+    scheduled_time_str = post.get("scheduledTime")
+    if not scheduled_time_str:
+        return None
+    try:
+        return datetime.fromisoformat(scheduled_time_str.replace('Z', '+00:00')).timestamp()
+    except Exception as e:
+        logger.error(f"Error parsing scheduled time for post {post.get('id')}: {e}")
+        return None
+
+class PostStore:
+    """Scheduled posts keyed by id, with status/time columns indexed for lookups"""
+
+    def __init__(self, db_file: Path):
+        self.db_file = db_file
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(db_file), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute("PRAGMA synchronous=NORMAL;")
+        self._conn.executescript(SCHEMA)
+
+    @staticmethod
+    def _row(post: Dict[str, Any]) -> tuple:
+        return (
+            post.get("id"),
+            post.get("status", "scheduled"),
+            scheduled_epoch(post),
+            json.dumps(post),
+            datetime.now().isoformat(),
+        )
+
+    def _select(self, where: str = "", params: tuple = ()) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT data FROM scheduled_posts {where}", params
+            ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM scheduled_posts").fetchone()[0]
+
+    def add(self, post: Dict[str, Any]):
+        """Insert a post (or overwrite one with the same id)"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO scheduled_posts (id, status, scheduled_epoch, data, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                self._row(post),
+            )
+
+    def update(self, post_id: str, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Merge `updates` into one post and rewrite only that row; returns the post or None"""
+        posts = self.update_many({post_id: updates})
+        return posts[0] if posts else None
+
+    def update_many(self, updates: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        update() for many posts (post id -> updates) in one transaction.
+
+        Returns the updated posts in `updates` order; ids not in the store are skipped.
+        """
+        ids = list(updates)
+        posts = []
+        with self._lock, self._conn:
+            found = {}
+            for i in range(0, len(ids), _ID_CHUNK):
+                chunk = ids[i:i + _ID_CHUNK]
+                found.update(self._conn.execute(
+                    f"SELECT id, data FROM scheduled_posts WHERE id IN ({', '.join('?' for _ in chunk)})",
+                    chunk,
+                ).fetchall())
+            rows = []
+            for post_id in ids:
+                if post_id not in found:
+                    continue
+                post = json.loads(found[post_id])
+                post.update(updates[post_id])
+                _, status, epoch, data, now = self._row(post)
+                rows.append((status, epoch, data, now, post_id))
+                posts.append(post)
+            self._conn.executemany(
+                "UPDATE scheduled_posts SET status = ?, scheduled_epoch = ?, data = ?, updated_at = ? WHERE id = ?",
+                rows,
+            )
+        return posts
+
+    def delete(self, post_id: str) -> bool:
+        with self._lock, self._conn:
+            cur = self._conn.execute("DELETE FROM scheduled_posts WHERE id = ?", (post_id,))
+        return cur.rowcount > 0
+
+    def get(self, post_id: str) -> Optional[Dict[str, Any]]:
+        posts = self._select("WHERE id = ?", (post_id,))
+        return posts[0] if posts else None
+
+    def by_status(self, status: str) -> List[Dict[str, Any]]:
+        """Posts with `status`, earliest scheduledTime first"""
+        return self._select("WHERE status = ? ORDER BY scheduled_epoch", (status,))
+
+    def due(self, now_epoch: float, limit: int = 100) -> List[Dict[str, Any]]:
+        """Scheduled posts due at or before `now_epoch`, earliest first"""
+        return self._select(
+            "WHERE status = 'scheduled' AND scheduled_epoch <= ? ORDER BY scheduled_epoch LIMIT ?",
+            (now_epoch, limit),
+        )
+
+    def all(self) -> List[Dict[str, Any]]:
+        return self._select("ORDER BY scheduled_epoch")
+
+    def migrate_json(self, json_file: Path) -> int:
+        """
+        Import posts from the legacy scheduled_posts.json, once.
+
+        The file is renamed to *.migrated afterwards so it is never read again.
+        """
+        if not json_file.exists():
+            return 0
+        try:
+            with open(json_file, 'r') as f:
+                posts = json.load(f).get("posts", [])
+        except Exception as e:
+            logger.error(f"Error reading {json_file} for migration: {e}")
+            return 0
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO scheduled_posts (id, status, scheduled_epoch, data, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [self._row(p) for p in posts if p.get("id") is not None],
+            )
+        json_file.rename(json_file.with_name(json_file.name + ".migrated"))
+        logger.info(f"Migrated {len(posts)} posts from {json_file.name}")
+        return len(posts)
@@ -0,0 +1,53 @@
+# services/test_post_executor.py
+"""
+PostExecutor tests: platforms post concurrently, and one that overruns its
+timeout is reported as "unknown" (it may still publish), not as failed, all
+the way to the scheduled post's status.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from services import post_executor
+from services.post_executor import PostExecutor
+from services.post_scheduler import PostScheduler
+
+@pytest.fixture
+def executor(monkeypatch):
+    monkeypatch.setitem(post_executor.PLATFORM_TIMEOUTS, "instagram", 0.05)
+    monkeypatch.setitem(post_executor.PLATFORM_TIMEOUTS, "twitter", 1)
+    ex = PostExecutor()
+
+    async def hangs(content, image_url):
+        await asyncio.sleep(5)
+
+    async def posts(content, image_url):
+        await asyncio.sleep(0.01)
+        return {"success": True, "postId": "t1"}
+
+    monkeypatch.setattr(ex, "_post_to_instagram", hangs)
+    monkeypatch.setattr(ex, "_post_to_twitter", posts)
+    return ex
+
+def test_timeout_is_unknown_not_failed(executor):
+    post = {"id": "p1", "content": "hi", "platforms": {"instagram": True, "twitter": True, "myspace": True}}
+    results = asyncio.run(executor.execute_post(post))
+
+    assert list(results["platforms"]) == ["instagram", "twitter", "myspace"]
+    assert results["unknown"] == ["instagram"]
+    assert results["platforms"]["instagram"]["status"] == "unknown"
+    assert results["platforms"]["twitter"]["success"]
+    assert "not yet implemented" in results["platforms"]["myspace"]["error"]
+    assert results["errors"] == []
+
+def test_scheduler_records_unknown_outcome(executor, tmp_path):
+    scheduler = PostScheduler(storage_file=tmp_path / "scheduled_posts.json")
+    scheduler.executor = executor
+    due = (datetime.now() - timedelta(seconds=5)).isoformat()
+    scheduler.add_post({"id": "p1", "status": "scheduled", "scheduledTime": due, "platforms": {"instagram": True}})
+
+    assert asyncio.run(scheduler.execute_due_posts()) == {"p1": "unknown"}
+    stored = scheduler.store.get("p1")
+    assert stored["status"] == "unknown"
+    assert stored["error"] == ["instagram: outcome unknown (timed out)"]
@@ -0,0 +1,89 @@
+# services/test_post_scheduler.py
+"""
+PostScheduler tests: the in-memory due-time index hands out due posts in
+order and stays consistent as posts are claimed, rescheduled and cancelled,
+and a claim is one store write made off the event loop.
+Each test uses its own store under tmp_path.
+"""
+import time
+import asyncio
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from services.post_scheduler import PostScheduler
+
+def at(seconds_from_now: float) -> str:
+    return (datetime.now() + timedelta(seconds=seconds_from_now)).isoformat()
+
+@pytest.fixture
+def scheduler(tmp_path):
+    return PostScheduler(storage_file=tmp_path / "scheduled_posts.json")
+
+def assert_index_consistent(s):
+    assert s._due_times == sorted(s._due_times)
+    assert len(s._due_times) == len(s._due_ids) == len(s._due_at) == len(s._posts_by_id)
+    assert all(s._due_at[i] == t for i, t in zip(s._due_ids, s._due_times))
+
+def test_due_posts_are_taken_in_order(scheduler):
+    s = scheduler
+    for n, offset in enumerate([-30, 600, -10, -20, 300, -10]):
+        s.add_post({"id": f"p{n}", "status": "scheduled", "scheduledTime": at(offset)})
+
+    taken = s._take_due_posts()
+    assert [p["id"] for p in taken] == ["p0", "p3", "p2", "p5"]
+    assert_index_consistent(s)
+    assert s._due_ids == ["p4", "p1"]
+    assert s.get_due_posts() == []
+    assert s.next_due_epoch() == s._due_at["p4"]
+
+def test_index_survives_reschedule_and_cancel(scheduler):
+    s = scheduler
+    for n in range(50):
+        s.add_post({"id": f"p{n}", "status": "scheduled", "scheduledTime": at(-100 + n * 5)})
+    s.update_post("p3", {"scheduledTime": at(3600)})
+    assert s.cancel_post("p7")
+    assert not s.cancel_post("p7")
+    assert_index_consistent(s)
+
+    claimed = asyncio.run(s._claim_due_posts())
+    assert "p3" not in {p["id"] for p in claimed} and "p7" not in {p["id"] for p in claimed}
+    assert all(s.store.get(p["id"])["status"] == "posting" for p in claimed)
+    assert_index_consistent(s)
+    assert all(t > time.time() for t in s._due_times)
+    assert s._due_ids[-1] == "p3"
+
+def test_claim_is_one_store_write_off_the_loop(scheduler, monkeypatch):
+    s = scheduler
+    for n in range(5):
+        s.add_post({"id": f"p{n}", "status": "scheduled", "scheduledTime": at(-10)})
+    writes = []
+    update_many = s.store.update_many
+
+    def recording_update_many(updates):
+        writes.append((sorted(updates), threading.current_thread() is threading.main_thread()))
+        return update_many(updates)
+
+    monkeypatch.setattr(s.store, "update_many", recording_update_many)
+    monkeypatch.setattr(s.store, "update", lambda *a: pytest.fail("per-post store write"))
+
+    claimed = asyncio.run(s._claim_due_posts())
+    assert [p["id"] for p in claimed] == [f"p{n}" for n in range(5)]
+    assert all(p["status"] == "posting" for p in claimed)
+    assert writes == [([f"p{n}" for n in range(5)], False)]
+    assert [p["status"] for p in s.store.by_status("posting")] == ["posting"] * 5
+
+def test_failed_claim_write_puts_posts_back(scheduler, monkeypatch):
+    s = scheduler
+    for n in range(3):
+        s.add_post({"id": f"p{n}", "status": "scheduled", "scheduledTime": at(-10)})
+
+    def broken(updates):
+        raise RuntimeError("disk I/O error")
+
+    monkeypatch.setattr(s.store, "update_many", broken)
+    with pytest.raises(RuntimeError):
+        asyncio.run(s._claim_due_posts())
+    assert [p["id"] for p in s.get_due_posts()] == ["p0", "p1", "p2"]
+    assert_index_consistent(s)